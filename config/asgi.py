@@ -3,6 +3,10 @@ ASGI config for config project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve the project through this entry point (e.g. ``uvicorn config.asgi:application``)
+to stream summaries from ``url_summarizer:stream_summary``; under WSGI the
+server-sent events are buffered until the summary is complete.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.0/howto/deployment/asgi/
 """
@@ -215,7 +215,64 @@ CORS_ALLOWED_ORIGINS = os.getenv("CORS_ALLOWED_ORIGINS", "http://localhost:8000,
 # Taggit settings
 TAGGIT_CASE_INSENSITIVE = True
 
+# Documentation search
+DOCUMENTATION_SEARCH_BACKEND = os.getenv('DOCUMENTATION_SEARCH_BACKEND') or None  # postgres, sqlite_fts5 or basic; picked from the database vendor when unset
+DOCUMENTATION_SEARCH_INDEX_BATCH_SIZE = int(os.getenv('DOCUMENTATION_SEARCH_INDEX_BATCH_SIZE', 500))  # documents re-indexed per UPDATE
+DOCUMENTATION_SEARCH_SNIPPET_CACHE_TIMEOUT = int(os.getenv('DOCUMENTATION_SEARCH_SNIPPET_CACHE_TIMEOUT', 3600))  # seconds a highlighted search excerpt is cached
+
 # Admin site customization
 ADMIN_SITE_HEADER = "Documentation Management"
 ADMIN_SITE_TITLE = "Documentation Admin"
 ADMIN_INDEX_TITLE = "Documentation Administration"
+
+# URL summarizer settings
+URL_SUMMARIZER_FETCH_CACHE_TTL = int(os.getenv('URL_SUMMARIZER_FETCH_CACHE_TTL', 3600))  # seconds before revalidating
+URL_SUMMARIZER_FETCH_CACHE_MAX_ENTRIES = int(os.getenv('URL_SUMMARIZER_FETCH_CACHE_MAX_ENTRIES', 500))
+URL_SUMMARIZER_SUMMARY_CACHE_ENABLED = os.getenv('URL_SUMMARIZER_SUMMARY_CACHE_ENABLED', 'True').lower() == 'true'
+URL_SUMMARIZER_WORKERS = int(os.getenv('URL_SUMMARIZER_WORKERS', 4))  # background summarization threads per process
+URL_SUMMARIZER_BATCH_MAX_URLS = int(os.getenv('URL_SUMMARIZER_BATCH_MAX_URLS', 500))
+URL_SUMMARIZER_BATCH_FETCH_CONCURRENCY = int(os.getenv('URL_SUMMARIZER_BATCH_FETCH_CONCURRENCY', 16))
+URL_SUMMARIZER_BATCH_PER_HOST_LIMIT = int(os.getenv('URL_SUMMARIZER_BATCH_PER_HOST_LIMIT', 4))
+URL_SUMMARIZER_BATCH_LLM_CONCURRENCY = int(os.getenv('URL_SUMMARIZER_BATCH_LLM_CONCURRENCY', 4))
+URL_SUMMARIZER_POOL_SIZE = int(os.getenv('URL_SUMMARIZER_POOL_SIZE', 8))  # idle summarizer/analyzer instances kept for reuse
+URL_SUMMARIZER_HTTP_POOL_SIZE = int(os.getenv('URL_SUMMARIZER_HTTP_POOL_SIZE', 32))  # keep-alive connections per host
+URL_SUMMARIZER_FETCH_MAX_BYTES = int(os.getenv('URL_SUMMARIZER_FETCH_MAX_BYTES', 2 * 1024 * 1024))  # hard cap on bytes downloaded per page
+URL_SUMMARIZER_FETCH_TEXT_TARGET = int(os.getenv('URL_SUMMARIZER_FETCH_TEXT_TARGET', 16000))  # stop reading once this much main text is seen
+URL_SUMMARIZER_PROMPT_TOKEN_BUDGET = int(os.getenv('URL_SUMMARIZER_PROMPT_TOKEN_BUDGET', 1000))  # page text tokens sent per summary prompt
+URL_SUMMARIZER_SUMMARY_MODE = os.getenv('URL_SUMMARIZER_SUMMARY_MODE', 'packed')  # packed, or chunked to map-reduce long pages
+URL_SUMMARIZER_CHUNK_TOKENS = int(os.getenv('URL_SUMMARIZER_CHUNK_TOKENS', 1500))  # page text per chunk summary
+URL_SUMMARIZER_CHUNK_CONCURRENCY = int(os.getenv('URL_SUMMARIZER_CHUNK_CONCURRENCY', 4))  # chunk summaries in flight per process
+URL_SUMMARIZER_HTML_PARSER = os.getenv('URL_SUMMARIZER_HTML_PARSER', 'lxml')  # lxml, selectolax or html.parser
+URL_SUMMARIZER_PARSE_WORKERS = int(os.getenv('URL_SUMMARIZER_PARSE_WORKERS', 0))  # processes for HTML/CSS parsing; 0 parses in the request thread
+URL_SUMMARIZER_CSS_CACHE_SIZE = int(os.getenv('URL_SUMMARIZER_CSS_CACHE_SIZE', 256))  # parsed stylesheets kept in memory
+URL_SUMMARIZER_CSS_FETCH_TTL = int(os.getenv('URL_SUMMARIZER_CSS_FETCH_TTL', 86400))  # seconds before revalidating a linked stylesheet
+URL_SUMMARIZER_CSS_FETCH_WORKERS = int(os.getenv('URL_SUMMARIZER_CSS_FETCH_WORKERS', 8))
+URL_SUMMARIZER_CSS_MAX_STYLESHEETS = int(os.getenv('URL_SUMMARIZER_CSS_MAX_STYLESHEETS', 20))  # per analyzed page
+URL_SUMMARIZER_CSS_MAX_BYTES = int(os.getenv('URL_SUMMARIZER_CSS_MAX_BYTES', 2 * 1024 * 1024))
+URL_SUMMARIZER_ANALYSIS_MODE = os.getenv('URL_SUMMARIZER_ANALYSIS_MODE', 'static')  # static, or ai to add agent reviews
+URL_SUMMARIZER_ANALYSIS_STORE_ENABLED = os.getenv('URL_SUMMARIZER_ANALYSIS_STORE_ENABLED', 'True').lower() == 'true'  # reuse and keep history of analyses
+URL_SUMMARIZER_CRAWL_MAX_PAGES = int(os.getenv('URL_SUMMARIZER_CRAWL_MAX_PAGES', 200))  # upper bound for one site crawl
+URL_SUMMARIZER_CRAWL_MAX_DEPTH = int(os.getenv('URL_SUMMARIZER_CRAWL_MAX_DEPTH', 3))  # links followed from the start page
+URL_SUMMARIZER_CRAWL_CONCURRENCY = int(os.getenv('URL_SUMMARIZER_CRAWL_CONCURRENCY', 8))  # pages fetched at once per crawl
+URL_SUMMARIZER_CRAWL_WORKERS = int(os.getenv('URL_SUMMARIZER_CRAWL_WORKERS', 1))  # site crawls run at once per process, apart from summary jobs
+URL_SUMMARIZER_CRAWL_STALE_SECONDS = int(os.getenv('URL_SUMMARIZER_CRAWL_STALE_SECONDS', 300))  # crawl streams end after this long without progress
+URL_SUMMARIZER_ASSET_PROBE = os.getenv('URL_SUMMARIZER_ASSET_PROBE', 'False').lower() == 'true'  # add size/type/dimensions to analyzed assets
+URL_SUMMARIZER_ASSET_PROBE_DEADLINE = float(os.getenv('URL_SUMMARIZER_ASSET_PROBE_DEADLINE', 3.0))  # seconds for the whole probe stage
+URL_SUMMARIZER_ASSET_PROBE_MAX = int(os.getenv('URL_SUMMARIZER_ASSET_PROBE_MAX', 50))  # assets probed per analyzed page
+URL_SUMMARIZER_ASSET_PROBE_WORKERS = int(os.getenv('URL_SUMMARIZER_ASSET_PROBE_WORKERS', 8))
+URL_SUMMARIZER_ASSET_PROBE_PER_HOST = int(os.getenv('URL_SUMMARIZER_ASSET_PROBE_PER_HOST', 4))
+URL_SUMMARIZER_ASSET_PROBE_BYTES = int(os.getenv('URL_SUMMARIZER_ASSET_PROBE_BYTES', 16384))  # enough for image headers
+URL_SUMMARIZER_ASSET_THUMBNAIL_SIZE = int(os.getenv('URL_SUMMARIZER_ASSET_THUMBNAIL_SIZE', 64))  # pixels
+URL_SUMMARIZER_ASSET_THUMBNAIL_MAX_BYTES = int(os.getenv('URL_SUMMARIZER_ASSET_THUMBNAIL_MAX_BYTES', 1024 * 1024))
+URL_SUMMARIZER_ASSET_CACHE_SIZE = int(os.getenv('URL_SUMMARIZER_ASSET_CACHE_SIZE', 1024))
+URL_SUMMARIZER_LLM_METRICS_ENABLED = os.getenv('URL_SUMMARIZER_LLM_METRICS_ENABLED', 'True').lower() == 'true'  # store an LLMCall row per summary/analysis
+URL_SUMMARIZER_LLM_PRICES = {}  # USD per million (prompt, completion) tokens by model, added to the built-in table
+URL_SUMMARIZER_LLM_REQUESTS_PER_MINUTE = int(os.getenv('URL_SUMMARIZER_LLM_REQUESTS_PER_MINUTE', 500))  # per process; keep under the API account limit
+URL_SUMMARIZER_LLM_TOKENS_PER_MINUTE = int(os.getenv('URL_SUMMARIZER_LLM_TOKENS_PER_MINUTE', 200000))
+URL_SUMMARIZER_LLM_MAX_QUEUE_WAIT = float(os.getenv('URL_SUMMARIZER_LLM_MAX_QUEUE_WAIT', 10.0))  # seconds; longer waits fail fast with a 503
+URL_SUMMARIZER_LLM_MAX_RETRIES = int(os.getenv('URL_SUMMARIZER_LLM_MAX_RETRIES', 3))
+URL_SUMMARIZER_LLM_RETRY_RATIO = float(os.getenv('URL_SUMMARIZER_LLM_RETRY_RATIO', 0.2))  # retries allowed per successful request
+URL_SUMMARIZER_LLM_BACKOFF_BASE = float(os.getenv('URL_SUMMARIZER_LLM_BACKOFF_BASE', 1.0))  # seconds, doubled per attempt with full jitter
+URL_SUMMARIZER_LLM_BACKOFF_MAX = float(os.getenv('URL_SUMMARIZER_LLM_BACKOFF_MAX', 30.0))
+URL_SUMMARIZER_LLM_BREAKER_FAILURES = int(os.getenv('URL_SUMMARIZER_LLM_BREAKER_FAILURES', 5))  # consecutive failures that open the circuit
+URL_SUMMARIZER_LLM_BREAKER_RESET = float(os.getenv('URL_SUMMARIZER_LLM_BREAKER_RESET', 30.0))  # seconds open before a trial request
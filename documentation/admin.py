@@ -7,6 +7,8 @@ from django.template.response import TemplateResponse
 from django.contrib.auth.models import User
 from django.contrib.auth.admin import UserAdmin
 import csv
+from .autocomplete import invalidate_prefix_index
+from .indexing import mark_dirty
 from .models import Category, Document, Attachment
 
 class CustomAdminSite(admin.AdminSite):
@@ -59,7 +61,7 @@ class DocumentAdmin(admin.ModelAdmin):
     prepopulated_fields = {'slug': ('title',)}
     inlines = [AttachmentInline]
     readonly_fields = ['views', 'created_at', 'updated_at']
-    actions = ['make_public', 'make_private', 'export_as_csv']
+    actions = ['make_public', 'make_private', 'reindex', 'export_as_csv']
     
     fieldsets = (
         (None, {
@@ -94,14 +96,23 @@ class DocumentAdmin(admin.ModelAdmin):
     
     def make_public(self, request, queryset):
         updated = queryset.update(is_public=True)
+        # update() sends no post_save, so refresh the suggestions here
+        invalidate_prefix_index()
         self.message_user(request, f'{updated} documents were marked as public.')
     make_public.short_description = "Mark selected documents as public"
     
     def make_private(self, request, queryset):
         updated = queryset.update(is_public=False)
+        invalidate_prefix_index()
         self.message_user(request, f'{updated} documents were marked as private.')
     make_private.short_description = "Mark selected documents as private"
     
+    def reindex(self, request, queryset):
+        pks = list(queryset.values_list('pk', flat=True))
+        mark_dirty(pks)
+        self.message_user(request, f'{len(pks)} documents were queued for search re-indexing.')
+    reindex.short_description = "Re-index selected documents for search"
+    
     def export_as_csv(self, request, queryset):
         meta = self.model._meta
         field_names = ['title', 'author', 'category', 'content', 'created_at', 'updated_at']
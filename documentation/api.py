@@ -4,6 +4,7 @@ from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from drf_spectacular.utils import extend_schema, OpenApiParameter
 from .models import Document, Category, Attachment
+from .snippets import attach_snippets
 from .serializers import (
     DocumentSerializer,
     DocumentListSerializer,
@@ -56,7 +57,7 @@ class DocumentViewSet(viewsets.ModelViewSet):
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['category', 'is_public', 'author', 'tags__name']
     search_fields = ['title', 'content']
-    ordering_fields = ['title', 'created_at', 'updated_at', 'views_count']
+    ordering_fields = ['title', 'created_at', 'updated_at', 'views']
 
     def get_serializer_class(self):
         if self.action == 'list':
@@ -65,18 +66,30 @@ class DocumentViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         queryset = Document.objects.all()
+        query = self.request.query_params.get('q')
+        if query and self.action == 'list':
+            queryset = Document.search(query=query, sort_by='relevance')
         if not self.request.user.is_authenticated:
             return queryset.filter(is_public=True)
         elif not self.request.user.is_staff:
             return queryset.filter(Q(is_public=True) | Q(author=self.request.user))
         return queryset
 
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        query = self.request.query_params.get('q')
+        if query and page is not None:
+            # Excerpts only for the page being returned
+            page = attach_snippets(page, query)
+        return page
+
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
     @extend_schema(
         description="List all documents",
         parameters=[
+            OpenApiParameter(name="q", description="Full-text search, ranked by relevance; results include a highlighted snippet", required=False, type=str),
             OpenApiParameter(name="category", description="Filter by category slug", required=False, type=str),
             OpenApiParameter(name="tags", description="Filter by tag names (comma-separated)", required=False, type=str),
             OpenApiParameter(name="search", description="Search in title and content", required=False, type=str),
@@ -97,13 +110,14 @@ class DocumentViewSet(viewsets.ModelViewSet):
 
     @extend_schema(
         description="Increment the view count of a document",
-        responses={200: {"type": "object", "properties": {"views_count": {"type": "integer"}}}}
+        responses={200: {"type": "object", "properties": {"views": {"type": "integer"}}}}
     )
     @action(detail=True, methods=['post'])
     def increment_views(self, request, slug=None):
         document = self.get_object()
         document.increment_views()
-        return Response({'views_count': document.views_count})
+        document.refresh_from_db(fields=['views'])
+        return Response({'views': document.views})
 
 class AttachmentViewSet(viewsets.ModelViewSet):
     serializer_class = AttachmentSerializer
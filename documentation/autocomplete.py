@@ -0,0 +1,193 @@
+import bisect
+import threading
+import uuid
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count, Max, Q
+from django.urls import reverse
+from taggit.models import Tag
+
+from .search import document_tags
+
+VERSION_KEY = 'documentation:autocomplete:version'
+MAX_SUGGESTIONS = 20
+
+URL_NAMES = {
+    'document': 'documentation:document_detail',
+    'tag': 'documentation:tag_detail',
+    'category': 'documentation:category_detail',
+}
+
+
+def normalize(text):
+    return ' '.join(text.lower().split())
+
+
+def suggestion(kind, label, slug):
+    return {'type': kind, 'label': label, 'url': reverse(URL_NAMES[kind], args=[slug])}
+
+
+def public_tags():
+    """Tags used by at least one public document."""
+    from .models import Document
+
+    public_documents = Document.objects.filter(is_public=True).values('pk')
+    return Tag.objects.filter(pk__in=document_tags().filter(object_id__in=public_documents).values('tag_id'))
+
+
+def all_suggestions():
+    """``(kind, label, slug)`` of every suggestion: public document titles, tags and categories."""
+    from .models import Category, Document
+
+    suggestions = [
+        ('document', title, slug)
+        for title, slug in Document.objects.filter(is_public=True).values_list('title', 'slug')
+    ]
+    suggestions += [
+        ('tag', name, slug)
+        for name, slug in public_tags().values_list('name', 'slug')
+    ]
+    suggestions += [('category', name, slug) for name, slug in Category.objects.values_list('name', 'slug')]
+    return suggestions
+
+
+class PrefixIndex:
+    """Sorted in-memory prefix index of suggestions.
+
+    A label is found by a prefix of the label itself or of any later word
+    in it, so "web" finds "Django Web Development". Labels starting with
+    the prefix come first. A lookup is a binary search plus a scan of at
+    most ``limit`` matches per key list; URLs are only built for the
+    suggestions returned.
+    """
+
+    def __init__(self, suggestions):
+        self.suggestions = suggestions
+        labels = []
+        words = []
+        for position, (_, label, _) in enumerate(suggestions):
+            parts = normalize(label).split()
+            if not parts:
+                continue
+            labels.append((' '.join(parts), position))
+            words.extend((' '.join(parts[start:]), position) for start in range(1, len(parts)))
+        labels.sort()
+        words.sort()
+        self._keys = ([key for key, _ in labels], [key for key, _ in words])
+        self._positions = ([position for _, position in labels], [position for _, position in words])
+
+    def lookup(self, prefix, limit):
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        found = []
+        seen = set()
+        for keys, positions in zip(self._keys, self._positions):
+            index = bisect.bisect_left(keys, prefix)
+            while index < len(keys) and len(found) < limit and keys[index].startswith(prefix):
+                position = positions[index]
+                if position not in seen:
+                    seen.add(position)
+                    found.append(suggestion(*self.suggestions[position]))
+                index += 1
+        return found
+
+
+_index = None
+_index_version = None
+_index_lock = threading.Lock()
+
+
+def current_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, uuid.uuid4().hex, timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def data_version():
+    """Fingerprint of the rows suggestions are built from.
+
+    Counts and latest timestamps catch documents, categories and tag
+    assignments added, removed, edited or hidden in any process, including
+    through ``update()`` and ``bulk_create()``, which send no signals.
+    """
+    from .models import Category, Document
+
+    documents = Document.objects.aggregate(
+        count=Count('pk'), public=Count('pk', filter=Q(is_public=True)), updated=Max('updated_at')
+    )
+    categories = Category.objects.aggregate(count=Count('pk'), updated=Max('updated_at'))
+    tagged = document_tags().aggregate(count=Count('pk'), latest=Max('pk'))
+    return (
+        documents['count'], documents['public'], documents['updated'],
+        categories['count'], categories['updated'], tagged['count'], tagged['latest'],
+    )
+
+
+def get_prefix_index():
+    """Return this process's prefix index, rebuilding it if the suggestions changed since it was built.
+
+    Changes are noticed through the database fingerprint from
+    ``data_version``, which every process reads, and through the cache
+    version bumped by ``invalidate_prefix_index``. The cache is per process
+    unless a shared backend is configured, so the cache version alone only
+    covers changes such as tag renames in the process that made them.
+    """
+    global _index, _index_version
+    version = (current_version(), data_version())
+    if _index is not None and _index_version == version:
+        return _index
+    with _index_lock:
+        if _index is None or _index_version != version:
+            _index = PrefixIndex(all_suggestions())
+            _index_version = version
+    return _index
+
+
+def invalidate_prefix_index():
+    """Have the prefix index rebuilt once the current transaction commits.
+
+    Call this after changing documents, categories or tags without
+    ``save()``, such as with ``update()`` or ``bulk_create()``.
+    """
+    transaction.on_commit(lambda: cache.set(VERSION_KEY, uuid.uuid4().hex, timeout=None))
+
+
+def database_suggestions(prefix, limit):
+    """Suggestions straight from the database; on PostgreSQL the pg_trgm indexes answer the ILIKE filters."""
+    from .models import Category, Document
+
+    def matching(queryset, field):
+        word_start = Q(**{f'{field}__istartswith': prefix}) | Q(**{f'{field}__icontains': f' {prefix}'})
+        return queryset.filter(word_start).order_by(field)[:limit]
+
+    found = [
+        suggestion('document', document.title, document.slug)
+        for document in matching(Document.objects.filter(is_public=True).only('title', 'slug'), 'title')
+    ]
+    found += [
+        suggestion('tag', tag.name, tag.slug)
+        for tag in matching(public_tags(), 'name')
+    ]
+    found += [suggestion('category', category.name, category.slug) for category in matching(Category.objects.all(), 'name')]
+    normalized = normalize(prefix)
+    found.sort(key=lambda item: (not normalize(item['label']).startswith(normalized), normalize(item['label'])))
+    return found[:limit]
+
+
+def suggest(prefix, limit=8):
+    """Titles, tags and categories matching what has been typed so far.
+
+    PostgreSQL is queried through trigram indexes; other databases use an
+    in-memory prefix index refreshed when documents, tags or categories
+    change.
+    """
+    limit = max(min(limit, MAX_SUGGESTIONS), 1)
+    if not normalize(prefix):
+        return []
+    if connection.vendor == 'postgresql':
+        return database_suggestions(prefix.strip(), limit)
+    return get_prefix_index().lookup(prefix, limit)
@@ -1,4 +1,5 @@
 from django import forms
+from django.db import transaction
 from .models import Document, Attachment, Category
 from ckeditor.widgets import CKEditorWidget
 from crispy_forms.helper import FormHelper
@@ -99,19 +100,21 @@ class DocumentForm(forms.ModelForm):
     def save(self, commit=True):
         document = super().save(commit=False)
         if commit:
-            document.save()
-            # Handle tags
-            document.tags.set(self.clean_tags())
-            # Handle attachments
-            attachments = self.cleaned_data.get('attachments')
-            if attachments:
-                for file in attachments:
-                    Attachment.objects.create(
-                        document=document,
-                        file=file,
-                        name=file.name,
-                        content_type=file.content_type
-                    )
+            # One transaction, so the search index is updated once, with the final tags
+            with transaction.atomic():
+                document.save()
+                # Handle tags
+                document.tags.set(self.clean_tags())
+                # Handle attachments
+                attachments = self.cleaned_data.get('attachments')
+                if attachments:
+                    for file in attachments:
+                        Attachment.objects.create(
+                            document=document,
+                            file=file,
+                            name=file.name,
+                            content_type=file.content_type
+                        )
         return document
 
 class AttachmentForm(forms.ModelForm):
@@ -0,0 +1,46 @@
+import threading
+
+from django.conf import settings
+from django.db import transaction
+
+from .search import get_search_backend
+
+_local = threading.local()
+
+
+def index_batch_size():
+    return getattr(settings, 'DOCUMENTATION_SEARCH_INDEX_BATCH_SIZE', 500)
+
+
+def mark_dirty(pks):
+    """Queue documents for re-indexing once the current transaction commits.
+
+    Ids marked several times in one transaction, by a save and the tag
+    changes that follow it, are indexed once, with their final title,
+    content and tags. Outside a transaction the flush happens at once.
+    Deleted documents are marked too; indexing drops them.
+    """
+    pending = getattr(_local, 'pending', None)
+    if pending is None:
+        pending = _local.pending = set()
+    pending.update(pks)
+    # Flushing is idempotent, so every mark may register it; this keeps
+    # working when a savepoint that registered an earlier flush rolls back.
+    transaction.on_commit(flush, robust=True)
+
+
+def flush():
+    """Index every queued document in set-based batches."""
+    pending = getattr(_local, 'pending', None)
+    if not pending:
+        return
+    _local.pending = set()
+    index_in_batches(sorted(pending))
+
+
+def index_in_batches(pks, batch_size=None):
+    batch_size = batch_size or index_batch_size()
+    backend = get_search_backend()
+    for start in range(0, len(pks), batch_size):
+        with transaction.atomic():
+            backend.index_documents(pks[start:start + batch_size])
@@ -0,0 +1,78 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory
+
+from documentation import autocomplete
+from documentation.models import Category, Document
+from documentation.views import autocomplete as autocomplete_view
+
+WORDS = [
+    'python', 'django', 'caching', 'deployment', 'testing', 'database', 'queries', 'templates',
+    'security', 'forms', 'admin', 'migrations', 'signals', 'middleware', 'logging', 'search',
+    'performance', 'async', 'celery', 'docker', 'kubernetes', 'postgres', 'redis', 'api',
+]
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Measures autocomplete latency per keystroke on a seeded corpus'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--documents', type=int, default=20000, help='Number of documents to seed')
+        parser.add_argument('--queries', type=int, default=2000, help='Number of keystroke queries to time')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed of the corpus and queries')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        # Everything seeded here is rolled back at the end
+        try:
+            with transaction.atomic():
+                self._seed(rng, options['documents'])
+                self._measure(rng, options['queries'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def _seed(self, rng, count):
+        author = get_user_model().objects.create(username='benchmark-autocomplete')
+        Category.objects.bulk_create([
+            Category(name=f'Benchmark {word}', slug=f'benchmark-autocomplete-{word}') for word in WORDS
+        ])
+        self.titles = [' '.join(rng.choice(WORDS) for _ in range(rng.randint(2, 5))).title() for _ in range(count)]
+        Document.objects.bulk_create([
+            Document(title=title, slug=f'benchmark-autocomplete-{i}', content='', author=author)
+            for i, title in enumerate(self.titles)
+        ], batch_size=1000)
+
+    def _measure(self, rng, count):
+        factory = RequestFactory()
+        # Every prefix of a title as it is typed, one keystroke at a time
+        queries = []
+        while len(queries) < count:
+            title = rng.choice(self.titles).lower()
+            queries.extend(title[:end] for end in range(1, len(title) + 1))
+        queries = queries[:count]
+
+        started = time.perf_counter()
+        autocomplete.suggest(queries[0])
+        self.stdout.write(f'First request, including building the index: {(time.perf_counter() - started) * 1000:.1f} ms')
+
+        timings = []
+        for query in queries:
+            started = time.perf_counter()
+            autocomplete_view(factory.get('/autocomplete/', {'q': query}))
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        p95 = timings[max(int(len(timings) * 0.95) - 1, 0)]
+        self.stdout.write(
+            f'{len(self.titles)} documents, {len(timings)} keystrokes: '
+            f'p50 {statistics.median(timings):.2f} ms, p95 {p95:.2f} ms, max {timings[-1]:.2f} ms'
+        )
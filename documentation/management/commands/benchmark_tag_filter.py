@@ -0,0 +1,80 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from taggit.models import Tag, TaggedItem
+
+from documentation.models import Document
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Measures tag filtering of Document.search on a seeded corpus as the number of tags grows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--documents', type=int, default=20000, help='Number of documents to seed')
+        parser.add_argument('--tags-per-document', type=int, default=8, help='Tags given to each document')
+        parser.add_argument('--max-tags', type=int, default=5, help='Largest number of tags to filter by')
+        parser.add_argument('--repeat', type=int, default=5, help='Number of runs per tag count')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed of the corpus')
+
+    def handle(self, *args, **options):
+        # Everything seeded here is rolled back at the end
+        try:
+            with transaction.atomic():
+                self._seed(options)
+                self._measure(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def _seed(self, options):
+        rng = random.Random(options['seed'])
+        author = get_user_model().objects.create(username='benchmark-tag-filter')
+        # A few common tags, so intersections of several of them are not empty
+        common = Tag.objects.bulk_create([Tag(name=f'bench-common-{i}', slug=f'bench-common-{i}') for i in range(options['max_tags'])])
+        rare = Tag.objects.bulk_create([Tag(name=f'bench-rare-{i}', slug=f'bench-rare-{i}') for i in range(200)])
+        documents = Document.objects.bulk_create([
+            Document(title=f'Benchmark {i}', slug=f'benchmark-tag-filter-{i}', content='', author=author)
+            for i in range(options['documents'])
+        ], batch_size=1000)
+
+        content_type = ContentType.objects.get_for_model(Document)
+        items = []
+        for document in documents:
+            tags = [tag for tag in common if rng.random() < 0.6]
+            tags += rng.sample(rare, max(options['tags_per_document'] - len(tags), 0))
+            items.extend(TaggedItem(content_type=content_type, object_id=document.pk, tag=tag) for tag in tags)
+        TaggedItem.objects.bulk_create(items, batch_size=1000)
+        self.common = [tag.name for tag in common]
+        self.stdout.write(f'Seeded {len(documents)} documents with {len(items)} tags\n')
+
+    def _measure(self, options):
+        self.stdout.write(f'{"tags":>4} {"matches":>8} {"joined ms":>10} {"grouped ms":>11}')
+        for count in range(1, options['max_tags'] + 1):
+            names = self.common[:count]
+            joined, matches = self._median_ms(lambda: self._joined(names), options['repeat'])
+            grouped, _ = self._median_ms(lambda: Document.search(tags=names).values_list('pk', flat=True), options['repeat'])
+            self.stdout.write(f'{count:>4} {matches:>8} {joined:>10.1f} {grouped:>11.1f}')
+
+    def _joined(self, names):
+        """The former filter: one join on the tag table per name, then DISTINCT."""
+        queryset = Document.objects.all()
+        for name in names:
+            queryset = queryset.filter(tags__name__in=[name])
+        return queryset.order_by('-created_at').distinct().values_list('pk', flat=True)
+
+    def _median_ms(self, build, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            matches = len(list(build()))
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings), matches
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from documentation.indexing import index_batch_size, index_in_batches
+from documentation.models import Document
+from documentation.search import get_search_backend
+
+class Command(BaseCommand):
+    help = 'Rebuilds the full-text search index of all documents in chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=None,
+            help='Documents indexed per batch (default: DOCUMENTATION_SEARCH_INDEX_BATCH_SIZE)'
+        )
+        parser.add_argument(
+            '--clear', action='store_true',
+            help='Empty the index first, dropping entries of documents that no longer exist'
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size'] or index_batch_size()
+        backend = get_search_backend()
+        if options['clear']:
+            backend.clear()
+            self.stdout.write('Cleared the search index')
+
+        indexed = 0
+        last_pk = 0
+        while True:
+            # Keyset pagination, so every chunk is a cheap index range scan
+            pks = list(
+                Document.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:chunk_size]
+            )
+            if not pks:
+                break
+            index_in_batches(pks, chunk_size)
+            indexed += len(pks)
+            last_pk = pks[-1]
+            self.stdout.write(f'Indexed {indexed} documents')
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt the {backend.name} search index of {indexed} documents')
+        )
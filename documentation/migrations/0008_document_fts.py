@@ -0,0 +1,52 @@
+# Generated by Django 5.0 on 2026-10-18 09:45
+
+from django.db import migrations
+from django.utils.html import strip_tags
+
+FTS_TABLE = 'documentation_document_fts'
+
+
+def create_fts_table(apps, schema_editor):
+    """Create and fill the FTS5 index of documents; only SQLite has one."""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    Document = apps.get_model('documentation', 'Document')
+    TaggedItem = apps.get_model('taggit', 'TaggedItem')
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+        "USING fts5(title, content, tags, tokenize='porter unicode61')"
+    )
+
+    tags = {}
+    content_type = ContentType.objects.filter(app_label='documentation', model='document').first()
+    if content_type:
+        items = TaggedItem.objects.filter(content_type=content_type).values_list('object_id', 'tag__name')
+        for object_id, name in items:
+            tags.setdefault(object_id, []).append(name)
+
+    with schema_editor.connection.cursor() as cursor:
+        for pk, title, content in Document.objects.values_list('pk', 'title', 'content').iterator():
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, title, content, tags) VALUES (%s, %s, %s, %s)',
+                [pk, title, strip_tags(content), ' '.join(tags.get(pk, []))]
+            )
+
+
+def drop_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('taggit', '0005_auto_20220424_2025'),
+        ('documentation', '0007_remove_document_views_count_document_views'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_table, drop_fts_table),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.0 on 2026-10-18 09:57
+
+from django.db import migrations
+
+# Trigram indexes answering the autocomplete ILIKE filters; other databases use an in-memory prefix index
+TRIGRAM_INDEXES = [
+    ('documentation_document_title_trgm', 'documentation_document', 'title'),
+    ('documentation_category_name_trgm', 'documentation_category', 'name'),
+    ('documentation_taggit_tag_name_trgm', 'taggit_tag', 'name'),
+]
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, table, column in TRIGRAM_INDEXES:
+        # Matches the UPPER(column::text) LIKE ... that istartswith and icontains compile to
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON {table} USING gin ((UPPER({column}::text)) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _, _ in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taggit', '0005_auto_20220424_2025'),
+        ('documentation', '0008_document_fts'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -1,16 +1,17 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 from django.utils.text import slugify
-from django.contrib.postgres.search import SearchVectorField, SearchVector, SearchQuery, SearchRank
-from django.db.models import F, Value, Q
+from django.contrib.postgres.search import SearchVectorField
+from django.db.models import F
 from django.contrib.postgres.indexes import GinIndex
+from django.urls import reverse
 from taggit.managers import TaggableManager
-from django.db.models.signals import post_save
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.dispatch import receiver
-from django.db.models.functions import Coalesce
-from django.db import connection
 from ckeditor.fields import RichTextField
-import uuid
+from .autocomplete import invalidate_prefix_index
+from .indexing import mark_dirty
+from .search import documents_with_all_tags, get_search_backend
 import os
 import mimetypes
 
@@ -97,30 +98,22 @@ class Document(models.Model):
     @staticmethod
     def search(query=None, category=None, tags=None, sort_by='recent', author=None):
         queryset = Document.objects.all()
+        backend = get_search_backend()
 
-        if query and connection.vendor == 'postgresql':
-            search_query = SearchQuery(query)
-            queryset = queryset.filter(search_vector=search_query)
-            queryset = queryset.annotate(rank=SearchRank('search_vector', search_query))
-        elif query:
-            queryset = queryset.filter(
-                Q(title__icontains=query) |
-                Q(content__icontains=query) |
-                Q(tags__name__icontains=query)
-            )
+        if query:
+            queryset = backend.search(queryset, query)
 
         if category:
             queryset = queryset.filter(category=category)
 
         if tags:
-            for tag in tags:
-                queryset = queryset.filter(tags__name__in=[tag])
+            queryset = queryset.filter(pk__in=documents_with_all_tags(tags))
 
         if author:
             queryset = queryset.filter(author=author)
 
         # Apply sorting
-        if sort_by == 'relevance' and query and connection.vendor == 'postgresql':
+        if sort_by == 'relevance' and query and backend.ranks:
             queryset = queryset.order_by('-rank', '-created_at')
         elif sort_by == 'views':
             queryset = queryset.order_by('-views', '-created_at')
@@ -129,24 +122,36 @@ class Document(models.Model):
         else:  # recent
             queryset = queryset.order_by('-created_at')
 
-        return queryset.distinct()
+        return queryset
 
 @receiver(post_save, sender=Document)
-def update_search_vector(sender, instance, **kwargs):
-    """Update search_vector after the document is saved."""
-    if instance.pk and connection.vendor == 'postgresql':  # Only update if using PostgreSQL
-        # Get the tag names as a list
-        tag_names = list(instance.tags.values_list('name', flat=True))
-        tag_vector = SearchVector(Value(' '.join(tag_names)), weight='C')
-        
-        # Create and combine the search vectors
-        Document.objects.filter(pk=instance.pk).update(
-            search_vector=(
-                SearchVector('title', weight='A') +
-                SearchVector('content', weight='B') +
-                tag_vector
-            )
-        )
+def update_search_index(sender, instance, **kwargs):
+    """Queue the document's full-text index entry for an update after commit."""
+    if instance.pk:
+        mark_dirty([instance.pk])
+
+@receiver(m2m_changed, sender=Document.tags.through)
+def update_search_index_tags(sender, instance, action, **kwargs):
+    """Tags are indexed too, so re-index a document when its tags change."""
+    if action in ('post_add', 'post_remove', 'post_clear') and isinstance(instance, Document):
+        mark_dirty([instance.pk])
+
+@receiver(post_delete, sender=Document)
+def remove_from_search_index(sender, instance, **kwargs):
+    mark_dirty([instance.pk])
+
+@receiver(post_save, sender=Document)
+@receiver(post_delete, sender=Document)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def refresh_autocomplete(sender, **kwargs):
+    """Titles and category names are autocomplete suggestions; rebuild them after a change."""
+    invalidate_prefix_index()
+
+@receiver(m2m_changed, sender=Document.tags.through)
+def refresh_autocomplete_tags(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate_prefix_index()
 
 class Attachment(models.Model):
     document = models.ForeignKey(Document, on_delete=models.CASCADE, related_name='attachments')
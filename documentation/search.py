@@ -0,0 +1,268 @@
+import html
+import re
+from abc import ABC, abstractmethod
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import Count, OuterRef, Q, Subquery, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Coalesce
+from django.utils.html import strip_tags
+from taggit.models import Tag, TaggedItem
+
+FTS_TABLE = 'documentation_document_fts'
+
+# bm25 weights of the title, content and tags columns, like the A/B/C weights on PostgreSQL
+FTS_COLUMN_WEIGHTS = (10.0, 5.0, 2.0)
+
+# Marks around matched terms in raw fragments; control characters never survive into page text
+HIGHLIGHT_START = '\x02'
+HIGHLIGHT_STOP = '\x03'
+# Characters of context kept around the first match by the plain-text excerpt
+SNIPPET_CONTEXT = 80
+
+
+def render_fragment(raw):
+    """Turn a raw fragment of document content into escaped HTML with ``<mark>`` around matches."""
+    text = ' '.join(html.unescape(strip_tags(raw)).split())
+    return html.escape(text, quote=False).replace(HIGHLIGHT_START, '<mark>').replace(HIGHLIGHT_STOP, '</mark>')
+
+
+def excerpt(content, query):
+    """Raw fragment of ``content`` around the first word of ``query`` it contains."""
+    text = ' '.join(html.unescape(strip_tags(content)).split())
+    words = re.findall(r'\w+', query)
+    if not words:
+        return text[:SNIPPET_CONTEXT * 2]
+    pattern = re.compile('|'.join(re.escape(word) for word in words), re.IGNORECASE)
+    match = pattern.search(text)
+    start = max(match.start() - SNIPPET_CONTEXT, 0) if match else 0
+    fragment = text[start:start + SNIPPET_CONTEXT * 3]
+    fragment = pattern.sub(lambda m: f'{HIGHLIGHT_START}{m.group(0)}{HIGHLIGHT_STOP}', fragment)
+    return ('…' if start else '') + fragment + ('…' if start + SNIPPET_CONTEXT * 3 < len(text) else '')
+
+
+class SearchBackend(ABC):
+    """Full-text search over documents.
+
+    ``search`` narrows a document queryset to the matches of a query; when
+    ``ranks`` is true it also annotates ``rank``, higher meaning more
+    relevant. ``index_documents`` and ``remove_documents`` keep the
+    backend's index in step with the ``Document`` table. ``snippets``
+    returns highlighted excerpts of matching documents.
+    """
+    name = None
+    ranks = False
+
+    @abstractmethod
+    def search(self, queryset, query):
+        pass
+
+    def index_document(self, document):
+        self.index_documents([document.pk])
+
+    def snippets(self, pks, query):
+        """Map each of the documents to an HTML excerpt with the query terms in ``<mark>``."""
+        from .models import Document
+
+        return {
+            pk: render_fragment(excerpt(content, query))
+            for pk, content in Document.objects.filter(pk__in=list(pks)).values_list('pk', 'content')
+        }
+
+    def index_documents(self, pks):
+        """Bring the index entries of these documents up to date, dropping deleted ones."""
+        pass
+
+    def remove_documents(self, pks):
+        pass
+
+    def clear(self):
+        pass
+
+
+class BasicSearchBackend(SearchBackend):
+    """Substring matching for databases without a full-text index; needs no upkeep."""
+    name = 'basic'
+
+    def search(self, queryset, query):
+        # Tags are matched in a subquery, so a document with several matching tags appears once
+        return queryset.filter(
+            Q(title__icontains=query) |
+            Q(content__icontains=query) |
+            Q(pk__in=document_tags().filter(tag__name__icontains=query).values('object_id'))
+        )
+
+
+class PostgresSearchBackend(SearchBackend):
+    """tsvector search on ``Document.search_vector``, ranked with ts_rank."""
+    name = 'postgres'
+    ranks = True
+
+    def search(self, queryset, query):
+        search_query = SearchQuery(query)
+        return queryset.filter(search_vector=search_query).annotate(
+            rank=SearchRank('search_vector', search_query)
+        )
+
+    def index_documents(self, pks):
+        from .models import Document
+
+        tag_names = document_tags().filter(object_id=OuterRef('pk')).values('object_id').annotate(
+            names=StringAgg('tag__name', ' ')
+        ).values('names')
+        Document.objects.filter(pk__in=list(pks)).update(
+            search_vector=(
+                SearchVector('title', weight='A') +
+                SearchVector('content', weight='B') +
+                SearchVector(Coalesce(Subquery(tag_names), Value('')), weight='C')
+            )
+        )
+
+    def snippets(self, pks, query):
+        from .models import Document
+
+        headlines = Document.objects.filter(pk__in=list(pks)).annotate(
+            headline=SearchHeadline(
+                'content', SearchQuery(query), start_sel=HIGHLIGHT_START, stop_sel=HIGHLIGHT_STOP,
+                max_fragments=2, fragment_delimiter=' … '
+            )
+        ).values_list('pk', 'headline')
+        return {pk: render_fragment(headline) for pk, headline in headlines}
+
+    def clear(self):
+        from .models import Document
+
+        Document.objects.update(search_vector=None)
+
+
+def document_tags():
+    """TaggedItem rows of documents."""
+    from .models import Document
+
+    return TaggedItem.objects.filter(content_type=ContentType.objects.get_for_model(Document))
+
+
+def documents_with_all_tags(names):
+    """Ids of the documents tagged with every one of ``names``, as a subquery.
+
+    The tagged items of all the names are read in one pass and grouped by
+    document, instead of joining the tag table once per name. Tags are
+    matched by id rather than through a join, so the tagged items are
+    found with the tag index.
+    """
+    names = set(names)
+    tag_ids = Tag.objects.filter(name__in=names).values('pk')
+    return document_tags().filter(tag_id__in=tag_ids).values('object_id').annotate(
+        matched=Count('tag_id')
+    ).filter(matched=len(names)).values('object_id')
+
+
+def fts_query(query):
+    """Turn user input into an FTS5 query matching documents that contain every word.
+
+    Each word is quoted, so FTS5 operators and punctuation in the input are
+    taken literally, as PostgreSQL's plain search queries do.
+    """
+    words = re.findall(r'\w+', query)
+    return ' '.join(f'"{word}"' for word in words)
+
+
+class SQLiteFTS5Backend(SearchBackend):
+    """FTS5 search on SQLite, ranked with bm25.
+
+    The ``documentation_document_fts`` virtual table (created by migration)
+    holds the plain text of each document's title, content and tags under
+    the document's id as rowid.
+    """
+    name = 'sqlite_fts5'
+    ranks = True
+
+    def search(self, queryset, query):
+        match = fts_query(query)
+        if not match:
+            return queryset.none()
+        # The id subquery is answered from the FTS index once; bm25 is then
+        # looked up only for the documents that matched.
+        weights = ', '.join(str(weight) for weight in FTS_COLUMN_WEIGHTS)
+        table = queryset.model._meta.db_table
+        return queryset.filter(
+            pk__in=RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", (match,))
+        ).annotate(
+            rank=RawSQL(
+                f"SELECT -bm25({FTS_TABLE}, {weights}) FROM {FTS_TABLE} "
+                f"WHERE {FTS_TABLE} MATCH %s AND rowid = {table}.id",
+                (match,)
+            )
+        )
+
+    def index_documents(self, pks):
+        from .models import Document
+
+        pks = list(pks)
+        if not pks:
+            return
+        tags = {}
+        for object_id, name in document_tags().filter(object_id__in=pks).values_list('object_id', 'tag__name'):
+            tags.setdefault(object_id, []).append(name)
+        rows = [
+            (pk, title, strip_tags(content), ' '.join(tags.get(pk, [])))
+            for pk, title, content in Document.objects.filter(pk__in=pks).values_list('pk', 'title', 'content')
+        ]
+        # Documents deleted in the meantime just drop out of the index
+        self.remove_documents(pks)
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {FTS_TABLE} (rowid, title, content, tags) VALUES (%s, %s, %s, %s)", rows
+            )
+
+    def snippets(self, pks, query):
+        pks = list(pks)
+        match = fts_query(query)
+        if not pks or not match:
+            return super().snippets(pks, query)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid, snippet({FTS_TABLE}, 1, %s, %s, '…', 32) FROM {FTS_TABLE} "
+                f"WHERE {FTS_TABLE} MATCH %s AND rowid IN ({', '.join(['%s'] * len(pks))})",
+                [HIGHLIGHT_START, HIGHLIGHT_STOP, match, *pks]
+            )
+            return {pk: render_fragment(fragment) for pk, fragment in cursor.fetchall()}
+
+    def remove_documents(self, pks):
+        pks = list(pks)
+        if not pks:
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({', '.join(['%s'] * len(pks))})", pks
+            )
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+
+
+BACKENDS = {
+    backend.name: backend
+    for backend in (BasicSearchBackend, PostgresSearchBackend, SQLiteFTS5Backend)
+}
+
+
+def get_search_backend():
+    """Return the search backend for the default database.
+
+    ``DOCUMENTATION_SEARCH_BACKEND`` names one explicitly; otherwise
+    PostgreSQL gets tsvector search, SQLite gets FTS5 and anything else
+    substring matching.
+    """
+    name = getattr(settings, 'DOCUMENTATION_SEARCH_BACKEND', None)
+    if name is None:
+        name = {'postgresql': 'postgres', 'sqlite': 'sqlite_fts5'}.get(connection.vendor, 'basic')
+    try:
+        return BACKENDS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown search backend: {name}")
@@ -55,11 +55,11 @@ class DocumentSerializer(TaggitSerializer, serializers.ModelSerializer):
         model = Document
         fields = [
             'id', 'title', 'slug', 'content', 'category', 'category_id', 'author',
-            'created_at', 'updated_at', 'is_public', 'views_count',
+            'created_at', 'updated_at', 'is_public', 'views',
             'tags', 'parent', 'children', 'order', 'is_index',
             'attachments'
         ]
-        read_only_fields = ['id', 'slug', 'created_at', 'updated_at', 'views_count']
+        read_only_fields = ['id', 'slug', 'created_at', 'updated_at', 'views']
 
     def get_children(self, obj):
         children = obj.children.all()
@@ -80,12 +80,17 @@ class DocumentListSerializer(TaggitSerializer, serializers.ModelSerializer):
         queryset=Category.objects.all(),
         write_only=True
     )
+    snippet = serializers.SerializerMethodField()
 
     class Meta:
         model = Document
         fields = [
             'id', 'title', 'slug', 'category', 'category_id', 'author',
-            'created_at', 'updated_at', 'is_public', 'views_count',
-            'tags', 'order', 'is_index'
+            'created_at', 'updated_at', 'is_public', 'views',
+            'tags', 'order', 'is_index', 'snippet'
         ]
-        read_only_fields = ['id', 'slug', 'created_at', 'updated_at', 'views_count']
+        read_only_fields = ['id', 'slug', 'created_at', 'updated_at', 'views']
+
+    def get_snippet(self, obj):
+        """Highlighted excerpt of a full-text search result, or None outside a search."""
+        return getattr(obj, 'snippet', None)
@@ -0,0 +1,42 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.safestring import mark_safe
+
+from .search import get_search_backend
+
+
+def snippet_cache_key(backend, document, query):
+    """Key of a document's snippet; editing the document changes ``updated_at`` and so the key."""
+    digest = hashlib.sha256(query.encode('utf-8')).hexdigest()
+    version = document.updated_at.timestamp() if document.updated_at else ''
+    return f'documentation:snippet:{backend}:{document.pk}:{version}:{digest}'
+
+
+def attach_snippets(documents, query):
+    """Set ``snippet`` on each document to a highlighted excerpt matching ``query``.
+
+    Pass only the documents that are shown, such as the current page;
+    excerpts are cached per document version and query, and only the
+    missing ones are computed, in one query.
+    """
+    documents = list(documents)
+    query = ' '.join(query.lower().split())
+    if not documents or not query:
+        return documents
+
+    backend = get_search_backend()
+    keys = {document.pk: snippet_cache_key(backend.name, document, query) for document in documents}
+    cached = cache.get_many(keys.values())
+    missing = [pk for pk, key in keys.items() if key not in cached]
+    if missing:
+        fresh = backend.snippets(missing, query)
+        fresh = {keys[pk]: fresh.get(pk, '') for pk in missing}
+        cache.set_many(fresh, getattr(settings, 'DOCUMENTATION_SEARCH_SNIPPET_CACHE_TIMEOUT', 3600))
+        cached.update(fresh)
+
+    for document in documents:
+        # Fragments are escaped by the backend, apart from the <mark> tags it adds
+        document.snippet = mark_safe(cached[keys[document.pk]])
+    return documents
@@ -1,10 +1,17 @@
-from django.test import TestCase
-from unittest import skipUnless
+from io import StringIO
+from django.test import RequestFactory, TestCase
+from unittest import mock, skipUnless
+from django.core.cache import cache
+from django.core.management import call_command
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from django.contrib.postgres.search import SearchVector
-from django.db import connection
+from django.db import connection, transaction
+from ..admin import DocumentAdmin, admin_site
+from ..autocomplete import PrefixIndex, database_suggestions
+from ..indexing import mark_dirty
 from ..models import Document, Category
+from ..snippets import attach_snippets
 from taggit.models import Tag
 
 User = get_user_model()
@@ -195,3 +202,309 @@ class BasicDocumentTests(TestCase):
         self.doc.increment_views()
         self.doc.refresh_from_db()
         self.assertEqual(self.doc.views, initial_views + 1)
+
+
+class TagFilterTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.both = Document.objects.create(title='Both', content='Body', author=self.user)
+        self.both.tags.add('python', 'web', 'guide')
+        self.python = Document.objects.create(title='Python only', content='Body', author=self.user)
+        self.python.tags.add('python', 'guide')
+
+    def test_matches_documents_with_every_tag(self):
+        self.assertEqual(set(Document.search(tags=['python'])), {self.both, self.python})
+        self.assertEqual(list(Document.search(tags=['python', 'web'])), [self.both])
+        self.assertEqual(list(Document.search(tags=['web', 'python', 'web'])), [self.both])
+        self.assertEqual(list(Document.search(tags=['python', 'missing'])), [])
+
+    def test_filters_in_one_query_without_duplicates(self):
+        with self.assertNumQueries(1):
+            results = list(Document.search(tags=['python', 'web', 'guide'], sort_by='title'))
+        self.assertEqual(results, [self.both])
+
+    def test_basic_search_lists_a_document_once(self):
+        with self.settings(DOCUMENTATION_SEARCH_BACKEND='basic'):
+            self.assertEqual(list(Document.search(query='o', tags=['guide'], sort_by='title')), [self.both, self.python])
+
+
+@skipUnless(connection.vendor == 'sqlite', 'FTS5 search is the SQLite backend.')
+class SQLiteFTSSearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        # The index is updated after commit, which TestCase otherwise never reaches
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_documents()
+
+    def create_documents(self):
+        self.guide = Document.objects.create(
+            title='Python Programming Guide',
+            content='<p>Learn programming from scratch</p>',
+            author=self.user
+        )
+        self.guide.tags.add('guide')
+        self.django = Document.objects.create(
+            title='Django Web Development',
+            content='<p>Build web applications with Django, a Python framework</p>',
+            author=self.user
+        )
+        self.javascript = Document.objects.create(
+            title='JavaScript Basics',
+            content='<p>Introduction to JavaScript</p>',
+            author=self.user
+        )
+        self.javascript.tags.add('frontend')
+
+    def test_uses_fts5_backend(self):
+        from ..search import get_search_backend
+        self.assertEqual(get_search_backend().name, 'sqlite_fts5')
+
+    def test_ranks_title_matches_first(self):
+        results = list(Document.search(query='python', sort_by='relevance'))
+        self.assertEqual(results[:2], [self.guide, self.django])
+        self.assertGreater(results[0].rank, results[1].rank)
+
+    def test_matches_every_word_with_stemming(self):
+        results = Document.search(query='building applications')
+        self.assertEqual(list(results), [self.django])
+
+    def test_tags_are_indexed_when_they_change(self):
+        self.assertEqual(list(Document.search(query='tutorial')), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.javascript.tags.add('tutorial')
+        self.assertEqual(list(Document.search(query='tutorial')), [self.javascript])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.javascript.tags.remove('tutorial')
+        self.assertEqual(list(Document.search(query='tutorial')), [])
+
+    def test_updates_and_deletes_are_reflected(self):
+        self.guide.title = 'Rust Programming Guide'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.guide.save()
+        self.assertEqual(list(Document.search(query='rust')), [self.guide])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.guide.delete()
+        self.assertEqual(list(Document.search(query='rust')), [])
+
+    def test_query_syntax_is_taken_literally(self):
+        self.assertEqual(list(Document.search(query='"django" -(')), [self.django])
+        self.assertEqual(list(Document.search(query='***')), [])
+
+    def test_relevance_sort_in_list_view(self):
+        response = self.client.get(reverse('documentation:document_list'), {'q': 'python', 'sort': 'relevance'})
+        self.assertEqual(response.status_code, 200)
+        content = response.content.decode()
+        self.assertLess(content.find('Python Programming Guide'), content.find('Django Web Development'))
+        self.assertNotContains(response, 'JavaScript Basics')
+
+    def test_list_view_shows_highlighted_snippets(self):
+        response = self.client.get(reverse('documentation:document_list'), {'q': 'python'})
+        self.assertContains(response, 'with Django, a <mark>Python</mark> framework')
+
+    def test_api_ranks_results_with_snippets(self):
+        response = self.client.get(reverse('documentation:document-list'), {'q': 'python'})
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual([result['title'] for result in results], ['Python Programming Guide', 'Django Web Development'])
+        self.assertIn('with Django, a <mark>Python</mark> framework', results[1]['snippet'])
+
+
+@skipUnless(connection.vendor == 'sqlite', 'FTS5 search is the SQLite backend.')
+class SnippetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.document = Document.objects.create(
+                title='Caching',
+                content='<p>Cache keys &amp; <b>versions</b>: &lt;script&gt; tags in caching guides</p>',
+                author=self.user
+            )
+
+    def test_snippets_are_escaped_with_marked_terms(self):
+        document, = attach_snippets(Document.search(query='caching'), 'caching')
+        self.assertEqual(
+            document.snippet,
+            '<mark>Cache</mark> keys &amp; versions: &lt;script&gt; tags in <mark>caching</mark> guides'
+        )
+
+    def test_snippets_are_cached_per_document_version(self):
+        with mock.patch('documentation.search.SQLiteFTS5Backend.snippets', autospec=True, return_value={}) as snippets:
+            attach_snippets([self.document], 'Caching  guides')
+            attach_snippets([self.document], 'caching guides')
+            self.assertEqual(snippets.call_count, 1)
+
+            attach_snippets([self.document], 'keys')
+            self.assertEqual(snippets.call_count, 2)
+
+            with self.captureOnCommitCallbacks(execute=True):
+                self.document.save()
+            attach_snippets([self.document], 'caching guides')
+            self.assertEqual(snippets.call_count, 3)
+
+    def test_basic_backend_excerpt(self):
+        with self.settings(DOCUMENTATION_SEARCH_BACKEND='basic'):
+            document, = attach_snippets([self.document], 'version')
+        self.assertIn('<mark>version</mark>s', document.snippet)
+        self.assertNotIn('<b>', document.snippet)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'FTS5 search is the SQLite backend.')
+class DeferredIndexingTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+
+    def create_document(self, title, tags=()):
+        with self.captureOnCommitCallbacks(execute=True):
+            document = Document.objects.create(title=title, content='<p>Body</p>', author=self.user)
+            document.tags.add(*tags)
+        return document
+
+    def test_changes_in_one_transaction_are_indexed_once(self):
+        with mock.patch('documentation.search.SQLiteFTS5Backend.index_documents', autospec=True) as index:
+            with self.captureOnCommitCallbacks(execute=True):
+                with transaction.atomic():
+                    document = Document.objects.create(title='Caching', content='Body', author=self.user)
+                    document.tags.set(['redis', 'performance'])
+                    document.save()
+                self.assertEqual(index.call_count, 0)
+        self.assertEqual(index.call_count, 1)
+        self.assertEqual(index.call_args.args[1], [document.pk])
+
+    def test_index_reflects_state_at_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                document = Document.objects.create(title='Caching', content='Body', author=self.user)
+                document.tags.set(['redis'])
+        self.assertEqual(list(Document.search(query='redis')), [document])
+
+    def test_flush_indexes_in_batches(self):
+        first = self.create_document('First')
+        second = self.create_document('Second')
+        third = self.create_document('Third')
+        with self.settings(DOCUMENTATION_SEARCH_INDEX_BATCH_SIZE=2), \
+                mock.patch('documentation.search.SQLiteFTS5Backend.index_documents', autospec=True) as index:
+            with self.captureOnCommitCallbacks(execute=True):
+                Document.objects.filter(pk=first.pk).update(title='Changed')
+                mark_dirty([third.pk, first.pk, second.pk])
+        self.assertEqual([call.args[1] for call in index.call_args_list], [[first.pk, second.pk], [third.pk]])
+
+    def test_reindex_command_rebuilds_the_index(self):
+        document = self.create_document('Caching', tags=['redis'])
+        # Changes made behind the ORM's back are not indexed until a rebuild
+        Document.objects.filter(pk=document.pk).update(title='Memoization')
+        self.assertEqual(list(Document.search(query='memoization')), [])
+
+        out = StringIO()
+        call_command('reindex_documents', chunk_size=1, stdout=out)
+
+        self.assertEqual(list(Document.search(query='memoization')), [document])
+        self.assertEqual(list(Document.search(query='redis')), [document])
+        self.assertIn('1 documents', out.getvalue())
+
+    def test_reindex_command_clear_drops_orphans(self):
+        document = self.create_document('Caching')
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO documentation_document_fts (rowid, title, content, tags) VALUES (%s, 'Orphan', '', '')",
+                [document.pk + 100]
+            )
+
+        call_command('reindex_documents', stdout=StringIO())
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT count(*) FROM documentation_document_fts")
+            self.assertEqual(cursor.fetchone()[0], 2)
+
+        call_command('reindex_documents', clear=True, stdout=StringIO())
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT rowid FROM documentation_document_fts")
+            self.assertEqual(cursor.fetchall(), [(document.pk,)])
+
+
+class AutocompleteTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category = Category.objects.create(name='Web Frameworks')
+            self.document = Document.objects.create(title='Django Web Development', content='Body', author=self.user)
+            self.document.tags.add('deployment')
+            private = Document.objects.create(
+                title='Private Deployment Notes', content='Body', author=self.user, is_public=False
+            )
+            private.tags.add('secret')
+
+    def suggest(self, query, **params):
+        response = self.client.get(reverse('documentation:autocomplete'), {'q': query, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results']
+
+    def test_suggests_titles_tags_and_categories(self):
+        self.assertEqual(self.suggest('dja'), [{
+            'type': 'document', 'label': 'Django Web Development',
+            'url': reverse('documentation:document_detail', args=[self.document.slug]),
+        }])
+        self.assertEqual([result['type'] for result in self.suggest('DEPLOY')], ['tag'])
+        self.assertEqual([result['label'] for result in self.suggest('web')], ['Web Frameworks', 'Django Web Development'])
+
+    def test_skips_tags_used_only_by_private_documents(self):
+        self.assertEqual(self.suggest('secret'), [])
+        self.assertEqual(database_suggestions('secret', 8), [])
+        self.assertEqual([result['type'] for result in database_suggestions('deploy', 8)], ['tag'])
+
+    def test_matches_word_prefixes_only(self):
+        self.assertEqual(self.suggest('web dev'), [self.suggest('dja')[0]])
+        self.assertEqual(self.suggest('eb'), [])
+        self.assertEqual(self.suggest('  '), [])
+
+    def test_limit(self):
+        self.assertEqual(len(self.suggest('web', limit=1)), 1)
+        self.assertEqual(len(self.suggest('web', limit='many')), 2)
+
+    def test_index_is_refreshed_after_changes(self):
+        self.assertEqual(self.suggest('flask'), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            Document.objects.create(title='Flask Basics', content='Body', author=self.user)
+        self.assertEqual([result['label'] for result in self.suggest('flask')], ['Flask Basics'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.document.tags.add('flask')
+        self.assertEqual([result['type'] for result in self.suggest('flask')], ['tag', 'document'])
+
+    def admin_action(self, action, queryset):
+        request = RequestFactory().post('/')
+        request.user = self.user
+        document_admin = DocumentAdmin(Document, admin_site)
+        with mock.patch.object(document_admin, 'message_user'), self.captureOnCommitCallbacks(execute=True):
+            getattr(document_admin, action)(request, queryset)
+
+    def test_admin_visibility_actions_refresh_suggestions(self):
+        self.assertEqual(len(self.suggest('django')), 1)
+        self.admin_action('make_private', Document.objects.filter(pk=self.document.pk))
+        self.assertEqual(self.suggest('django'), [])
+        self.assertEqual(self.suggest('deploy'), [])
+
+        self.admin_action('make_public', Document.objects.filter(title='Private Deployment Notes'))
+        self.assertEqual([result['label'] for result in self.suggest('private')], ['Private Deployment Notes'])
+        self.assertEqual([result['label'] for result in self.suggest('secret')], ['secret'])
+
+    def test_changes_from_other_processes_refresh_suggestions(self):
+        self.assertEqual(len(self.suggest('django')), 1)
+        # Another process with its own local cache: no version bump reaches this one
+        with mock.patch('documentation.autocomplete.invalidate_prefix_index'):
+            Document.objects.filter(pk=self.document.pk).update(is_public=False)
+        self.assertEqual(self.suggest('django'), [])
+
+    def test_prefix_index_lookup(self):
+        index = PrefixIndex([
+            ('document', 'Caching Guide', 'caching-guide'),
+            ('document', 'Redis Caching', 'redis-caching'),
+            ('category', 'Cache', 'cache'),
+        ])
+        self.assertEqual([result['label'] for result in index.lookup('cach', 8)], ['Cache', 'Caching Guide', 'Redis Caching'])
+        self.assertEqual([result['label'] for result in index.lookup('cach', 2)], ['Cache', 'Caching Guide'])
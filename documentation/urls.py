@@ -13,6 +13,7 @@ router.register(r'attachments', api.AttachmentViewSet, basename='attachment')
 urlpatterns = [
     # Document URLs
     path('', views.DocumentListView.as_view(), name='document_list'),
+    path('autocomplete/', views.autocomplete, name='autocomplete'),
     path('create/', views.DocumentCreateView.as_view(), name='document_create'),
     path('document/<slug:slug>/', views.DocumentDetailView.as_view(), name='document_detail'),
     path('document/<slug:slug>/update/', views.DocumentUpdateView.as_view(), name='document_update'),
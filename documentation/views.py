@@ -7,6 +7,8 @@ from django.db.models import Count, Q
 from django.contrib.postgres.search import SearchQuery, SearchRank
 from .models import Document, Category, Attachment
 from .forms import DocumentForm
+from .autocomplete import suggest
+from .snippets import attach_snippets
 from taggit.models import Tag
 from django.http import JsonResponse, HttpResponseRedirect
 from django.contrib.auth import get_user_model
@@ -70,6 +72,9 @@ class DocumentListView(ListView):
         context['current_category'] = self.request.GET.get('category')
         context['current_tags'] = self.request.GET.getlist('tag')
         context['current_query'] = self.request.GET.get('q', '')
+        if context['current_query']:
+            # Excerpts only for the page being shown
+            context['documents'] = attach_snippets(context['documents'], context['current_query'])
         return context
 
 class DocumentDetailView(DetailView):
@@ -183,3 +188,15 @@ def delete_attachment(request, pk):
             return JsonResponse({'status': 'success'})
         return JsonResponse({'status': 'error', 'message': 'Not authorized'}, status=403)
     return JsonResponse({'status': 'error', 'message': 'Invalid method'}, status=405)
+
+def autocomplete(request):
+    """Suggestions for the search box, light enough to fetch on every keystroke."""
+    query = request.GET.get('q', '')
+    try:
+        limit = int(request.GET.get('limit', 8))
+    except ValueError:
+        limit = 8
+    response = JsonResponse({'query': query, 'results': suggest(query, limit)})
+    # Suggestions only cover public documents, so shared caches may keep them briefly
+    response['Cache-Control'] = 'public, max-age=30'
+    return response
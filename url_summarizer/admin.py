@@ -1,3 +1,33 @@
 from django.contrib import admin
 
-# Register your models here.
+from documentation.admin import admin_site
+
+from .instrumentation import call_stats
+from .models import LLMCall
+
+
+@admin.register(LLMCall)
+class LLMCallAdmin(admin.ModelAdmin):
+    list_display = [
+        'created_at', 'operation', 'model', 'outcome', 'prompt_tokens', 'completion_tokens',
+        'cost', 'total_ms', 'llm_ms', 'retries', 'cache_hits'
+    ]
+    list_filter = ['operation', 'outcome', 'model', 'created_at']
+    search_fields = ['url', 'error']
+    date_hierarchy = 'created_at'
+
+    # Rows are written by the instrumentation only
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        extra_context = extra_context or {}
+        extra_context['llm_stats'] = call_stats(LLMCall.objects.all())
+        return super().changelist_view(request, extra_context)
+
+
+# The site served at /admin/
+admin_site.register(LLMCall, LLMCallAdmin)
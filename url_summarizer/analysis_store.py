@@ -0,0 +1,96 @@
+from django.conf import settings
+from django.utils import timezone
+
+from .fetch_cache import url_key
+from .models import WebsiteAnalysis
+
+
+def latest_analysis(url):
+    return WebsiteAnalysis.objects.filter(key=url_key(url)).first()
+
+
+def analyze_and_store(analyzer, url, mode=None, probe_assets=None, thumbnails=False):
+    """Analyze a page incrementally against its last stored analysis.
+
+    Returns ``(analysis, record, unchanged)``. An unchanged page only has
+    its ``checked_at`` bumped; any change is stored as a new history row.
+    """
+    if not getattr(settings, 'URL_SUMMARIZER_ANALYSIS_STORE_ENABLED', True):
+        return analyzer.analyze_website(url, mode, probe_assets, thumbnails), None, False
+
+    previous = latest_analysis(url)
+    run = analyzer.run_analysis(url, mode, probe_assets, thumbnails, previous=previous)
+
+    if run.unchanged:
+        previous.checked_at = timezone.now()
+        previous.save(update_fields=['checked_at'])
+        return run.analysis, previous, True
+
+    record = WebsiteAnalysis.objects.create(
+        key=url_key(url),
+        url=url,
+        mode=mode or getattr(settings, 'URL_SUMMARIZER_ANALYSIS_MODE', 'static'),
+        result=run.analysis,
+        **run.fingerprint
+    )
+    return run.analysis, record, False
+
+
+def _list_diff(old, new):
+    old, new = list(old or []), list(new or [])
+    changes = {
+        'added': [value for value in new if value not in old],
+        'removed': [value for value in old if value not in new],
+    }
+    return changes if changes['added'] or changes['removed'] else None
+
+
+def diff_design(old, new):
+    """Describe what changed between two ``design_elements`` dicts.
+
+    Only changed parts are included, so an empty dict means no change.
+    """
+    diff = {}
+    for field in ('colors', 'typography'):
+        changes = _list_diff(old.get(field), new.get(field))
+        if changes:
+            diff[field] = changes
+
+    spacing = {}
+    for kind in ('margins', 'padding', 'alignment'):
+        changes = _list_diff(old.get('spacing', {}).get(kind), new.get('spacing', {}).get(kind))
+        if changes:
+            spacing[kind] = changes
+    if spacing:
+        diff['spacing'] = spacing
+
+    old_layout, new_layout = old.get('layout', {}), new.get('layout', {})
+    layout = {
+        field: {'from': old_layout.get(field), 'to': new_layout.get(field)}
+        for field in ('grid_usage', 'flexbox_usage', 'main_sections')
+        if old_layout.get(field) != new_layout.get(field)
+    }
+    if layout:
+        diff['layout'] = layout
+    return diff
+
+
+def design_history(url, limit=20):
+    """Return the stored runs for a page, newest first, each diffed against the run before it."""
+    records = list(WebsiteAnalysis.objects.filter(key=url_key(url))[:limit + 1])
+    history = []
+    for record, older in zip(records, records[1:] + [None]):
+        if len(history) == limit:
+            break
+        history.append({
+            'id': record.id,
+            'mode': record.mode,
+            'fingerprint': record.fingerprint,
+            'created_at': record.created_at.isoformat(),
+            'checked_at': record.checked_at.isoformat(),
+            'design_changes': (
+                diff_design(older.result['design_elements'], record.result['design_elements'])
+                if older else None
+            ),
+        })
+    return history
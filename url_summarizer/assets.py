@@ -0,0 +1,184 @@
+import base64
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from io import BytesIO
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from PIL import Image
+
+from .fetching import raise_for_status
+from .http_session import get_session
+
+CONTENT_RANGE_RE = re.compile(r'bytes \d+-\d+/(\d+)')
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class AssetProber:
+    """Reads size, type and dimensions of image assets without downloading them.
+
+    Each asset gets one ranged GET for its first ``URL_SUMMARIZER_ASSET_PROBE_BYTES``,
+    which carries the same headers a HEAD request would plus enough of the
+    file for Pillow to read the dimensions. Probes run concurrently with a
+    per-host limit, and results are cached per asset URL.
+    """
+
+    def __init__(self, session=None, max_entries=None):
+        self.session = session
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def probe_all(self, urls, thumbnails=False, deadline=None):
+        """Probe up to ``URL_SUMMARIZER_ASSET_PROBE_MAX`` assets within ``deadline`` seconds.
+
+        Returns a dict of asset URL to probe result. Assets that could not
+        be probed in time are left out, so the caller never waits longer
+        than the deadline.
+        """
+        deadline = deadline if deadline is not None else _setting('URL_SUMMARIZER_ASSET_PROBE_DEADLINE', 3.0)
+        max_probes = _setting('URL_SUMMARIZER_ASSET_PROBE_MAX', 50)
+        workers = _setting('URL_SUMMARIZER_ASSET_PROBE_WORKERS', 8)
+        per_host_limit = _setting('URL_SUMMARIZER_ASSET_PROBE_PER_HOST', 4)
+        expires = time.monotonic() + deadline
+
+        results = {}
+        pending = []
+        for url in OrderedDict.fromkeys(urls):
+            cached = self.get_cached(url, thumbnails)
+            if cached is not None:
+                results[url] = cached
+            elif len(pending) < max_probes:
+                pending.append(url)
+        if not pending:
+            return results
+
+        host_slots = {
+            urlsplit(url).hostname: threading.BoundedSemaphore(per_host_limit)
+            for url in pending
+        }
+
+        def probe(url):
+            with host_slots[urlsplit(url).hostname]:
+                remaining = expires - time.monotonic()
+                if remaining <= 0:
+                    return None
+                return self.probe(url, thumbnails, timeout=remaining)
+
+        pool = ThreadPoolExecutor(max_workers=min(workers, len(pending)), thread_name_prefix='asset-probe')
+        futures = {pool.submit(probe, url): url for url in pending}
+        done, _ = wait(futures, timeout=max(expires - time.monotonic(), 0))
+        # Do not wait for stragglers; their request timeouts end at the deadline
+        pool.shutdown(wait=False, cancel_futures=True)
+
+        for future in done:
+            info = future.result()
+            if info is not None:
+                results[futures[future]] = info
+        return results
+
+    def probe(self, url, thumbnails=False, timeout=10):
+        """Probe a single asset, returning None if it cannot be fetched."""
+        session = self.session or get_session()
+        probe_bytes = _setting('URL_SUMMARIZER_ASSET_PROBE_BYTES', 16384)
+        limit = _setting('URL_SUMMARIZER_ASSET_THUMBNAIL_MAX_BYTES', 1024 * 1024) if thumbnails else probe_bytes
+
+        try:
+            response = session.get(
+                url, headers={'Range': f'bytes=0-{limit - 1}'}, timeout=timeout, stream=True
+            )
+            raise_for_status(response)
+            data = read_prefix(response, limit)
+        except Exception:
+            return None
+
+        mime_type = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+        info = {
+            'bytes': content_size(response),
+            'mime_type': mime_type,
+            'width': None,
+            'height': None,
+        }
+        try:
+            image = Image.open(BytesIO(data))
+            info['width'], info['height'] = image.size
+            info['mime_type'] = info['mime_type'] or Image.MIME.get(image.format, '')
+        except Exception:
+            image = None
+
+        if thumbnails:
+            info['thumbnail'] = make_thumbnail(image) if image is not None else None
+
+        self._store(url, info)
+        return info
+
+    def get_cached(self, url, thumbnails=False):
+        """Return the cached probe of ``url``, with a thumbnail only if ``thumbnails`` is true."""
+        with self._lock:
+            info = self._entries.get(url)
+            if info is None or (thumbnails and 'thumbnail' not in info):
+                return None
+            self._entries.move_to_end(url)
+        if not thumbnails and 'thumbnail' in info:
+            # Probed for a request that wanted thumbnails; this one did not ask for it
+            info = {key: value for key, value in info.items() if key != 'thumbnail'}
+        return info
+
+    def _store(self, url, info):
+        max_entries = self.max_entries or _setting('URL_SUMMARIZER_ASSET_CACHE_SIZE', 1024)
+        with self._lock:
+            self._entries[url] = info
+            self._entries.move_to_end(url)
+            while len(self._entries) > max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def read_prefix(response, limit, chunk_size=8192):
+    """Read at most ``limit`` bytes of a streamed body, for servers that ignore Range."""
+    chunks = []
+    received = 0
+    try:
+        for chunk in response.iter_content(chunk_size=chunk_size):
+            chunks.append(chunk[:limit - received])
+            received += len(chunks[-1])
+            if received >= limit:
+                break
+    finally:
+        response.close()
+    return b''.join(chunks)
+
+
+def content_size(response):
+    """Full size of the asset, from Content-Range on partial responses."""
+    if response.status_code == 206:
+        match = CONTENT_RANGE_RE.match(response.headers.get('Content-Range', ''))
+        return int(match.group(1)) if match else None
+    length = response.headers.get('Content-Length')
+    return int(length) if length and length.isdigit() else None
+
+
+def make_thumbnail(image):
+    """Return a small PNG data URI of the image, or None if it was only partly downloaded."""
+    size = _setting('URL_SUMMARIZER_ASSET_THUMBNAIL_SIZE', 64)
+    try:
+        image.thumbnail((size, size))
+        if image.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+            image = image.convert('RGBA')
+        buffer = BytesIO()
+        image.save(buffer, format='PNG', optimize=True)
+    except Exception:
+        return None
+    return 'data:image/png;base64,' + base64.b64encode(buffer.getvalue()).decode('ascii')
+
+
+asset_prober = AssetProber()
@@ -0,0 +1,130 @@
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import reduce
+from operator import or_
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Q
+from django.utils.text import slugify
+
+from documentation.autocomplete import invalidate_prefix_index
+from documentation.models import Document
+from documentation.indexing import mark_dirty
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def interleave_by_host(urls):
+    """Order URLs round-robin across hosts so one slow host does not hold every worker."""
+    by_host = OrderedDict()
+    for url in urls:
+        by_host.setdefault(urlsplit(url).hostname, []).append(url)
+    queues = list(by_host.values())
+    ordered = []
+    while queues:
+        for queue in queues:
+            ordered.append(queue.pop(0))
+        queues = [queue for queue in queues if queue]
+    return ordered
+
+
+def summarize_batch(urls, summarizer_pool=None, fetch_concurrency=None, per_host_limit=None, llm_concurrency=None):
+    """Summarize many URLs with bounded concurrency.
+
+    Pages are fetched by up to ``fetch_concurrency`` workers, with at most
+    ``per_host_limit`` requests in flight per host. At most ``llm_concurrency``
+    summaries are generated at once. Returns one result dict per input URL,
+    in input order, with ``url``, ``summary`` and ``error`` keys.
+
+    Each worker checks a summarizer out of ``summarizer_pool`` (the shared
+    pool by default), so no LLM client is built per URL.
+    """
+    if summarizer_pool is None:
+        from .crew import summarizer_pool
+    fetch_concurrency = fetch_concurrency or _setting('URL_SUMMARIZER_BATCH_FETCH_CONCURRENCY', 16)
+    per_host_limit = per_host_limit or _setting('URL_SUMMARIZER_BATCH_PER_HOST_LIMIT', 4)
+    llm_concurrency = llm_concurrency or _setting('URL_SUMMARIZER_BATCH_LLM_CONCURRENCY', 4)
+
+    host_slots = {
+        urlsplit(url).hostname: threading.BoundedSemaphore(per_host_limit)
+        for url in urls
+    }
+    llm_slots = threading.BoundedSemaphore(llm_concurrency)
+
+    def process(url):
+        try:
+            with summarizer_pool.acquire() as summarizer:
+                with host_slots[urlsplit(url).hostname]:
+                    content = summarizer._fetch_url_content(url)
+                with llm_slots:
+                    summary = summarizer.summarize_content(content)
+            return {'url': url, 'summary': summary, 'error': ''}
+        except Exception as e:
+            return {'url': url, 'summary': '', 'error': str(e)}
+        finally:
+            connections.close_all()
+
+    with ThreadPoolExecutor(max_workers=fetch_concurrency, thread_name_prefix='summarizer-batch') as pool:
+        ordered = interleave_by_host(urls)
+        results = dict(zip(ordered, pool.map(process, ordered)))
+    return [results[url] for url in urls]
+
+
+def summary_title(summary, url):
+    """Use the summary's first heading as its title, like the summarizer page does."""
+    match = re.search(r'^#\s+(.+)$', summary, re.MULTILINE)
+    if match:
+        return match.group(1).strip()[:200]
+    parts = urlsplit(url)
+    return f"Summary of {parts.hostname}{parts.path}"[:200]
+
+
+def _taken_slugs(bases):
+    taken = set()
+    bases = list(bases)
+    # Chunked so SQLite does not hit its expression depth limit
+    for i in range(0, len(bases), 100):
+        query = reduce(or_, (Q(slug__startswith=base) for base in bases[i:i + 100]))
+        taken.update(Document.objects.filter(query).values_list('slug', flat=True))
+    return taken
+
+
+def create_documents(results, author, is_public=True):
+    """Save successful batch results as documents with a single bulk insert."""
+    pending = []
+    for result in results:
+        if result['summary']:
+            title = summary_title(result['summary'], result['url'])
+            pending.append((result, title, slugify(title)[:190] or 'url-summary'))
+    if not pending:
+        return []
+
+    taken = _taken_slugs({base for _, _, base in pending})
+    documents = []
+    for result, title, base in pending:
+        slug = base
+        counter = 1
+        while slug in taken:
+            slug = f"{base}-{counter}"
+            counter += 1
+        taken.add(slug)
+        documents.append(Document(
+            title=title,
+            slug=slug,
+            content=result['summary'],
+            author=author,
+            is_public=is_public
+        ))
+
+    documents = Document.objects.bulk_create(documents)
+
+    # bulk_create skips the post_save receivers that maintain the search and autocomplete indexes
+    mark_dirty([document.pk for document in documents])
+    invalidate_prefix_index()
+    return documents
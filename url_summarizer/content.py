@@ -0,0 +1,329 @@
+import re
+from collections import namedtuple
+
+from bs4 import Comment, NavigableString
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+# Elements that never hold article text
+DROPPED_TAGS = [
+    'script', 'style', 'noscript', 'template', 'svg', 'iframe', 'nav', 'header', 'footer', 'aside',
+    'form', 'button', 'select', 'dialog',
+]
+BLOCK_TAGS = {
+    'p', 'li', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'pre', 'blockquote', 'td', 'th', 'dd', 'dt',
+    'figcaption', 'div', 'section', 'article', 'main', 'body', 'ul', 'ol', 'table', 'tr',
+}
+HEADING_TAGS = {'h1', 'h2', 'h3', 'h4', 'h5', 'h6'}
+
+NEGATIVE_HINTS = re.compile(
+    r'comment|cookie|consent|gdpr|banner|masthead|menu|nav|sidebar|sponsor|share|social|promo|'
+    r'related|breadcrumb|popup|modal|newsletter|subscribe|advert|\bads?\b|footer|widget',
+    re.IGNORECASE
+)
+POSITIVE_HINTS = re.compile(r'article|content|entry|main|post|story|text|body|blog|prose', re.IGNORECASE)
+BOILERPLATE_TEXT = re.compile(
+    r'cookies?|accept all|privacy policy|terms of (use|service)|all rights reserved|'
+    r'sign up|log in|subscribe|newsletter|skip to content',
+    re.IGNORECASE
+)
+
+# Non-heading blocks shorter than this are treated as navigation or labels
+MIN_BLOCK_CHARS = 25
+# Blocks scoring below this are dropped as boilerplate
+MIN_BLOCK_SCORE = 1.0
+# Ancestor levels whose class/id hints count towards a block's score
+HINT_DEPTH = 4
+# Rough characters per token for English prose with the OpenAI tokenizers
+CHARS_PER_TOKEN = 4
+
+ContentBlock = namedtuple('ContentBlock', ['position', 'tag', 'text', 'score'])
+
+
+class SoupPage:
+    """Access to a BeautifulSoup tree for ``extract_blocks``."""
+
+    def __init__(self, soup):
+        self.soup = soup
+
+    def drop(self, tags):
+        for element in self.soup(tags):
+            element.decompose()
+
+    def strings(self):
+        """``(text, parent)`` of every text node, in document order."""
+        for string in self.soup.find_all(string=True):
+            if isinstance(string, Comment) or not isinstance(string, NavigableString):
+                continue
+            yield string, string.parent
+
+    def has_main(self):
+        return self.soup.find(['main', 'article']) is not None
+
+    @staticmethod
+    def key(node):
+        return id(node)
+
+    @staticmethod
+    def name(node):
+        return node.name
+
+    @staticmethod
+    def parent(node):
+        return node.parent
+
+    @staticmethod
+    def hints(node):
+        return ' '.join(node.get('class') or []) + ' ' + (node.get('id') or '')
+
+
+class LexborPage(SoupPage):
+    """Access to a selectolax Lexbor tree for ``extract_blocks``.
+
+    selectolax hands out a new wrapper object on every access, so nodes are
+    told apart by the address of the underlying Lexbor node.
+    """
+
+    def __init__(self, tree):
+        self.tree = tree
+
+    def drop(self, tags):
+        for element in self.tree.css(', '.join(tags)):
+            element.decompose()
+
+    def strings(self):
+        if self.tree.root is None:
+            return
+        for node in self.tree.root.traverse(include_text=True):
+            if node.tag == '-text':
+                yield node.text_content or '', node.parent
+
+    def has_main(self):
+        return self.tree.css_first('main, article') is not None
+
+    @staticmethod
+    def key(node):
+        return node.mem_id
+
+    @staticmethod
+    def name(node):
+        return node.tag
+
+    @staticmethod
+    def hints(node):
+        attributes = node.attributes
+        return (attributes.get('class') or '') + ' ' + (attributes.get('id') or '')
+
+
+def _hint_weight(page, element, has_main):
+    """Multiplier from the element's position and the class/id names around it."""
+    weight = 1.0
+    ancestors = []
+    node = element
+    while node is not None:
+        ancestors.append(node)
+        node = page.parent(node)
+    if any(page.name(node) in ('main', 'article') for node in ancestors):
+        weight *= 1.5
+    elif has_main:
+        weight *= 0.5
+
+    for node in ancestors[:HINT_DEPTH + 1]:
+        names = page.hints(node)
+        if not names.strip():
+            continue
+        if NEGATIVE_HINTS.search(names):
+            weight *= 0.2
+        elif POSITIVE_HINTS.search(names):
+            weight *= 1.5
+    return weight
+
+
+def score_block(tag, text, link_chars, hint_weight):
+    """Readability-style value of a block of text; higher means more likely main content."""
+    if tag in HEADING_TAGS:
+        return 1.5 * min(hint_weight, 1.0)
+    length = len(text)
+    if length < MIN_BLOCK_CHARS:
+        return 0.0
+    score = 1.0 + text.count(',') + min(length / 100, 3.0)
+    score *= 1.0 - min(link_chars / length, 1.0)
+    if length < 200 and BOILERPLATE_TEXT.search(text):
+        score *= 0.1
+    return score * hint_weight
+
+
+def extract_blocks(tree):
+    """Split a page into text blocks scored by text density, links and class hints.
+
+    ``tree`` is a BeautifulSoup tree or a selectolax Lexbor tree. Each
+    string is attributed to its nearest block-level ancestor, so a
+    paragraph inside a div is its own block while text sitting directly in
+    the div forms another. Returns every block in document order.
+    """
+    if LexborHTMLParser is not None and isinstance(tree, LexborHTMLParser):
+        page = LexborPage(tree)
+    else:
+        page = SoupPage(tree)
+    page.drop(DROPPED_TAGS)
+
+    blocks = {}
+    for string, parent in page.strings():
+        text = string.strip()
+        if not text:
+            continue
+        block = parent
+        in_link = False
+        while block is not None and page.name(block) not in BLOCK_TAGS:
+            in_link = in_link or page.name(block) == 'a'
+            block = page.parent(block)
+        if block is None:
+            block = parent
+        entry = blocks.setdefault(page.key(block), {'element': block, 'parts': [], 'link_chars': 0})
+        entry['parts'].append(text)
+        if in_link:
+            entry['link_chars'] += len(text)
+
+    has_main = page.has_main()
+    result = []
+    for position, entry in enumerate(blocks.values()):
+        element = entry['element']
+        name = page.name(element)
+        text = ' '.join(' '.join(entry['parts']).split())
+        score = score_block(name, text, entry['link_chars'], _hint_weight(page, element, has_main))
+        result.append(ContentBlock(position, name, text, score))
+    return result
+
+
+def rank_blocks(blocks):
+    """Content blocks, best first, with boilerplate removed."""
+    return sorted((block for block in blocks if block.score >= MIN_BLOCK_SCORE), key=lambda block: -block.score)
+
+
+def extract_content(tree):
+    """Main content of a page as paragraphs separated by blank lines.
+
+    Boilerplate blocks are dropped and the rest kept in document order.
+    Headings are written as markdown headings so ``pack_content`` can keep
+    them with their section.
+    """
+    kept = sorted(rank_blocks(extract_blocks(tree)), key=lambda block: block.position)
+    paragraphs = []
+    for block in kept:
+        if block.tag in HEADING_TAGS:
+            paragraphs.append('#' * int(block.tag[1]) + ' ' + block.text)
+        else:
+            paragraphs.append(block.text)
+
+    # Trailing headings have nothing under them
+    while paragraphs and paragraphs[-1].startswith('#'):
+        paragraphs.pop()
+    return '\n\n'.join(paragraphs)
+
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def paragraph_value(text, position, count):
+    """Text-only value of a paragraph for packing, favouring earlier ones slightly."""
+    score = 1.0 + text.count(',') + text.count('. ') + min(len(text) / 100, 3.0)
+    return score * (1.0 - 0.3 * position / max(count, 1))
+
+
+def pack_content(content, budget_tokens):
+    """Fill a token budget with the most valuable paragraphs of ``content``.
+
+    Paragraphs are picked best first and written out in their original
+    order, each with the heading it sits under. Content that already fits
+    is returned unchanged.
+    """
+    if estimate_tokens(content) <= budget_tokens:
+        return content
+
+    paragraphs = [paragraph.strip() for paragraph in content.split('\n\n') if paragraph.strip()]
+    heading_of = {}
+    current_heading = None
+    for index, paragraph in enumerate(paragraphs):
+        if paragraph.startswith('#'):
+            current_heading = index
+        else:
+            heading_of[index] = current_heading
+
+    ranked = sorted(heading_of, key=lambda index: -paragraph_value(paragraphs[index], index, len(paragraphs)))
+    chosen = set()
+    used = 0
+    for index in ranked:
+        heading = heading_of[index]
+        cost = estimate_tokens(paragraphs[index])
+        if heading is not None and heading not in chosen:
+            cost += estimate_tokens(paragraphs[heading])
+        if used + cost > budget_tokens:
+            continue
+        chosen.add(index)
+        if heading is not None:
+            chosen.add(heading)
+        used += cost
+
+    if not chosen:
+        # A single paragraph larger than the budget; keep its beginning
+        return content[:budget_tokens * CHARS_PER_TOKEN]
+    return '\n\n'.join(paragraphs[index] for index in sorted(chosen))
+
+
+def chunk_content(content, max_tokens):
+    """Split content into chunks of at most ``max_tokens``, on section boundaries.
+
+    Consecutive small sections share a chunk; a section larger than the
+    limit is split between paragraphs, and a single oversized paragraph is
+    cut on whitespace.
+    """
+    paragraphs = [paragraph.strip() for paragraph in content.split('\n\n') if paragraph.strip()]
+    sections = []
+    for paragraph in paragraphs:
+        if paragraph.startswith('#') or not sections:
+            sections.append([])
+        sections[-1].append(paragraph)
+
+    chunks = []
+    current = []
+    used = 0
+
+    def flush():
+        nonlocal current, used
+        if current:
+            chunks.append('\n\n'.join(current))
+        current, used = [], 0
+
+    for section in sections:
+        cost = sum(estimate_tokens(paragraph) for paragraph in section)
+        if used + cost <= max_tokens:
+            current.extend(section)
+            used += cost
+            continue
+        flush()
+        for paragraph in section:
+            for piece in _split_paragraph(paragraph, max_tokens):
+                piece_cost = estimate_tokens(piece)
+                if used + piece_cost > max_tokens:
+                    flush()
+                current.append(piece)
+                used += piece_cost
+    flush()
+    return chunks
+
+
+def _split_paragraph(paragraph, max_tokens):
+    max_chars = max(max_tokens - 1, 1) * CHARS_PER_TOKEN
+    pieces = []
+    while len(paragraph) > max_chars:
+        cut = paragraph.rfind(' ', 0, max_chars)
+        cut = cut if cut > 0 else max_chars
+        pieces.append(paragraph[:cut])
+        paragraph = paragraph[cut:].strip()
+    if paragraph:
+        pieces.append(paragraph)
+    return pieces
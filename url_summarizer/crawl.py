@@ -0,0 +1,218 @@
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urldefrag, urljoin, urlsplit
+from urllib.robotparser import RobotFileParser
+
+from django.conf import settings
+
+from .dom import SEMANTIC_TAGS
+from .fetch_cache import normalize_url
+from .fetching import raise_for_status, read_html
+from .http_session import USER_AGENT
+from .parse_service import get_parse_service
+
+# Links to these are never pages, so they are not crawled
+SKIPPED_EXTENSIONS = (
+    '.css', '.js', '.json', '.xml', '.rss', '.pdf', '.zip', '.gz', '.tar', '.dmg', '.exe',
+    '.png', '.jpg', '.jpeg', '.gif', '.svg', '.webp', '.ico', '.mp3', '.mp4', '.webm', '.woff', '.woff2',
+)
+
+# Most frequent values kept in the site profile
+PROFILE_TOP_VALUES = 50
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def origin_of(url):
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}".lower()
+
+
+class RobotsCache:
+    """robots.txt rules per origin, fetched once and shared by the crawl workers."""
+
+    def __init__(self, session, user_agent=USER_AGENT):
+        self.session = session
+        self.user_agent = user_agent
+        self._parsers = {}
+        self._lock = threading.Lock()
+
+    def allowed(self, url):
+        origin = origin_of(url)
+        with self._lock:
+            parser = self._parsers.get(origin)
+            if parser is None:
+                parser = self._parsers[origin] = self._fetch(origin)
+        return parser.can_fetch(self.user_agent, url)
+
+    def _fetch(self, origin):
+        parser = RobotFileParser(f"{origin}/robots.txt")
+        try:
+            response = self.session.get(f"{origin}/robots.txt", timeout=5)
+        except Exception:
+            parser.allow_all = True
+            return parser
+        # As in RobotFileParser.read(): auth errors forbid everything, other errors allow it
+        if response.status_code in (401, 403):
+            parser.disallow_all = True
+        elif response.status_code >= 400:
+            parser.allow_all = True
+        else:
+            parser.parse(response.text.splitlines())
+        return parser
+
+
+def page_links(stats, page_url, origin):
+    """Return the same-origin page URLs linked from a page, without fragments."""
+    links = []
+    for href in stats.links:
+        url, _ = urldefrag(urljoin(page_url, href.strip()))
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https') or origin_of(url) != origin:
+            continue
+        if parts.path.lower().endswith(SKIPPED_EXTENSIONS):
+            continue
+        links.append(url)
+    return links
+
+
+class SiteProfile:
+    """Site-wide design profile built up from the analysis of each crawled page."""
+
+    def __init__(self):
+        self.colors = Counter()
+        self.fonts = Counter()
+        self.components = {tag: Counter() for tag in SEMANTIC_TAGS + ['form']}
+        self.grid_pages = 0
+        self.flexbox_pages = 0
+        self.images = Counter()
+        self.pages = []
+
+    def add_page(self, page):
+        entry = {'url': page['url'], 'depth': page['depth']}
+        if 'error' in page:
+            entry['error'] = page['error']
+            self.pages.append(entry)
+            return
+
+        design, layout, structure = page['design'], page['layout'], page['structure']
+        # Counted once per page, so values used site-wide rank first
+        self.colors.update(set(design['colors']))
+        self.fonts.update(set(design['typography']))
+        self.grid_pages += layout['grid_usage']
+        self.flexbox_pages += layout['flexbox_usage']
+
+        counts = dict(structure['semantic_elements'], form=structure['forms'])
+        for tag, count in counts.items():
+            if count:
+                self.components[tag]['pages'] += 1
+                self.components[tag]['count'] += count
+
+        self.images.update({image['url'] for image in page['assets']['images']})
+        entry.update(colors=len(design['colors']), images=len(page['assets']['images']))
+        self.pages.append(entry)
+
+    @property
+    def pages_analyzed(self):
+        return sum(1 for page in self.pages if 'error' not in page)
+
+    def as_dict(self):
+        return {
+            'pages_analyzed': self.pages_analyzed,
+            'pages_failed': len(self.pages) - self.pages_analyzed,
+            'colors': [
+                {'value': value, 'pages': pages}
+                for value, pages in self.colors.most_common(PROFILE_TOP_VALUES)
+            ],
+            'typography': [
+                {'value': value, 'pages': pages}
+                for value, pages in self.fonts.most_common(PROFILE_TOP_VALUES)
+            ],
+            'components': {
+                tag: {'pages': counts['pages'], 'count': counts['count']}
+                for tag, counts in self.components.items()
+            },
+            'layout': {
+                'grid_pages': self.grid_pages,
+                'flexbox_pages': self.flexbox_pages,
+            },
+            'assets': {
+                'unique_images': len(self.images),
+                # Images on more than one page are usually logos and icons
+                'shared_images': [
+                    {'url': url, 'pages': pages}
+                    for url, pages in self.images.most_common(PROFILE_TOP_VALUES) if pages > 1
+                ],
+            },
+            'pages': self.pages,
+        }
+
+
+def crawl_site(url, analyzer, max_pages=None, max_depth=None, probe_assets=False, progress=None):
+    """Crawl same-origin pages breadth-first and return the site's design profile.
+
+    Up to ``max_pages`` pages at most ``max_depth`` links from ``url`` are
+    analyzed on ``URL_SUMMARIZER_CRAWL_CONCURRENCY`` threads, honouring
+    robots.txt. Stylesheets and asset probes go through the shared caches,
+    so a sheet used on every page is downloaded and parsed once.
+    ``progress(pages_done, pages_found, url)`` is called after each page.
+    """
+    max_pages = max_pages or _setting('URL_SUMMARIZER_CRAWL_MAX_PAGES', 200)
+    max_depth = max_depth if max_depth is not None else _setting('URL_SUMMARIZER_CRAWL_MAX_DEPTH', 3)
+    concurrency = _setting('URL_SUMMARIZER_CRAWL_CONCURRENCY', 8)
+
+    origin = origin_of(url)
+    robots = RobotsCache(analyzer.session)
+    profile = SiteProfile()
+
+    def analyze_page(page_url, depth):
+        page = {'url': page_url, 'depth': depth}
+        try:
+            if not robots.allowed(page_url):
+                raise Exception("Disallowed by robots.txt")
+            response = analyzer.session.get(page_url, headers=analyzer.headers, timeout=10, stream=True)
+            raise_for_status(response)
+            stats = get_parse_service().collect_dom(read_html(response))
+
+            inline_sheets, _, remote_sheets = analyzer._load_stylesheets(stats, page_url)
+            assets = analyzer._collect_assets(stats, page_url)
+            if probe_assets:
+                analyzer._probe_assets(assets)
+            page.update(
+                design=analyzer._extract_design_elements(stats, inline_sheets + remote_sheets),
+                layout=analyzer._analyze_layout(stats),
+                structure=analyzer._analyze_structure(stats),
+                assets=assets,
+                links=page_links(stats, page_url, origin),
+            )
+        except Exception as e:
+            page['error'] = str(e)
+        return page
+
+    seen = {normalize_url(url)}
+    level = [url]
+    started = 0
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='site-crawl') as pool:
+        for depth in range(max_depth + 1):
+            level = level[:max_pages - started]
+            if not level:
+                break
+            started += len(level)
+
+            futures = [pool.submit(analyze_page, page_url, depth) for page_url in level]
+            level = []
+            for future in as_completed(futures):
+                page = future.result()
+                profile.add_page(page)
+                # Links from the deepest level would never be crawled
+                for link in page.get('links', []) if depth < max_depth else []:
+                    key = normalize_url(link)
+                    if key not in seen:
+                        seen.add(key)
+                        level.append(link)
+                if progress:
+                    progress(len(profile.pages), min(len(seen), max_pages), page['url'])
+    return profile.as_dict()
@@ -1,26 +1,92 @@
 from crewai import Agent, Task, Crew
-import requests
-from bs4 import BeautifulSoup
 from dotenv import load_dotenv
 import os
 from langchain_openai import ChatOpenAI
+from langchain_core.messages import HumanMessage, SystemMessage
+from asgiref.sync import sync_to_async
+from django.conf import settings
+import asyncio
+import logging
 import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from .content import chunk_content, estimate_tokens, pack_content
+from .fetch_cache import FetchCache
+from .http_session import USER_AGENT
+from .instrumentation import (
+    CallRecord, bind_current, count_cache_hits, stage, track_llm_call, usage_callback
+)
+from .llm_guard import BackendUnavailable, get_llm_guard
+from .parse_service import get_parse_service
+from .pool import InstancePool
+from .summary_cache import SummaryCache
+from .summary_filter import SummaryFilter, clean_summary_output
 
 # Load environment variables
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+SUMMARY_PROMPT = """Write a technical summary of the content. Do not include any meta text like 'I will start writing' or 'Article Summary'.
+Start directly with a # heading for the title. Example:
+
+# Machine Learning Fundamentals
+
+## Overview
+Machine learning is a branch of artificial intelligence...
+
+## Key Components
+- Neural Networks: Core building blocks...
+- Training Data: Essential input for...
+- Algorithms: Mathematical approaches...
+
+Now write your summary for this content:
+{content}..."""
+
+# The part of a long document each summary covers in "chunked" mode
+CHUNK_PROMPT = """Summarize this section of a longer technical document in a few factual bullet points.
+Keep names, numbers and technical details. Do not add an introduction, a conclusion or any meta text.
+
+Section:
+{content}"""
+
+REDUCE_PROMPT = "The content below consists of summaries of consecutive sections of one long document.\n" + SUMMARY_PROMPT
+
+SUMMARY_MODES = ('packed', 'chunked')
+
+# Map passes over chunk summaries before the rest is packed into the reduce prompt
+MAX_REDUCE_PASSES = 3
+
+_chunk_slots = None
+_chunk_slots_lock = threading.Lock()
+
+
+def get_chunk_slots():
+    """Process-wide limit on chunk summaries in flight, shared by every summarizer."""
+    global _chunk_slots
+    if _chunk_slots is None:
+        with _chunk_slots_lock:
+            if _chunk_slots is None:
+                _chunk_slots = threading.BoundedSemaphore(
+                    getattr(settings, 'URL_SUMMARIZER_CHUNK_CONCURRENCY', 4)
+                )
+    return _chunk_slots
+
 class URLSummarizer:
     def __init__(self):
         """Initialize the URL summarizer."""
         self.headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+            'User-Agent': USER_AGENT
         }
         
         # Initialize OpenAI chat model
         self.llm = ChatOpenAI(
             model="gpt-3.5-turbo",
             temperature=0,
-            api_key=os.getenv('OPENAI_API_KEY')
+            api_key=os.getenv('OPENAI_API_KEY'),
+            callbacks=[usage_callback],
+            # Retries are left to the process-wide LLM guard
+            max_retries=0
         )
         
         # Configure the summarizer agent
@@ -36,33 +102,25 @@ class URLSummarizer:
             llm=self.llm
         )
 
-    def _fetch_url_content(self, url):
-        """Fetch and clean content from a URL."""
+        self.fetch_cache = FetchCache()
+        self.summary_cache = SummaryCache()
+
+    def _fetch_url_content(self, url, full=False):
+        """Fetch and clean content from a URL, reusing the fetch cache when possible.
+
+        With ``full`` the whole page is read rather than stopping once there
+        is enough text for a single prompt.
+        """
         try:
-            response = requests.get(url, headers=self.headers, timeout=10)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Remove script, style, and nav elements
-            for element in soup(['script', 'style', 'nav', 'header', 'footer']):
-                element.decompose()
-            
-            # Get main content
-            main_content = soup.find('main') or soup.find('article') or soup.find('body')
-            if main_content:
-                text = main_content.get_text()
-            else:
-                text = soup.get_text()
-            
-            # Clean up text
-            lines = (line.strip() for line in text.splitlines())
-            chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-            text = ' '.join(chunk for chunk in chunks if chunk)
-            
-            return text
+            with stage('fetch'):
+                return self.fetch_cache.fetch(url, self._extract_text, headers=self.headers, timeout=10, full=full)
         except Exception as e:
             raise Exception(f"Error fetching URL content: {str(e)}")
 
+    def _extract_text(self, html):
+        """Extract the main content of an HTML document, one block per paragraph."""
+        return get_parse_service().extract_content(html)
+
     def _clean_summary(self, text):
         """Clean up the summary text by removing AI-generated prefixes and formatting."""
         # Remove common AI response prefixes
@@ -139,28 +197,120 @@ class URLSummarizer:
 
         return crew
 
-    def get_summary(self, url: str) -> str:
-        """Get a summary of the content at the given URL."""
-        try:
-            content = self._fetch_url_content(url)
-            
-            # Create a task with a very strict template
-            summarize_task = Task(
-                description=f"""Write a technical summary of the content. Do not include any meta text like 'I will start writing' or 'Article Summary'.
-Start directly with a # heading for the title. Example:
+    def _build_prompt(self, content):
+        """Return the summary prompt for the page text and its summary cache key.
 
-# Machine Learning Fundamentals
+        The prompt gets the highest-value paragraphs that fit in
+        ``URL_SUMMARIZER_PROMPT_TOKEN_BUDGET`` rather than the first few KB.
+        """
+        excerpt = pack_content(content, getattr(settings, 'URL_SUMMARIZER_PROMPT_TOKEN_BUDGET', 1000))
+        cache_key = self.summary_cache.key_for(
+            excerpt, SUMMARY_PROMPT, self.llm.model_name, self.llm.temperature
+        )
+        return SUMMARY_PROMPT.format(content=excerpt), cache_key
 
-## Overview
-Machine learning is a branch of artificial intelligence...
+    def get_summary(self, url: str, mode: str = None) -> str:
+        """Get a summary of the content at the given URL.
 
-## Key Components
-- Neural Networks: Core building blocks...
-- Training Data: Essential input for...
-- Algorithms: Mathematical approaches...
+        ``mode`` is "packed" to summarize the best paragraphs that fit one
+        prompt, or "chunked" to summarize the whole page section by section
+        when it does not fit. Defaults to ``URL_SUMMARIZER_SUMMARY_MODE``.
+        """
+        mode = mode or getattr(settings, 'URL_SUMMARIZER_SUMMARY_MODE', 'packed')
+        if mode not in SUMMARY_MODES:
+            raise ValueError(f"Unknown summary mode: {mode}")
+        operation = 'chunked_summary' if mode == 'chunked' else 'summary'
+        with track_llm_call(operation, self.llm.model_name, url):
+            try:
+                content = self._fetch_url_content(url, full=mode == 'chunked')
+            except Exception as e:
+                raise Exception(f"Failed to generate summary: {str(e)}")
 
-Now write your summary for this content:
-{content[:4000]}...""",
+            budget = getattr(settings, 'URL_SUMMARIZER_PROMPT_TOKEN_BUDGET', 1000)
+            if mode == 'chunked' and estimate_tokens(content) > budget:
+                return self.summarize_chunked(content)
+            return self.summarize_content(content)
+
+    def summarize_chunked(self, content: str) -> str:
+        """Summarize a long text map-reduce style.
+
+        Sections are summarized concurrently, each cached by its own text so
+        an edit re-summarizes only the sections it touched, and a final pass
+        merges the section summaries into one document summary.
+        """
+        chunk_tokens = getattr(settings, 'URL_SUMMARIZER_CHUNK_TOKENS', 1500)
+        budget = getattr(settings, 'URL_SUMMARIZER_PROMPT_TOKEN_BUDGET', 1000)
+
+        with track_llm_call('chunked_summary', self.llm.model_name):
+            summaries = self._summarize_chunks(chunk_content(content, chunk_tokens))
+            combined = '\n\n'.join(summaries)
+            # Very long documents get further passes over their section summaries
+            for _ in range(MAX_REDUCE_PASSES - 1):
+                if estimate_tokens(combined) <= budget or len(summaries) < 2:
+                    break
+                summaries = self._summarize_chunks(chunk_content(combined, chunk_tokens))
+                combined = '\n\n'.join(summaries)
+            combined = pack_content(combined, budget)
+
+            cache_key = self.summary_cache.key_for(
+                combined, REDUCE_PROMPT, self.llm.model_name, self.llm.temperature
+            )
+            return self._run_summary_prompt(REDUCE_PROMPT.format(content=combined), cache_key)
+
+    def _summarize_chunks(self, chunks):
+        """Summarize chunks in parallel, in waves of ``URL_SUMMARIZER_CHUNK_CONCURRENCY``.
+
+        Cache lookups and writes stay on the calling thread; the worker
+        threads only make LLM calls.
+        """
+        keys = [
+            self.summary_cache.key_for(chunk, CHUNK_PROMPT, self.llm.model_name, self.llm.temperature)
+            for chunk in chunks
+        ]
+        summaries = [self.summary_cache.get(key) for key in keys]
+        missing = [index for index, summary in enumerate(summaries) if summary is None]
+        count_cache_hits(len(chunks) - len(missing))
+        if not missing:
+            return summaries
+
+        workers = min(getattr(settings, 'URL_SUMMARIZER_CHUNK_CONCURRENCY', 4), len(missing))
+        with stage('llm'), ThreadPoolExecutor(max_workers=workers, thread_name_prefix='summarizer-chunk') as pool:
+            results = list(pool.map(bind_current(self._summarize_chunk), [chunks[index] for index in missing]))
+
+        for index, summary in zip(missing, results):
+            summaries[index] = summary
+            self.summary_cache.set(keys[index], summary, model=self.llm.model_name)
+        return summaries
+
+    def _summarize_chunk(self, chunk):
+        # The LLM client is called directly: it is thread-safe, CrewAI agents are not
+        messages = [HumanMessage(content=CHUNK_PROMPT.format(content=chunk))]
+        # Retries keep the slot while backing off, so other chunks wait too
+        with get_chunk_slots():
+            response = get_llm_guard().call(lambda: self.llm.invoke(messages), estimate_tokens(messages[0].content))
+        summary = response.content.strip()
+
+        if not summary:
+            raise Exception("Empty response from AI")
+        return summary
+
+    def summarize_content(self, content: str) -> str:
+        """Summarize page text that has already been fetched and cleaned."""
+        with track_llm_call('summary', self.llm.model_name):
+            prompt, cache_key = self._build_prompt(content)
+            return self._run_summary_prompt(prompt, cache_key)
+
+    def _run_summary_prompt(self, prompt, cache_key):
+        """Run a summary prompt through the summarizer agent, or return its cached result."""
+        try:
+            cached_summary = self.summary_cache.get(cache_key)
+            if cached_summary is not None:
+                count_cache_hits()
+                return cached_summary
+
+            # Create a task with a very strict template
+            summarize_task = Task(
+                description=prompt,
                 agent=self.summarizer
             )
 
@@ -170,63 +320,95 @@ Now write your summary for this content:
                 verbose=False
             )
 
-            result = crew.kickoff()
+            with stage('llm'):
+                result = get_llm_guard().call(crew.kickoff, estimate_tokens(prompt))
             
             # Clean up the result
             if not result or not result.strip():
                 raise Exception("Empty response from AI")
                 
-            # Remove any meta-commentary
-            lines = result.split('\n')
-            content_lines = []
-            started = False
-            
-            for line in lines:
-                # Skip meta text lines
-                if any(skip in line.lower() for skip in [
-                    'i will', 'article summary', 'technical documentation',
-                    'following', 'structure', 'example', 'provided'
-                ]):
-                    continue
-                    
-                # Skip empty lines at start
-                if not started and not line.strip():
-                    continue
-                    
-                # Start capturing when we see a heading
-                if line.startswith('#'):
-                    started = True
-                    
-                # Once started, include all lines
-                if started:
-                    content_lines.append(line)
-            
-            # If we haven't found any content, try to find the first real line
-            if not content_lines:
-                content_lines = [line for line in lines 
-                               if line.strip() and 
-                               not line.startswith('[') and
-                               not any(skip in line.lower() for skip in [
-                                   'i will', 'article summary', 'technical documentation',
-                                   'following', 'structure', 'example', 'provided'
-                               ])]
-                
-            if not content_lines:
+            # Remove any meta-commentary and make sure the summary opens with a title
+            with stage('postprocess'):
+                cleaned_result = clean_summary_output(result)
+            if not cleaned_result:
                 raise Exception("No valid content found in the response")
-                
-            # Ensure first line is a title
-            if not content_lines[0].startswith('#'):
-                content_lines[0] = f"# {content_lines[0]}"
-            
-            cleaned_result = '\n'.join(content_lines).strip()
-            
+
             # Validate the result
             if len(cleaned_result) < 100:  # Arbitrary minimum length
                 raise Exception("Generated content is too short")
-                
+
+            self.summary_cache.set(cache_key, cleaned_result, model=self.llm.model_name)
             return cleaned_result
             
+        except BackendUnavailable:
+            raise
         except Exception as e:
-            print(f"Error in get_summary: {str(e)}")  # Add logging
-            print(f"Raw result: {result if 'result' in locals() else 'No result'}")  # Add logging
+            logger.warning(
+                "Summary generation failed: %s; raw result: %r", e, result if 'result' in locals() else None
+            )
             raise Exception(f"Failed to generate summary: {str(e)}")
+
+    async def astream_summary(self, url):
+        """Yield the summary for a URL in cleaned chunks as the model produces it.
+
+        Streamed responses carry no usage data, so the call is recorded with
+        estimated token counts.
+        """
+        record = CallRecord('stream_summary', self.llm.model_name, url)
+        try:
+            with record.stage('fetch'):
+                content = await sync_to_async(self._fetch_url_content)(url)
+            prompt, cache_key = self._build_prompt(content)
+
+            cached_summary = await sync_to_async(self.summary_cache.get)(cache_key)
+            if cached_summary is not None:
+                record.add_cache_hits()
+                yield cached_summary
+                return
+
+            messages = [
+                SystemMessage(content=f"You are {self.summarizer.role}. {self.summarizer.backstory}\n"
+                                      f"Your personal goal is: {self.summarizer.goal}"),
+                HumanMessage(content=prompt),
+            ]
+            summary_filter = SummaryFilter()
+            parts = []
+            raw_parts = []
+            prompt_tokens = sum(estimate_tokens(message.content) for message in messages)
+            guard = get_llm_guard()
+            wait, trial = guard.reserve(prompt_tokens)
+            with guard.monitored(trial):
+                if wait:
+                    await asyncio.sleep(wait)
+                with record.stage('llm'):
+                    async for chunk in self.llm.astream(messages):
+                        raw_parts.append(chunk.content)
+                        text = summary_filter.feed(chunk.content)
+                        if text:
+                            parts.append(text)
+                            yield text
+            record.add_usage(prompt_tokens, estimate_tokens(''.join(raw_parts)), estimated=True)
+
+            text = summary_filter.finish()
+            if text:
+                parts.append(text)
+                yield text
+
+            cleaned_result = ''.join(parts).strip()
+            if not cleaned_result:
+                raise Exception("No valid content found in the response")
+            if len(cleaned_result) >= 100:
+                await sync_to_async(self.summary_cache.set)(cache_key, cleaned_result, model=self.llm.model_name)
+        except (GeneratorExit, asyncio.CancelledError):
+            # The client went away mid-stream
+            record.cancelled = True
+            raise
+        except Exception as e:
+            record.error = str(e)
+            raise
+        finally:
+            await sync_to_async(record.finish)()
+
+
+# Shared across requests; use ``with summarizer_pool.acquire() as summarizer:``
+summarizer_pool = InstancePool(URLSummarizer)
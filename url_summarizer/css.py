@@ -0,0 +1,239 @@
+import hashlib
+import logging
+import re
+import threading
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from urllib.parse import urljoin
+
+import cssutils
+from django.conf import settings
+from django.utils import timezone
+
+from .fetching import raise_for_status
+from .http_session import get_session
+
+cssutils.log.setLevel(logging.CRITICAL)
+
+INLINE_COLOR_RE = re.compile(r'#[0-9a-fA-F]{3,6}|rgb\([^)]+\)|rgba\([^)]+\)')
+
+
+ParsedStylesheet = namedtuple('ParsedStylesheet', ['content_hash', 'declarations', 'imports'])
+
+
+class StylesheetCache:
+    """In-process LRU cache of parsed stylesheets, keyed by a hash of their text.
+
+    Only the ``(property, value)`` pairs and ``@import`` URLs are kept, not
+    the cssutils objects, so cached entries are small and safe to share
+    between threads.
+    """
+
+    def __init__(self, max_entries=None):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def parse(self, css_text):
+        """Return the parsed form of a stylesheet, parsing it only the first time."""
+        key = hashlib.sha256(css_text.encode('utf-8')).hexdigest()
+        with self._lock:
+            parsed = self._entries.get(key)
+            if parsed is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return parsed
+            self.misses += 1
+
+        # Imported here; the parse service itself depends on this module
+        from .parse_service import get_parse_service
+        parsed = get_parse_service().parse_css(css_text, key)
+
+        max_entries = self.max_entries or getattr(settings, 'URL_SUMMARIZER_CSS_CACHE_SIZE', 256)
+        with self._lock:
+            self._entries[key] = parsed
+            while len(self._entries) > max_entries:
+                self._entries.popitem(last=False)
+        return parsed
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+
+def parse_stylesheet(css_text, content_hash=''):
+    """Parse a stylesheet into its top-level declarations and ``@import`` URLs."""
+    # Imports are fetched by RemoteStylesheetCache, never by cssutils itself
+    parser = cssutils.CSSParser(fetcher=lambda url: None, loglevel=logging.CRITICAL, validate=False)
+    sheet = parser.parseString(css_text)
+    declarations = []
+    imports = []
+    for rule in sheet:
+        if rule.type == rule.IMPORT_RULE and rule.href:
+            imports.append(rule.href)
+        elif hasattr(rule, 'style'):
+            for property in rule.style:
+                declarations.append((property.name, property.value))
+    return ParsedStylesheet(content_hash, tuple(declarations), tuple(imports))
+
+
+class RemoteStylesheetCache:
+    """Downloads linked stylesheets and caches their parsed form per URL.
+
+    Entries are revalidated with a conditional GET once they are older than
+    ``URL_SUMMARIZER_CSS_FETCH_TTL``. Parsing goes through ``StylesheetCache``,
+    so the same file served from different URLs is still parsed only once.
+    """
+
+    def __init__(self, parsed_cache, session=None):
+        self.parsed_cache = parsed_cache
+        self.session = session
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def fetch_all(self, urls, max_import_depth=2):
+        """Fetch stylesheets and the sheets they ``@import``, a level at a time.
+
+        Each level is downloaded concurrently on a bounded pool. Returns the
+        parsed stylesheets in fetch order; sheets that fail to download are
+        skipped.
+        """
+        max_stylesheets = getattr(settings, 'URL_SUMMARIZER_CSS_MAX_STYLESHEETS', 20)
+        workers = getattr(settings, 'URL_SUMMARIZER_CSS_FETCH_WORKERS', 8)
+
+        seen = set()
+        results = []
+        level = list(urls)
+        for depth in range(max_import_depth + 1):
+            pending = []
+            for url in level:
+                if url not in seen and len(seen) < max_stylesheets:
+                    seen.add(url)
+                    pending.append(url)
+            if not pending:
+                break
+
+            with ThreadPoolExecutor(max_workers=min(workers, len(pending))) as pool:
+                fetched = list(pool.map(self.get, pending))
+
+            level = []
+            for url, parsed in zip(pending, fetched):
+                if parsed is not None:
+                    results.append(parsed)
+                    level.extend(urljoin(url, href) for href in parsed.imports)
+        return results
+
+    def get(self, url):
+        """Return the parsed stylesheet at ``url``, or None if it cannot be fetched."""
+        session = self.session or get_session()
+        now = timezone.now()
+        ttl = timedelta(seconds=getattr(settings, 'URL_SUMMARIZER_CSS_FETCH_TTL', 86400))
+
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is not None:
+                self._entries.move_to_end(url)
+        if entry and now - entry['fetched_at'] < ttl:
+            return entry['parsed']
+
+        headers = {}
+        if entry and entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry and entry['last_modified']:
+            headers['If-Modified-Since'] = entry['last_modified']
+
+        try:
+            response = session.get(url, headers=headers, timeout=10, stream=True)
+            if response.status_code == 304 and entry:
+                response.close()
+                parsed = entry['parsed']
+            else:
+                raise_for_status(response)
+                parsed = self.parsed_cache.parse(read_css(response))
+        except Exception:
+            return entry['parsed'] if entry else None
+
+        max_entries = getattr(settings, 'URL_SUMMARIZER_CSS_CACHE_SIZE', 256)
+        with self._lock:
+            self._entries[url] = {
+                'parsed': parsed,
+                'etag': response.headers.get('ETag', entry['etag'] if entry else ''),
+                'last_modified': response.headers.get('Last-Modified', entry['last_modified'] if entry else ''),
+                'fetched_at': now,
+            }
+            self._entries.move_to_end(url)
+            while len(self._entries) > max_entries:
+                self._entries.popitem(last=False)
+        return parsed
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def read_css(response, chunk_size=65536):
+    """Read a stylesheet body, capped at ``URL_SUMMARIZER_CSS_MAX_BYTES``."""
+    max_bytes = getattr(settings, 'URL_SUMMARIZER_CSS_MAX_BYTES', 2 * 1024 * 1024)
+    content_type = response.headers.get('Content-Type', '').lower()
+    if content_type.startswith('text/html'):
+        response.close()
+        raise Exception(f"Not a stylesheet: {content_type}")
+
+    chunks = []
+    received = 0
+    try:
+        for chunk in response.iter_content(chunk_size=chunk_size):
+            chunks.append(chunk[:max_bytes - received])
+            received += len(chunks[-1])
+            if received >= max_bytes:
+                break
+    finally:
+        response.close()
+    encoding = response.encoding if 'charset' in content_type else 'utf-8'
+    return b''.join(chunks).decode(encoding, errors='replace')
+
+
+class DesignCollector:
+    """Collects colors, fonts and spacing values in a single pass over the declarations."""
+
+    def __init__(self):
+        # Dicts keep first-seen order while dropping duplicates
+        self.colors = {}
+        self.fonts = {}
+        self.spacing = {
+            'margins': {},
+            'padding': {},
+            'alignment': {}
+        }
+
+    def add_declarations(self, declarations):
+        for name, value in declarations:
+            if 'color' in name or 'background' in name:
+                self.colors[value] = None
+            if 'font' in name:
+                self.fonts[value] = None
+            if 'margin' in name:
+                self.spacing['margins'][value] = None
+            elif 'padding' in name:
+                self.spacing['padding'][value] = None
+            elif 'align' in name or 'justify' in name:
+                self.spacing['alignment'][value] = None
+
+    def add_inline_style(self, style):
+        for color in INLINE_COLOR_RE.findall(style):
+            self.colors[color] = None
+
+    def as_dict(self):
+        return {
+            'colors': list(self.colors),
+            'typography': list(self.fonts),
+            'spacing': {k: list(v) for k, v in self.spacing.items()},
+        }
+
+
+stylesheet_cache = StylesheetCache()
+remote_stylesheets = RemoteStylesheetCache(stylesheet_cache)
@@ -0,0 +1,75 @@
+from collections import Counter
+
+from bs4 import Doctype, Tag
+
+SEMANTIC_TAGS = ['header', 'nav', 'main', 'article', 'section', 'aside', 'footer']
+MAIN_SECTION_TAGS = {'header', 'main', 'footer', 'nav', 'aside'}
+
+
+class DOMStats:
+    """Everything WebsiteAnalyzer reads from the DOM, gathered in one traversal.
+
+    Walking the tree once and dispatching on each element replaces a separate
+    ``find_all``/``select`` walk per tag name, which matters on large pages.
+    """
+
+    def __init__(self):
+        self.has_doctype = False
+        self.head_elements = []
+        self.tag_counts = Counter()
+        self.main_sections = []
+        self.grid_usage = False
+        self.flexbox_usage = False
+        self.images = []
+        self.inline_styles = []
+        self.style_blocks = []
+        self.stylesheet_hrefs = []
+        self.links = []
+
+    @classmethod
+    def collect(cls, soup):
+        stats = cls()
+        head = soup.head
+        for node in soup.descendants:
+            if isinstance(node, Doctype):
+                stats.has_doctype = True
+                continue
+            if not isinstance(node, Tag):
+                continue
+            stats._visit(node, head)
+        return stats
+
+    def _visit(self, tag, head):
+        name = tag.name
+        self.tag_counts[name] += 1
+
+        if head is not None and tag.parent is head:
+            self.head_elements.append(name)
+        if name in MAIN_SECTION_TAGS:
+            self.main_sections.append(name)
+
+        classes = tag.get('class')
+        if classes:
+            class_value = ' '.join(classes) if isinstance(classes, list) else classes
+            self.grid_usage = self.grid_usage or 'grid' in class_value
+            self.flexbox_usage = self.flexbox_usage or 'flex' in class_value
+
+        style = tag.get('style')
+        if style is not None:
+            self.inline_styles.append((name, style))
+
+        if name == 'style':
+            if tag.string:
+                self.style_blocks.append(str(tag.string))
+        elif name == 'img':
+            if tag.get('src'):
+                self.images.append((tag['src'], tag.get('alt', '')))
+        elif name == 'a':
+            if tag.get('href'):
+                self.links.append(tag['href'])
+        elif name == 'link' and tag.get('href'):
+            rel = tag.get('rel') or []
+            if isinstance(rel, str):
+                rel = rel.split()
+            if 'stylesheet' in [value.lower() for value in rel]:
+                self.stylesheet_hrefs.append(tag['href'])
@@ -0,0 +1,118 @@
+import hashlib
+from datetime import timedelta
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+from django.conf import settings
+from django.utils import timezone
+
+from .fetching import raise_for_status, read_html_page
+from .http_session import get_session
+from .models import CachedPage
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def normalize_url(url):
+    """Normalize a URL so equivalent spellings share one cache entry."""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    path = parts.path or '/'
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, path, query, ''))
+
+
+def url_key(url):
+    """Return the cache key for a URL."""
+    return hashlib.sha256(normalize_url(url).encode('utf-8')).hexdigest()
+
+
+class FetchCache:
+    """Database-backed page cache with HTTP revalidation and an LRU size cap."""
+
+    def __init__(self, ttl=None, max_entries=None, session=None, text_target=None):
+        if ttl is None:
+            ttl = getattr(settings, 'URL_SUMMARIZER_FETCH_CACHE_TTL', 3600)
+        if max_entries is None:
+            max_entries = getattr(settings, 'URL_SUMMARIZER_FETCH_CACHE_MAX_ENTRIES', 500)
+        if text_target is None:
+            text_target = getattr(settings, 'URL_SUMMARIZER_FETCH_TEXT_TARGET', 16000)
+        self.ttl = timedelta(seconds=ttl)
+        self.max_entries = max_entries
+        self.text_target = text_target
+        self.session = session or get_session()
+
+    def fetch(self, url, extract, headers=None, timeout=10, full=False):
+        """Return the cleaned text for a URL, downloading only when needed.
+
+        ``extract`` turns a raw HTML body into cleaned text. It only runs when
+        the body is new or has changed since the last fetch.
+
+        With ``full`` the whole page is read, ignoring the text target, and a
+        cached copy that was cut short is downloaded again.
+        """
+        now = timezone.now()
+        entry = CachedPage.objects.filter(key=url_key(url)).first()
+        if full and entry and entry.partial:
+            entry = None
+
+        if entry and now - entry.fetched_at < self.ttl:
+            self._touch(entry, now)
+            return entry.text
+
+        request_headers = dict(headers or {})
+        if entry and entry.etag:
+            request_headers['If-None-Match'] = entry.etag
+        if entry and entry.last_modified:
+            request_headers['If-Modified-Since'] = entry.last_modified
+
+        response = self.session.get(url, headers=request_headers, timeout=timeout, stream=True)
+
+        if response.status_code == 304 and entry:
+            response.close()
+            entry.fetched_at = now
+            self._touch(entry, now, extra_fields=['fetched_at'])
+            return entry.text
+
+        raise_for_status(response)
+        body, partial = read_html_page(response, text_target=None if full else self.text_target)
+        content_hash = hashlib.sha256(body.encode('utf-8')).hexdigest()
+
+        if entry and entry.content_hash == content_hash:
+            text = entry.text
+        else:
+            text = extract(body)
+
+        CachedPage.objects.update_or_create(
+            key=url_key(url),
+            defaults={
+                'url': normalize_url(url),
+                'body': body,
+                'content_hash': content_hash,
+                'text': text,
+                'partial': partial,
+                'etag': response.headers.get('ETag', ''),
+                'last_modified': response.headers.get('Last-Modified', ''),
+                'fetched_at': now,
+                'last_accessed': now,
+            }
+        )
+        self._prune()
+        return text
+
+    def _touch(self, entry, now, extra_fields=None):
+        entry.last_accessed = now
+        entry.save(update_fields=['last_accessed'] + (extra_fields or []))
+
+    def _prune(self):
+        """Evict the least recently used entries beyond ``max_entries``."""
+        if not self.max_entries:
+            return
+        stale_ids = list(
+            CachedPage.objects.order_by('-last_accessed')
+            .values_list('pk', flat=True)[self.max_entries:]
+        )
+        if stale_ids:
+            CachedPage.objects.filter(pk__in=stale_ids).delete()
@@ -0,0 +1,114 @@
+from html.parser import HTMLParser
+
+from django.conf import settings
+
+HTML_CONTENT_TYPES = ('text/html', 'application/xhtml+xml', 'text/plain')
+
+SKIPPED_TAGS = {'script', 'style', 'nav', 'header', 'footer'}
+MAIN_TAGS = {'main', 'article'}
+
+# Without a <main>/<article> element the extractor falls back to the whole
+# body, so more text is read before stopping in case one appears later.
+NO_MAIN_TEXT_FACTOR = 3
+
+
+class TextBudgetParser(HTMLParser):
+    """Counts the visible text seen so far while HTML is streamed in."""
+
+    def __init__(self, text_target):
+        super().__init__(convert_charrefs=True)
+        self.text_target = text_target
+        self.skip_depth = 0
+        self.main_depth = 0
+        self.seen_main = False
+        self.main_text = 0
+        self.total_text = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIPPED_TAGS:
+            self.skip_depth += 1
+        elif tag in MAIN_TAGS:
+            self.main_depth += 1
+            self.seen_main = True
+
+    def handle_endtag(self, tag):
+        if tag in SKIPPED_TAGS and self.skip_depth:
+            self.skip_depth -= 1
+        elif tag in MAIN_TAGS and self.main_depth:
+            self.main_depth -= 1
+
+    def handle_data(self, data):
+        if self.skip_depth:
+            return
+        length = len(data.strip())
+        self.total_text += length
+        if self.main_depth:
+            self.main_text += length
+
+    @property
+    def has_enough_text(self):
+        if self.seen_main:
+            return self.main_text >= self.text_target
+        return self.total_text >= self.text_target * NO_MAIN_TEXT_FACTOR
+
+
+def raise_for_status(response):
+    """``response.raise_for_status()`` that closes a streamed error response, returning its connection to the pool."""
+    try:
+        response.raise_for_status()
+    except Exception:
+        response.close()
+        raise
+
+
+def check_content_type(response):
+    """Raise before downloading the body if the response is not an HTML page."""
+    content_type = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+    if content_type and content_type not in HTML_CONTENT_TYPES:
+        response.close()
+        raise Exception(f"Unsupported content type: {content_type}")
+
+
+def read_html(response, max_bytes=None, text_target=None, chunk_size=16384):
+    """Read an HTML body from a streamed response, stopping early when possible.
+
+    At most ``max_bytes`` are downloaded. When ``text_target`` is set, reading
+    also stops once that many characters of main-content text have been seen,
+    since the summarizer only uses the start of the page text.
+    """
+    return read_html_page(response, max_bytes, text_target, chunk_size)[0]
+
+
+def read_html_page(response, max_bytes=None, text_target=None, chunk_size=16384):
+    """Like ``read_html``, but returns ``(html, partial)``.
+
+    ``partial`` is True when reading stopped at ``text_target``, so the body
+    is not the whole page.
+    """
+    if max_bytes is None:
+        max_bytes = getattr(settings, 'URL_SUMMARIZER_FETCH_MAX_BYTES', 2 * 1024 * 1024)
+    check_content_type(response)
+
+    content_type = response.headers.get('Content-Type', '')
+    encoding = response.encoding if 'charset' in content_type.lower() else 'utf-8'
+    parser = TextBudgetParser(text_target) if text_target else None
+
+    chunks = []
+    received = 0
+    partial = False
+    try:
+        for chunk in response.iter_content(chunk_size=chunk_size):
+            chunk = chunk[:max_bytes - received]
+            chunks.append(chunk)
+            received += len(chunk)
+            if received >= max_bytes:
+                break
+            if parser:
+                parser.feed(chunk.decode(encoding, errors='ignore'))
+                if parser.has_enough_text:
+                    partial = True
+                    break
+    finally:
+        response.close()
+
+    return b''.join(chunks).decode(encoding, errors='replace'), partial
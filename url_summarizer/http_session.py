@@ -0,0 +1,30 @@
+import threading
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Return the process-wide HTTP session.
+
+    Sharing one session keeps TCP/TLS connections alive between fetches
+    instead of opening a new connection for every page.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                pool_size = getattr(settings, 'URL_SUMMARIZER_HTTP_POOL_SIZE', 32)
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                session.headers['User-Agent'] = USER_AGENT
+                _session = session
+    return _session
@@ -0,0 +1,267 @@
+import contextvars
+import json
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from langchain_core.callbacks import BaseCallbackHandler
+
+from .models import LLMCall
+
+logger = logging.getLogger(__name__)
+
+# USD per million prompt and completion tokens; extended or overridden by URL_SUMMARIZER_LLM_PRICES
+MODEL_PRICES = {
+    'gpt-3.5-turbo': (0.50, 1.50),
+    'gpt-4o-mini': (0.15, 0.60),
+    'gpt-4o': (2.50, 10.00),
+    'gpt-4-turbo': (10.00, 30.00),
+}
+
+STAGES = ('fetch', 'parse', 'llm', 'postprocess')
+
+_current = contextvars.ContextVar('url_summarizer_llm_call', default=None)
+
+
+def price_for(model):
+    """Prompt and completion price of a model, or None if it is not in the price table."""
+    prices = dict(MODEL_PRICES, **getattr(settings, 'URL_SUMMARIZER_LLM_PRICES', {}))
+    # Dated snapshots such as gpt-4o-2024-08-06 are priced like their base model
+    for name in sorted(prices, key=len, reverse=True):
+        if model == name or model.startswith(name + '-'):
+            return prices[name]
+    return None
+
+
+def call_cost(model, prompt_tokens, completion_tokens):
+    price = price_for(model)
+    if price is None:
+        return None
+    prompt_price, completion_price = (Decimal(str(value)) for value in price)
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+
+class CallRecord:
+    """Timings, token usage and outcome of one summary or analysis, collected while it runs.
+
+    Stages are timed on the thread that started the call; a stage nested in
+    another is counted only for itself. Token usage and retries may be
+    reported from worker threads running under ``bind_current``.
+    """
+
+    def __init__(self, operation, model, url=''):
+        self.operation = operation
+        self.model = str(model)
+        self.url = url
+        self.stage_ms = dict.fromkeys(STAGES, 0.0)
+        self.total_ms = 0.0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.tokens_estimated = False
+        self.llm_requests = 0
+        self.retries = 0
+        self.cache_hits = 0
+        self.error = ''
+        self.cancelled = False
+        self._started = time.perf_counter()
+        self._thread = threading.get_ident()
+        self._open_stages = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        if threading.get_ident() != self._thread:
+            yield
+            return
+        started = time.perf_counter()
+        # Time spent in stages nested in this one
+        self._open_stages.append(0.0)
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            nested = self._open_stages.pop()
+            self.stage_ms[name] += elapsed - nested
+            if self._open_stages:
+                self._open_stages[-1] += elapsed
+
+    def add_usage(self, prompt_tokens, completion_tokens, estimated=False):
+        with self._lock:
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+            self.tokens_estimated = self.tokens_estimated or estimated
+            self.llm_requests += 1
+
+    def add_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def add_cache_hits(self, count=1):
+        with self._lock:
+            self.cache_hits += count
+
+    @property
+    def outcome(self):
+        if self.cancelled:
+            return LLMCall.OUTCOME_CANCELLED
+        if self.error:
+            return LLMCall.OUTCOME_ERROR
+        if self.cache_hits and not self.llm_requests:
+            return LLMCall.OUTCOME_CACHED
+        return LLMCall.OUTCOME_OK
+
+    def as_dict(self):
+        cost = call_cost(self.model, self.prompt_tokens, self.completion_tokens)
+        return {
+            'operation': self.operation,
+            'model': self.model,
+            'url': self.url,
+            'outcome': self.outcome,
+            'error': self.error,
+            'prompt_tokens': self.prompt_tokens,
+            'completion_tokens': self.completion_tokens,
+            'tokens_estimated': self.tokens_estimated,
+            'llm_requests': self.llm_requests,
+            'retries': self.retries,
+            'cache_hits': self.cache_hits,
+            'cost': cost,
+            'total_ms': round(self.total_ms),
+            **{f'{name}_ms': round(ms) for name, ms in self.stage_ms.items()},
+        }
+
+    def finish(self):
+        """Log the call and store it as an ``LLMCall`` row."""
+        self.total_ms = (time.perf_counter() - self._started) * 1000
+        fields = self.as_dict()
+        logger.info("llm_call %s", json.dumps(fields, default=str), extra={'llm_call': fields})
+        if not getattr(settings, 'URL_SUMMARIZER_LLM_METRICS_ENABLED', True):
+            return None
+        try:
+            return LLMCall.objects.create(**fields)
+        except Exception:
+            # Metrics must never fail the request they describe
+            logger.exception("Could not store LLM call metrics")
+            return None
+
+
+def current_call():
+    """The ``CallRecord`` of the call being tracked in this context, if any."""
+    return _current.get()
+
+
+@contextmanager
+def track_llm_call(operation, model, url=''):
+    """Record timings, token usage and outcome of everything run in the block.
+
+    Inside an already tracked call this joins the outer record, so entry
+    points can be nested without counting a request twice.
+    """
+    record = _current.get()
+    if record is not None:
+        yield record
+        return
+
+    record = CallRecord(operation, model, url)
+    token = _current.set(record)
+    try:
+        yield record
+    except Exception as e:
+        record.error = str(e)
+        raise
+    finally:
+        _current.reset(token)
+        record.finish()
+
+
+@contextmanager
+def stage(name):
+    """Time a stage of the tracked call; does nothing outside one."""
+    record = _current.get()
+    if record is None:
+        yield
+        return
+    with record.stage(name):
+        yield
+
+
+def count_retry():
+    record = _current.get()
+    if record is not None:
+        record.add_retry()
+
+
+def count_cache_hits(count=1):
+    record = _current.get()
+    if record is not None and count:
+        record.add_cache_hits(count)
+
+
+def bind_current(func):
+    """Wrap ``func`` so worker threads report usage to the caller's tracked call."""
+    record = _current.get()
+
+    def run(*args, **kwargs):
+        token = _current.set(record)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _current.reset(token)
+    return run
+
+
+class UsageCallback(BaseCallbackHandler):
+    """Adds the token usage OpenAI reports for each completion to the tracked call."""
+
+    def on_llm_end(self, response, **kwargs):
+        record = _current.get()
+        if record is None:
+            return
+        usage = (response.llm_output or {}).get('token_usage') or {}
+        record.add_usage(
+            usage.get('prompt_tokens', 0), usage.get('completion_tokens', 0), estimated=not usage
+        )
+
+
+# Passed as ``callbacks`` to every ChatOpenAI client the app creates
+usage_callback = UsageCallback()
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(math.ceil(fraction * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def call_stats(queryset, days=14):
+    """Latency percentiles per operation and spend per day over the last ``days`` days."""
+    queryset = queryset.filter(created_at__gte=timezone.now() - timedelta(days=days))
+
+    latencies = {}
+    for operation, total_ms in queryset.exclude(outcome=LLMCall.OUTCOME_CACHED).values_list('operation', 'total_ms'):
+        latencies.setdefault(operation, []).append(total_ms)
+    operations = []
+    for row in queryset.values('operation').annotate(
+        calls=Count('id'), prompt_tokens=Sum('prompt_tokens'),
+        completion_tokens=Sum('completion_tokens'), cost=Sum('cost'),
+    ).order_by('operation'):
+        values = sorted(latencies.get(row['operation'], []))
+        row.update(p50_ms=percentile(values, 0.5), p95_ms=percentile(values, 0.95))
+        operations.append(row)
+
+    daily = list(
+        queryset.annotate(day=TruncDate('created_at')).values('day').annotate(
+            calls=Count('id'), prompt_tokens=Sum('prompt_tokens'),
+            completion_tokens=Sum('completion_tokens'), cost=Sum('cost'),
+        ).order_by('-day')
+    )
+    return {'days': days, 'operations': operations, 'daily': daily}
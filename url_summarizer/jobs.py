@@ -0,0 +1,220 @@
+import logging
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .models import SiteCrawl, SummaryJob
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_crawl_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Return the process-wide worker pool, creating it on first use."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'URL_SUMMARIZER_WORKERS', 4),
+                    thread_name_prefix='summarizer'
+                )
+    return _executor
+
+
+def get_crawl_executor():
+    """Return the process-wide crawl pool, kept apart so long crawls do not hold up summary jobs."""
+    global _crawl_executor
+    if _crawl_executor is None:
+        with _executor_lock:
+            if _crawl_executor is None:
+                _crawl_executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'URL_SUMMARIZER_CRAWL_WORKERS', 1),
+                    thread_name_prefix='crawler'
+                )
+    return _crawl_executor
+
+
+def enqueue_summary(url, user=None):
+    """Create a summary job and hand it to the worker pool once the row is committed."""
+    job = SummaryJob.objects.create(
+        url=url,
+        user=user if user is not None and user.is_authenticated else None
+    )
+    transaction.on_commit(lambda: get_executor().submit(run_summary_job, job.pk))
+    return job
+
+
+def run_summary_job(job_id):
+    """Run a queued summary job. Executed on a worker thread."""
+    # Imported here so the worker module stays importable without the LLM stack.
+    from .crew import summarizer_pool
+
+    close_old_connections()
+    try:
+        updated = SummaryJob.objects.filter(pk=job_id, status=SummaryJob.STATUS_QUEUED).update(
+            status=SummaryJob.STATUS_RUNNING,
+            started_at=timezone.now()
+        )
+        if not updated:
+            return
+
+        url = SummaryJob.objects.values_list('url', flat=True).get(pk=job_id)
+        try:
+            with summarizer_pool.acquire() as summarizer:
+                summary = summarizer.get_summary(url)
+        except Exception as e:
+            logger.warning("Summary job %s failed: %s", job_id, e)
+            SummaryJob.objects.filter(pk=job_id).update(
+                status=SummaryJob.STATUS_FAILED,
+                error=str(e),
+                finished_at=timezone.now()
+            )
+        else:
+            SummaryJob.objects.filter(pk=job_id).update(
+                status=SummaryJob.STATUS_DONE,
+                result=summary,
+                finished_at=timezone.now()
+            )
+    finally:
+        close_old_connections()
+
+
+def enqueue_batch(urls, user, create_documents=True):
+    """Create one job per distinct URL and process them together on the worker pool."""
+    batch_id = uuid.uuid4()
+    jobs = SummaryJob.objects.bulk_create([
+        SummaryJob(id=uuid.uuid4(), url=url, user=user, batch_id=batch_id)
+        for url in dict.fromkeys(urls)
+    ])
+    transaction.on_commit(
+        lambda: get_executor().submit(run_summary_batch, batch_id, user.pk, create_documents)
+    )
+    return batch_id, jobs
+
+
+def run_summary_batch(batch_id, user_id, create_documents=True):
+    """Run every queued job in a batch. Executed on a worker thread."""
+    from .batch import summarize_batch, create_documents as save_documents
+    from django.contrib.auth import get_user_model
+
+    close_old_connections()
+    try:
+        jobs = list(SummaryJob.objects.filter(batch_id=batch_id, status=SummaryJob.STATUS_QUEUED))
+        if not jobs:
+            return
+        SummaryJob.objects.filter(pk__in=[job.pk for job in jobs]).update(
+            status=SummaryJob.STATUS_RUNNING,
+            started_at=timezone.now()
+        )
+
+        try:
+            # Jobs queued before URLs were de-duplicated may share a URL; it is summarized once
+            results = summarize_batch(list(dict.fromkeys(job.url for job in jobs)))
+        except Exception as e:
+            logger.warning("Summary batch %s failed: %s", batch_id, e)
+            results = [{'url': url, 'summary': '', 'error': str(e)} for url in dict.fromkeys(job.url for job in jobs)]
+
+        documents = {}
+        save_error = ''
+        if create_documents:
+            successful = [result for result in results if result['summary']]
+            try:
+                with transaction.atomic():
+                    author = get_user_model().objects.get(pk=user_id)
+                    for result, document in zip(successful, save_documents(successful, author)):
+                        documents[result['url']] = document
+            except Exception as e:
+                # Keep the summaries, which cost LLM calls, even when their documents cannot be saved
+                logger.warning("Could not save the documents of summary batch %s: %s", batch_id, e)
+                save_error = f"Could not save the document: {e}"
+
+        results_by_url = {result['url']: result for result in results}
+        finished_at = timezone.now()
+        for job in jobs:
+            result = results_by_url[job.url]
+            failed = not result['summary'] or bool(save_error)
+            job.status = SummaryJob.STATUS_FAILED if failed else SummaryJob.STATUS_DONE
+            job.result = result['summary']
+            job.error = result['error'] or (save_error if result['summary'] else '')
+            job.document = documents.get(job.url)
+            job.finished_at = finished_at
+        SummaryJob.objects.bulk_update(jobs, ['status', 'result', 'error', 'document', 'finished_at'])
+    except Exception as e:
+        logger.exception("Summary batch %s failed", batch_id)
+        SummaryJob.objects.filter(batch_id=batch_id, status=SummaryJob.STATUS_RUNNING).update(
+            status=SummaryJob.STATUS_FAILED,
+            error=str(e),
+            finished_at=timezone.now()
+        )
+    finally:
+        close_old_connections()
+
+
+def enqueue_crawl(url, user, max_pages, max_depth, probe_assets=False):
+    """Create a site crawl and hand it to the crawl pool once the row is committed."""
+    crawl = SiteCrawl.objects.create(
+        url=url,
+        user=user,
+        max_pages=max_pages,
+        max_depth=max_depth,
+        probe_assets=probe_assets
+    )
+    transaction.on_commit(lambda: get_crawl_executor().submit(run_site_crawl, crawl.pk))
+    return crawl
+
+
+def run_site_crawl(crawl_id):
+    """Run a queued site crawl, recording progress as pages finish. Executed on a worker thread."""
+    from .crawl import crawl_site
+    from .website_analyzer import analyzer_pool
+
+    close_old_connections()
+    try:
+        updated = SiteCrawl.objects.filter(pk=crawl_id, status=SiteCrawl.STATUS_QUEUED).update(
+            status=SiteCrawl.STATUS_RUNNING,
+            started_at=timezone.now()
+        )
+        if not updated:
+            return
+
+        crawl = SiteCrawl.objects.get(pk=crawl_id)
+
+        def progress(pages_done, pages_found, url):
+            SiteCrawl.objects.filter(pk=crawl_id).update(
+                pages_done=pages_done,
+                pages_found=pages_found,
+                current_url=url
+            )
+
+        try:
+            with analyzer_pool.acquire() as analyzer:
+                profile = crawl_site(
+                    crawl.url, analyzer,
+                    max_pages=crawl.max_pages,
+                    max_depth=crawl.max_depth,
+                    probe_assets=crawl.probe_assets,
+                    progress=progress
+                )
+        except Exception as e:
+            logger.warning("Site crawl %s failed: %s", crawl_id, e)
+            SiteCrawl.objects.filter(pk=crawl_id).update(
+                status=SiteCrawl.STATUS_FAILED,
+                error=str(e),
+                finished_at=timezone.now()
+            )
+        else:
+            SiteCrawl.objects.filter(pk=crawl_id).update(
+                status=SiteCrawl.STATUS_DONE,
+                profile=profile,
+                finished_at=timezone.now()
+            )
+    finally:
+        close_old_connections()
@@ -0,0 +1,310 @@
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from openai import APIConnectionError, APIStatusError, APITimeoutError, RateLimitError
+
+from .instrumentation import count_retry
+
+# Completion tokens reserved from the tokens-per-minute bucket for each request
+COMPLETION_TOKEN_ALLOWANCE = 500
+# Retries allowed before any request has succeeded
+RETRY_BUDGET_RESERVE = 10
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class BackendUnavailable(Exception):
+    """The LLM backend is throttled or unhealthy; try again after ``retry_after`` seconds."""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def is_retriable(error):
+    """Whether an OpenAI error is worth retrying: throttling, timeouts, connection and server errors."""
+    if isinstance(error, (RateLimitError, APITimeoutError, APIConnectionError)):
+        return True
+    return isinstance(error, APIStatusError) and error.status_code >= 500
+
+
+def retry_after(error):
+    """Seconds the API asked us to wait in a Retry-After header, if any."""
+    try:
+        return float(error.response.headers.get('retry-after'))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Refills ``per_minute`` units a minute, up to a minute's worth of burst."""
+
+    def __init__(self, per_minute, clock=time.monotonic):
+        self.rate = per_minute / 60.0
+        self.capacity = float(per_minute)
+        self.clock = clock
+        self._available = self.capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount):
+        """Take ``amount`` units and return the seconds to wait before using them.
+
+        The balance may go negative, so callers queue up in arrival order
+        instead of polling.
+        """
+        amount = min(amount, self.capacity)
+        with self._lock:
+            now = self.clock()
+            self._available = min(self.capacity, self._available + (now - self._updated) * self.rate)
+            self._updated = now
+            self._available -= amount
+            return max(-self._available / self.rate, 0.0)
+
+    def refund(self, amount):
+        with self._lock:
+            self._available = min(self.capacity, self._available + min(amount, self.capacity))
+
+
+class RetryBudget:
+    """Allows retries up to ``ratio`` of recent successful requests, plus a small reserve.
+
+    Once the backend is failing most requests the budget runs dry and calls
+    fail after their first attempt instead of multiplying the load.
+    """
+
+    def __init__(self, ratio, reserve):
+        self.ratio = ratio
+        self.reserve = float(reserve)
+        self._balance = self.reserve
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self._balance = min(self._balance + self.ratio, self.reserve + 100 * self.ratio)
+
+    def withdraw(self):
+        with self._lock:
+            if self._balance < 1:
+                return False
+            self._balance -= 1
+            return True
+
+
+class CircuitBreaker:
+    """Opens after ``failure_threshold`` consecutive backend failures.
+
+    While open every call fails fast. After ``reset_timeout`` seconds one
+    trial call is let through; its success closes the circuit again. A
+    trial that ends without an outcome, or reports none within
+    ``trial_timeout`` seconds, gives its place to a new one.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold, reset_timeout, clock=time.monotonic, trial_timeout=None):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.trial_timeout = trial_timeout if trial_timeout is not None else reset_timeout
+        self.clock = clock
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial = None
+        self._trial_started = 0.0
+        self._lock = threading.Lock()
+
+    def _remaining(self, now):
+        """Seconds until a call may go through; the caller holds the lock."""
+        if self.state == self.CLOSED:
+            return 0.0
+        if self.state == self.OPEN:
+            return max(self._opened_at + self.reset_timeout - now, 0.0)
+        # Half open with the trial call in flight
+        return max(self._trial_started + self.trial_timeout - now, 0.0)
+
+    def before_call(self):
+        """Admit a call or raise ``BackendUnavailable``.
+
+        Returns a trial token when the call is the circuit's trial call, to
+        be passed to ``release_trial`` if it ends without an outcome, and
+        None otherwise.
+        """
+        with self._lock:
+            now = self.clock()
+            remaining = self._remaining(now)
+            if remaining > 0:
+                raise BackendUnavailable("The LLM backend is unavailable", max(remaining, 1.0))
+            if self.state == self.CLOSED:
+                return None
+            self.state = self.HALF_OPEN
+            self._trial = object()
+            self._trial_started = now
+            return self._trial
+
+    def open_for(self):
+        """Seconds until calls are let through again, or None if a call would be admitted now."""
+        with self._lock:
+            remaining = self._remaining(self.clock())
+            return max(remaining, 1.0) if remaining > 0 else None
+
+    def release_trial(self, trial):
+        """Give back a trial call that ended without an outcome; the circuit opens again."""
+        with self._lock:
+            if trial is not None and trial is self._trial and self.state == self.HALF_OPEN:
+                self.state = self.OPEN
+                self._opened_at = self.clock()
+                self._trial = None
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self._failures = 0
+            self._trial = None
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self._opened_at = self.clock()
+                self._trial = None
+
+
+class LLMGuard:
+    """Rate limits, retries and circuit breaking shared by every LLM call in the process."""
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None, max_wait=None, max_retries=None,
+                 retry_ratio=None, backoff_base=None, backoff_max=None, breaker_failures=None,
+                 breaker_reset=None, sleep=time.sleep):
+        self.requests = TokenBucket(requests_per_minute or _setting('URL_SUMMARIZER_LLM_REQUESTS_PER_MINUTE', 500))
+        self.tokens = TokenBucket(tokens_per_minute or _setting('URL_SUMMARIZER_LLM_TOKENS_PER_MINUTE', 200000))
+        self.max_wait = max_wait if max_wait is not None else _setting('URL_SUMMARIZER_LLM_MAX_QUEUE_WAIT', 10.0)
+        self.max_retries = max_retries if max_retries is not None else _setting('URL_SUMMARIZER_LLM_MAX_RETRIES', 3)
+        self.budget = RetryBudget(
+            retry_ratio if retry_ratio is not None else _setting('URL_SUMMARIZER_LLM_RETRY_RATIO', 0.2),
+            reserve=RETRY_BUDGET_RESERVE
+        )
+        self.backoff_base = backoff_base or _setting('URL_SUMMARIZER_LLM_BACKOFF_BASE', 1.0)
+        self.backoff_max = backoff_max or _setting('URL_SUMMARIZER_LLM_BACKOFF_MAX', 30.0)
+        self.breaker = CircuitBreaker(
+            breaker_failures or _setting('URL_SUMMARIZER_LLM_BREAKER_FAILURES', 5),
+            breaker_reset or _setting('URL_SUMMARIZER_LLM_BREAKER_RESET', 30.0),
+        )
+        self.sleep = sleep
+
+    def reserve(self, prompt_tokens):
+        """Claim a request slot and tokens; return the seconds to wait and the breaker's trial token.
+
+        Fails fast with ``BackendUnavailable`` when the circuit is open or
+        the wait would exceed ``URL_SUMMARIZER_LLM_MAX_QUEUE_WAIT``. Pass
+        the trial token to ``monitored``.
+        """
+        open_for = self.breaker.open_for()
+        if open_for is not None:
+            raise BackendUnavailable("The LLM backend is unavailable", open_for)
+        tokens = prompt_tokens + COMPLETION_TOKEN_ALLOWANCE
+        wait = max(self.requests.reserve(1), self.tokens.reserve(tokens))
+        try:
+            if wait > self.max_wait:
+                raise BackendUnavailable("Too many LLM requests queued", wait)
+            # Only a call that is sure to be sent may become the breaker's trial call
+            trial = self.breaker.before_call()
+        except BackendUnavailable:
+            self.requests.refund(1)
+            self.tokens.refund(tokens)
+            raise
+        return wait, trial
+
+    def backoff(self, attempt, error):
+        """Full-jitter exponential backoff, or the wait the API asked for."""
+        delay = retry_after(error)
+        if delay is None:
+            delay = random.uniform(0, self.backoff_base * 2 ** attempt)
+        return min(delay, self.backoff_max)
+
+    def _unavailable(self, error):
+        delay = retry_after(error)
+        return BackendUnavailable(
+            f"The LLM backend failed: {error}", self.breaker.reset_timeout if delay is None else delay
+        )
+
+    def call(self, func, prompt_tokens=0):
+        """Run one LLM request under the limits, retrying transient failures.
+
+        Returns what ``func`` returns. Other errors propagate as they are;
+        a throttled or failing backend raises ``BackendUnavailable`` once the
+        retries or the retry budget run out.
+        """
+        for attempt in range(self.max_retries + 1):
+            wait, trial = self.reserve(prompt_tokens)
+            try:
+                if wait:
+                    self.sleep(wait)
+                result = func()
+            except Exception as e:
+                if not is_retriable(e):
+                    # The backend answered, so it is healthy
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                if attempt == self.max_retries or not self.budget.withdraw():
+                    raise self._unavailable(e) from e
+                count_retry()
+                self.sleep(self.backoff(attempt, e))
+                continue
+            except BaseException:
+                self.breaker.release_trial(trial)
+                raise
+            self.breaker.record_success()
+            self.budget.deposit()
+            return result
+
+    @contextmanager
+    def monitored(self, trial=None):
+        """Record the outcome of a request that cannot be retried, such as a stream.
+
+        Call ``reserve`` first and wait the time it returns inside the block;
+        pass the trial token it returned. A block left by cancellation
+        reports no outcome and gives the trial back.
+        """
+        try:
+            yield
+        except Exception as e:
+            if not is_retriable(e):
+                self.breaker.record_success()
+                raise
+            self.breaker.record_failure()
+            raise self._unavailable(e) from e
+        except BaseException:
+            self.breaker.release_trial(trial)
+            raise
+        self.breaker.record_success()
+        self.budget.deposit()
+
+
+_guard = None
+_guard_lock = threading.Lock()
+
+
+def get_llm_guard():
+    """Return the process-wide LLM guard, creating it on first use."""
+    global _guard
+    if _guard is None:
+        with _guard_lock:
+            if _guard is None:
+                _guard = LLMGuard()
+    return _guard
+
+
+def reset_llm_guard():
+    """Drop the process-wide guard, so the next call starts with fresh limits."""
+    global _guard
+    with _guard_lock:
+        _guard = None
@@ -0,0 +1,61 @@
+import os
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from url_summarizer import parse_service
+from url_summarizer.parsers import get_backend
+
+
+class Command(BaseCommand):
+    help = 'Measures parsing throughput on threads versus the process pool for several worker counts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('corpus', help='Directory of saved .html pages')
+        parser.add_argument('--repeat', type=int, default=3, help='Number of runs per worker count')
+        parser.add_argument(
+            '--workers', type=int, action='append',
+            help='Worker count to measure (default: 1, 2, 4 and the CPU count)'
+        )
+        parser.add_argument(
+            '--task', choices=['extract_content', 'collect_dom'], default='collect_dom',
+            help='Parsing work to run for each page'
+        )
+
+    def handle(self, *args, **options):
+        pages = []
+        for path in sorted(Path(options['corpus']).glob('**/*.htm*')):
+            pages.append(path.read_bytes().decode('utf-8', errors='replace'))
+        if not pages:
+            raise CommandError(f'No .html files found in {options["corpus"]}')
+
+        task = getattr(parse_service, options['task'])
+        backend_name = get_backend().name
+        worker_counts = options['workers'] or sorted({1, 2, 4, os.cpu_count() or 1})
+
+        self.stdout.write(
+            f'{len(pages)} pages, {options["task"]} with {backend_name}, '
+            f'{options["repeat"]} runs each, {os.cpu_count()} CPUs\n'
+        )
+        self.stdout.write(f'{"workers":>7} {"threads pages/s":>16} {"processes pages/s":>18}')
+
+        for workers in worker_counts:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                threaded = self._throughput(pool, task, pages, backend_name, options['repeat'])
+            with ProcessPoolExecutor(max_workers=workers, initializer=parse_service.init_worker) as pool:
+                # Start the workers before timing, as a long-running server would have them
+                list(pool.map(task, pages[:workers], [backend_name] * workers))
+                processes = self._throughput(pool, task, pages, backend_name, options['repeat'])
+            self.stdout.write(f'{workers:>7} {threaded:>16.1f} {processes:>18.1f}')
+
+    def _throughput(self, pool, task, pages, backend_name, repeat):
+        """Return the median pages parsed per second with every page submitted at once."""
+        rates = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            list(pool.map(task, pages, [backend_name] * len(pages)))
+            rates.append(len(pages) / (time.perf_counter() - started))
+        return statistics.median(rates)
@@ -0,0 +1,63 @@
+import statistics
+import time
+import tracemalloc
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from url_summarizer.content import extract_content
+from url_summarizer.parsers import available_backends, get_backend
+
+
+class Command(BaseCommand):
+    help = 'Compares HTML parser backends on a corpus of saved pages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('corpus', help='Directory of saved .html pages')
+        parser.add_argument('--repeat', type=int, default=5, help='Number of runs per page and backend')
+        parser.add_argument('--backend', action='append', help='Backend to include (default: all installed)')
+
+    def handle(self, *args, **options):
+        pages = []
+        for path in sorted(Path(options['corpus']).glob('**/*.htm*')):
+            pages.append(path.read_bytes().decode('utf-8', errors='replace'))
+        if not pages:
+            raise CommandError(f'No .html files found in {options["corpus"]}')
+
+        total_kb = sum(len(page.encode('utf-8')) for page in pages) / 1024
+        self.stdout.write(f'{len(pages)} pages, {total_kb:.0f} KB, {options["repeat"]} runs each\n')
+        self.stdout.write(f'{"backend":<12} {"parse ms":>10} {"extract ms":>11} {"peak KB":>9}')
+
+        for name in options['backend'] or available_backends():
+            backend = get_backend(name)
+            if backend.name != name:
+                self.stdout.write(self.style.WARNING(f'{name:<12} not installed'))
+                continue
+
+            def extract(page):
+                return extract_content(backend.parse(page))
+
+            parse_times = self._time_runs(backend.parse, pages, options['repeat'])
+            extract_times = self._time_runs(extract, pages, options['repeat'])
+
+            # Peak Python heap usage; allocations made inside C libraries are not traced
+            tracemalloc.start()
+            for page in pages:
+                extract(page)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            self.stdout.write(
+                f'{name:<12} {statistics.median(parse_times):>10.1f} '
+                f'{statistics.median(extract_times):>11.1f} {peak / 1024:>9.0f}'
+            )
+
+    def _time_runs(self, func, pages, repeat):
+        """Return the wall time of each full pass over the corpus, in milliseconds."""
+        times = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            for page in pages:
+                func(page)
+            times.append((time.perf_counter() - started) * 1000)
+        return times
@@ -0,0 +1,52 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from url_summarizer.batch import summarize_batch, create_documents
+
+
+class Command(BaseCommand):
+    help = 'Summarizes a list of URLs concurrently and saves the summaries as documents'
+
+    def add_arguments(self, parser):
+        parser.add_argument('urls', nargs='*', help='URLs to summarize')
+        parser.add_argument('--file', help='Read URLs from a file, one per line')
+        parser.add_argument('--author', required=True, help='Username to assign as the document author')
+        parser.add_argument('--concurrency', type=int, help='Maximum number of pages fetched at once')
+        parser.add_argument('--per-host', type=int, help='Maximum number of concurrent requests per host')
+        parser.add_argument('--llm-concurrency', type=int, help='Maximum number of summaries generated at once')
+        parser.add_argument('--private', action='store_true', help='Create the documents as private')
+        parser.add_argument('--dry-run', action='store_true', help='Summarize without creating documents')
+
+    def handle(self, *args, **options):
+        urls = list(options['urls'])
+        if options['file']:
+            with open(options['file']) as f:
+                urls.extend(line.strip() for line in f if line.strip() and not line.startswith('#'))
+        if not urls:
+            raise CommandError('No URLs given')
+
+        try:
+            author = get_user_model().objects.get(username=options['author'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'User "{options["author"]}" does not exist')
+
+        results = summarize_batch(
+            urls,
+            fetch_concurrency=options['concurrency'],
+            per_host_limit=options['per_host'],
+            llm_concurrency=options['llm_concurrency']
+        )
+
+        for result in results:
+            if result['error']:
+                self.stdout.write(self.style.WARNING(f'Failed {result["url"]}: {result["error"]}'))
+
+        if options['dry_run']:
+            documents = []
+        else:
+            documents = create_documents(results, author, is_public=not options['private'])
+
+        succeeded = sum(1 for result in results if result['summary'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Summarized {succeeded} of {len(results)} URLs, created {len(documents)} documents'
+        ))
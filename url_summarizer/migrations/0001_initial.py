@@ -0,0 +1,32 @@
+# Generated by Django 5.0 on 2026-10-18 09:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CachedPage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(help_text='SHA-256 of the normalized URL', max_length=64, unique=True)),
+                ('url', models.TextField()),
+                ('body', models.TextField(blank=True)),
+                ('content_hash', models.CharField(blank=True, max_length=64)),
+                ('text', models.TextField(blank=True, help_text='Cleaned text extracted from the body')),
+                ('etag', models.CharField(blank=True, max_length=255)),
+                ('last_modified', models.CharField(blank=True, max_length=64)),
+                ('fetched_at', models.DateTimeField()),
+                ('last_accessed', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'ordering': ['-last_accessed'],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.0 on 2026-10-18 09:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('url_summarizer', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CachedSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(help_text='SHA-256 of content, prompt and model settings', max_length=64, unique=True)),
+                ('summary', models.TextField()),
+                ('model', models.CharField(blank=True, max_length=100)),
+                ('hit_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_hit_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.0 on 2026-10-18 09:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documentation', '0007_remove_document_views_count_document_views'),
+        ('url_summarizer', '0003_summaryjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='summaryjob',
+            name='batch_id',
+            field=models.UUIDField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='summaryjob',
+            name='document',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='summary_jobs', to='documentation.document'),
+        ),
+    ]
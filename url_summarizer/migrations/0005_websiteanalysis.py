@@ -0,0 +1,38 @@
+# Generated by Django 5.0 on 2026-10-18 09:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('url_summarizer', '0004_summaryjob_batch_id_summaryjob_document'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WebsiteAnalysis',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(help_text='SHA-256 of the normalized URL', max_length=64)),
+                ('url', models.TextField()),
+                ('mode', models.CharField(default='static', max_length=10)),
+                ('options', models.JSONField(default=dict)),
+                ('result', models.JSONField()),
+                ('html_hash', models.CharField(max_length=64)),
+                ('css_hash', models.CharField(help_text='Hash of every stylesheet and inline style', max_length=64)),
+                ('assets_hash', models.CharField(help_text='Hash of the asset list and probe options', max_length=64)),
+                ('stylesheet_urls', models.JSONField(default=list)),
+                ('stylesheet_hashes', models.JSONField(default=list)),
+                ('etag', models.CharField(blank=True, max_length=255)),
+                ('last_modified', models.CharField(blank=True, max_length=64)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('checked_at', models.DateTimeField(auto_now_add=True, help_text='Last time the page was found unchanged')),
+            ],
+            options={
+                'verbose_name_plural': 'website analyses',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['key', '-created_at'], name='url_summari_key_22af27_idx')],
+            },
+        ),
+    ]
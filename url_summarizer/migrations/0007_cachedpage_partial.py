@@ -0,0 +1,18 @@
+# Generated by Django 5.0 on 2026-10-18 09:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('url_summarizer', '0006_sitecrawl'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cachedpage',
+            name='partial',
+            field=models.BooleanField(default=False, help_text='Download stopped once enough text was read'),
+        ),
+    ]
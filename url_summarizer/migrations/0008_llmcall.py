@@ -0,0 +1,41 @@
+# Generated by Django 5.0 on 2026-10-18 09:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('url_summarizer', '0007_cachedpage_partial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LLMCall',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('operation', models.CharField(db_index=True, max_length=32)),
+                ('model', models.CharField(blank=True, max_length=100)),
+                ('url', models.TextField(blank=True)),
+                ('outcome', models.CharField(choices=[('ok', 'OK'), ('cached', 'Cached'), ('error', 'Error'), ('cancelled', 'Cancelled')], db_index=True, max_length=10)),
+                ('error', models.TextField(blank=True)),
+                ('prompt_tokens', models.PositiveIntegerField(default=0)),
+                ('completion_tokens', models.PositiveIntegerField(default=0)),
+                ('tokens_estimated', models.BooleanField(default=False, help_text='The API reported no usage for some requests')),
+                ('llm_requests', models.PositiveIntegerField(default=0)),
+                ('retries', models.PositiveIntegerField(default=0)),
+                ('cache_hits', models.PositiveIntegerField(default=0, help_text='Prompts answered from the summary cache')),
+                ('cost', models.DecimalField(blank=True, decimal_places=6, help_text='USD; empty for unpriced models', max_digits=12, null=True)),
+                ('fetch_ms', models.PositiveIntegerField(default=0)),
+                ('parse_ms', models.PositiveIntegerField(default=0)),
+                ('llm_ms', models.PositiveIntegerField(default=0)),
+                ('postprocess_ms', models.PositiveIntegerField(default=0)),
+                ('total_ms', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'verbose_name': 'LLM call',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -1,3 +1,265 @@
+import hashlib
+import uuid
+
+from django.conf import settings
 from django.db import models
 
-# Create your models here.
+
+class CachedPage(models.Model):
+    """A fetched web page, stored so repeat summaries can skip the download."""
+    key = models.CharField(max_length=64, unique=True, help_text="SHA-256 of the normalized URL")
+    url = models.TextField()
+    body = models.TextField(blank=True)
+    content_hash = models.CharField(max_length=64, blank=True)
+    text = models.TextField(blank=True, help_text="Cleaned text extracted from the body")
+    partial = models.BooleanField(default=False, help_text="Download stopped once enough text was read")
+    etag = models.CharField(max_length=255, blank=True)
+    last_modified = models.CharField(max_length=64, blank=True)
+    fetched_at = models.DateTimeField()
+    last_accessed = models.DateTimeField(db_index=True)
+
+    class Meta:
+        ordering = ['-last_accessed']
+
+    def __str__(self):
+        return self.url
+
+
+class CachedSummary(models.Model):
+    """A generated summary, keyed by everything that influences the LLM output."""
+    key = models.CharField(max_length=64, unique=True, help_text="SHA-256 of content, prompt and model settings")
+    summary = models.TextField()
+    model = models.CharField(max_length=100, blank=True)
+    hit_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_hit_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.model} summary {self.key[:12]}"
+
+
+class SummaryJob(models.Model):
+    """A summarization request processed in the background worker pool."""
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    url = models.TextField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_QUEUED, db_index=True)
+    result = models.TextField(blank=True)
+    error = models.TextField(blank=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='summary_jobs'
+    )
+    batch_id = models.UUIDField(null=True, blank=True, db_index=True)
+    document = models.ForeignKey(
+        'documentation.Document', on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='summary_jobs'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.url} ({self.status})"
+
+    @property
+    def is_finished(self):
+        return self.status in (self.STATUS_DONE, self.STATUS_FAILED)
+
+    def as_dict(self):
+        data = {
+            'job_id': str(self.id),
+            'url': self.url,
+            'status': self.status,
+            'created_at': self.created_at.isoformat(),
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
+        if self.batch_id:
+            data['batch_id'] = str(self.batch_id)
+        if self.status == self.STATUS_DONE:
+            data['summary'] = self.result
+            if self.document_id:
+                data['document_id'] = self.document_id
+        elif self.status == self.STATUS_FAILED:
+            data['error'] = self.error
+        return data
+
+
+class WebsiteAnalysis(models.Model):
+    """A stored WebsiteAnalyzer result and the fingerprint of the inputs it came from.
+
+    A new row is written whenever the analysis of a page changes, so the
+    rows for one URL form its design history.
+    """
+    key = models.CharField(max_length=64, help_text="SHA-256 of the normalized URL")
+    url = models.TextField()
+    mode = models.CharField(max_length=10, default='static')
+    options = models.JSONField(default=dict)
+    result = models.JSONField()
+    html_hash = models.CharField(max_length=64)
+    css_hash = models.CharField(max_length=64, help_text="Hash of every stylesheet and inline style")
+    assets_hash = models.CharField(max_length=64, help_text="Hash of the asset list and probe options")
+    stylesheet_urls = models.JSONField(default=list)
+    stylesheet_hashes = models.JSONField(default=list)
+    etag = models.CharField(max_length=255, blank=True)
+    last_modified = models.CharField(max_length=64, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    checked_at = models.DateTimeField(auto_now_add=True, help_text="Last time the page was found unchanged")
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [models.Index(fields=['key', '-created_at'])]
+        verbose_name_plural = 'website analyses'
+
+    def __str__(self):
+        return f"{self.url} ({self.created_at:%Y-%m-%d %H:%M})"
+
+    @property
+    def fingerprint(self):
+        """Hash of the page HTML and every stylesheet it uses."""
+        return hashlib.sha256(
+            '\n'.join([self.html_hash] + self.stylesheet_hashes).encode('utf-8')
+        ).hexdigest()
+
+    def fingerprint_fields(self):
+        return {
+            'html_hash': self.html_hash,
+            'css_hash': self.css_hash,
+            'assets_hash': self.assets_hash,
+            'stylesheet_urls': self.stylesheet_urls,
+            'stylesheet_hashes': self.stylesheet_hashes,
+            'etag': self.etag,
+            'last_modified': self.last_modified,
+            'options': self.options,
+        }
+
+
+class SiteCrawl(models.Model):
+    """A multi-page site analysis processed in the background crawl pool."""
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    url = models.TextField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_QUEUED, db_index=True)
+    max_pages = models.PositiveIntegerField()
+    max_depth = models.PositiveIntegerField()
+    probe_assets = models.BooleanField(default=False)
+    pages_done = models.PositiveIntegerField(default=0)
+    pages_found = models.PositiveIntegerField(default=0)
+    current_url = models.TextField(blank=True)
+    profile = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='site_crawls'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.url} ({self.status})"
+
+    @property
+    def is_finished(self):
+        return self.status in (self.STATUS_DONE, self.STATUS_FAILED)
+
+    def progress_dict(self):
+        return {
+            'crawl_id': str(self.id),
+            'status': self.status,
+            'pages_done': self.pages_done,
+            'pages_found': self.pages_found,
+            'current_url': self.current_url,
+        }
+
+    def as_dict(self):
+        data = self.progress_dict()
+        data.update({
+            'url': self.url,
+            'max_pages': self.max_pages,
+            'max_depth': self.max_depth,
+            'created_at': self.created_at.isoformat(),
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        })
+        if self.status == self.STATUS_DONE:
+            data['profile'] = self.profile
+        elif self.status == self.STATUS_FAILED:
+            data['error'] = self.error
+        return data
+
+
+class LLMCall(models.Model):
+    """Timings, token usage and cost of one summary or analysis that used the LLM."""
+    OUTCOME_OK = 'ok'
+    OUTCOME_CACHED = 'cached'
+    OUTCOME_ERROR = 'error'
+    OUTCOME_CANCELLED = 'cancelled'
+    OUTCOME_CHOICES = [
+        (OUTCOME_OK, 'OK'),
+        (OUTCOME_CACHED, 'Cached'),
+        (OUTCOME_ERROR, 'Error'),
+        (OUTCOME_CANCELLED, 'Cancelled'),
+    ]
+
+    operation = models.CharField(max_length=32, db_index=True)
+    model = models.CharField(max_length=100, blank=True)
+    url = models.TextField(blank=True)
+    outcome = models.CharField(max_length=10, choices=OUTCOME_CHOICES, db_index=True)
+    error = models.TextField(blank=True)
+    prompt_tokens = models.PositiveIntegerField(default=0)
+    completion_tokens = models.PositiveIntegerField(default=0)
+    tokens_estimated = models.BooleanField(default=False, help_text="The API reported no usage for some requests")
+    llm_requests = models.PositiveIntegerField(default=0)
+    retries = models.PositiveIntegerField(default=0)
+    cache_hits = models.PositiveIntegerField(default=0, help_text="Prompts answered from the summary cache")
+    cost = models.DecimalField(
+        max_digits=12, decimal_places=6, null=True, blank=True, help_text="USD; empty for unpriced models"
+    )
+    fetch_ms = models.PositiveIntegerField(default=0)
+    parse_ms = models.PositiveIntegerField(default=0)
+    llm_ms = models.PositiveIntegerField(default=0)
+    postprocess_ms = models.PositiveIntegerField(default=0)
+    total_ms = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'LLM call'
+
+    def __str__(self):
+        return f"{self.operation} {self.model} ({self.outcome})"
+
+    @property
+    def total_tokens(self):
+        return self.prompt_tokens + self.completion_tokens
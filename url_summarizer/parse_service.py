@@ -0,0 +1,93 @@
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import settings
+
+from . import content
+from .css import parse_stylesheet
+from .dom import DOMStats
+from .parsers import get_backend
+
+
+# Worker functions run in the pool's processes. They take and return plain
+# picklable values: the raw page body in, compact extracted results out, never
+# a soup or cssutils object. Workers started with "spawn" or "forkserver"
+# import this module before Django is set up, so it must not import models,
+# directly or through other modules of this app.
+
+def init_worker():
+    """Set up Django in a freshly started worker process."""
+    django.setup()
+
+
+def extract_content(html, backend_name):
+    """Main content of a page with boilerplate blocks removed."""
+    return content.extract_content(get_backend(backend_name).parse(html))
+
+
+def collect_dom(html, backend_name):
+    """DOMStats of a page."""
+    return DOMStats.collect(get_backend(backend_name).make_soup(html))
+
+
+def parse_css(css_text, content_hash):
+    """Declarations and @import URLs of a stylesheet."""
+    return parse_stylesheet(css_text, content_hash)
+
+
+class ParseService:
+    """Runs HTML and CSS parsing in a process pool, off the request threads.
+
+    Parsing is CPU-bound pure Python, so threads serialize on the GIL while
+    doing it. With ``workers`` set, calls are sent to that many processes;
+    with 0 they run in the calling thread, as before.
+    """
+
+    def __init__(self, workers=None):
+        if workers is None:
+            workers = getattr(settings, 'URL_SUMMARIZER_PARSE_WORKERS', 0)
+        self.workers = workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _run(self, func, *args):
+        from .instrumentation import stage
+
+        with stage('parse'):
+            if not self.workers:
+                return func(*args)
+            if self._executor is None:
+                with self._lock:
+                    if self._executor is None:
+                        self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker)
+            return self._executor.submit(func, *args).result()
+
+    def extract_content(self, html):
+        return self._run(extract_content, html, get_backend().name)
+
+    def collect_dom(self, html):
+        return self._run(collect_dom, html, get_backend().name)
+
+    def parse_css(self, css_text, content_hash=''):
+        return self._run(parse_css, css_text, content_hash)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_parse_service():
+    """Return the process-wide parse service, creating it on first use."""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = ParseService()
+    return _service
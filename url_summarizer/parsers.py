@@ -0,0 +1,82 @@
+import logging
+
+from bs4 import BeautifulSoup
+from django.conf import settings
+
+try:
+    import lxml
+except ImportError:
+    lxml = None
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+logger = logging.getLogger(__name__)
+
+
+class HTMLParserBackend:
+    """BeautifulSoup with Python's built-in parser. Always available."""
+    name = 'html.parser'
+    soup_features = 'html.parser'
+
+    def make_soup(self, html):
+        return BeautifulSoup(html, self.soup_features)
+
+    def parse(self, html):
+        """Parse HTML into the tree ``content.extract_content`` scores."""
+        return self.make_soup(html)
+
+
+class LxmlBackend(HTMLParserBackend):
+    """libxml2 through lxml as BeautifulSoup's tree builder."""
+    name = 'lxml'
+    soup_features = 'lxml'
+
+
+class SelectolaxBackend(LxmlBackend if lxml else HTMLParserBackend):
+    """Lexbor through selectolax for content extraction.
+
+    Blocks are scored on the Lexbor tree itself. selectolax has no
+    BeautifulSoup tree builder, so ``make_soup`` is inherited from the lxml
+    (or built-in) backend.
+    """
+    name = 'selectolax'
+
+    def parse(self, html):
+        return LexborHTMLParser(html)
+
+
+BACKENDS = {
+    'html.parser': (HTMLParserBackend, lambda: True),
+    'lxml': (LxmlBackend, lambda: lxml is not None),
+    'selectolax': (SelectolaxBackend, lambda: LexborHTMLParser is not None),
+}
+
+_backends = {}
+
+
+def get_backend(name=None):
+    """Return the configured parser backend, falling back when its library is missing."""
+    name = name or getattr(settings, 'URL_SUMMARIZER_HTML_PARSER', 'lxml')
+    if name not in _backends:
+        if name not in BACKENDS:
+            raise ValueError(f"Unknown HTML parser backend: {name}")
+        backend_class, available = BACKENDS[name]
+        if available():
+            _backends[name] = backend_class()
+        else:
+            fallback = 'lxml' if name != 'lxml' and lxml is not None else 'html.parser'
+            logger.warning("HTML parser backend %s is not installed, using %s", name, fallback)
+            _backends[name] = get_backend(fallback)
+    return _backends[name]
+
+
+def available_backends():
+    return [name for name, (_, available) in BACKENDS.items() if available()]
+
+
+def make_soup(html):
+    """Parse HTML into a BeautifulSoup tree with the configured backend."""
+    return get_backend().make_soup(html)
@@ -0,0 +1,50 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class InstancePool:
+    """Keeps idle instances of an expensive object around for reuse.
+
+    Each caller gets exclusive use of an instance for the duration of
+    ``acquire()``, so objects that are not safe to share between threads
+    (such as CrewAI agents) can still be reused across requests. A new
+    instance is built only when every pooled one is in use.
+    """
+
+    def __init__(self, factory, max_idle=None):
+        self.factory = factory
+        self.max_idle = max_idle
+        self._idle = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def acquire(self):
+        with self._lock:
+            instance = self._idle.pop() if self._idle else None
+        if instance is None:
+            instance = self._create()
+        try:
+            yield instance
+        finally:
+            max_idle = self.max_idle or getattr(settings, 'URL_SUMMARIZER_POOL_SIZE', 8)
+            with self._lock:
+                if len(self._idle) < max_idle:
+                    self._idle.append(instance)
+
+    def _create(self):
+        started = time.perf_counter()
+        instance = self.factory()
+        logger.debug(
+            "Created %s in %.1f ms", type(instance).__name__, (time.perf_counter() - started) * 1000
+        )
+        return instance
+
+    def clear(self):
+        with self._lock:
+            self._idle = []
@@ -0,0 +1,71 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.utils import timezone
+
+from .models import CachedSummary
+
+HITS_KEY = 'url_summarizer:summary_cache:hits'
+MISSES_KEY = 'url_summarizer:summary_cache:misses'
+
+
+def _incr(key):
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, timeout=None)
+
+
+class SummaryCache:
+    """Stores finished summaries so unchanged pages are not sent to the LLM again."""
+
+    def __init__(self, enabled=None):
+        if enabled is None:
+            enabled = getattr(settings, 'URL_SUMMARIZER_SUMMARY_CACHE_ENABLED', True)
+        self.enabled = enabled
+
+    def key_for(self, content, prompt_template, model, temperature):
+        """Build a cache key from the page text, prompt template and model settings."""
+        digest = hashlib.sha256()
+        for part in (content, prompt_template, model, repr(temperature)):
+            digest.update(hashlib.sha256(str(part).encode('utf-8')).digest())
+        return digest.hexdigest()
+
+    def get(self, key):
+        """Return the cached summary for ``key``, or None on a miss."""
+        if not self.enabled:
+            return None
+        entry = CachedSummary.objects.filter(key=key).only('summary').first()
+        if entry is None:
+            _incr(MISSES_KEY)
+            return None
+        CachedSummary.objects.filter(pk=entry.pk).update(
+            hit_count=F('hit_count') + 1,
+            last_hit_at=timezone.now()
+        )
+        _incr(HITS_KEY)
+        return entry.summary
+
+    def set(self, key, summary, model=''):
+        if not self.enabled:
+            return
+        CachedSummary.objects.update_or_create(
+            key=key,
+            defaults={'summary': summary, 'model': model}
+        )
+
+    @staticmethod
+    def stats():
+        """Return the hit/miss counters since the cache backend was last cleared."""
+        hits = cache.get(HITS_KEY, 0)
+        misses = cache.get(MISSES_KEY, 0)
+        total = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / total if total else 0.0,
+            'entries': CachedSummary.objects.count(),
+        }
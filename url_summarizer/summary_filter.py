@@ -0,0 +1,63 @@
+META_PHRASES = [
+    'i will', 'article summary', 'technical documentation',
+    'following', 'structure', 'example', 'provided'
+]
+
+
+class SummaryFilter:
+    """Strip meta-commentary from LLM output and make sure it opens with a title.
+
+    Text can be fed in arbitrary chunks as it streams in. Complete lines are
+    released as soon as they are known to belong to the summary; nothing is
+    emitted until the first ``#`` heading appears. If the output never contains
+    a heading, the buffered lines are released by ``finish()`` with the first
+    one turned into a title.
+    """
+
+    def __init__(self):
+        self._partial = ''
+        self._started = False
+        self._fallback_lines = []
+
+    def feed(self, chunk):
+        """Add a chunk of model output and return the cleaned text ready to emit."""
+        self._partial += chunk
+        *lines, self._partial = self._partial.split('\n')
+        return ''.join(self._process(line) for line in lines)
+
+    def finish(self):
+        """Flush the remaining buffered text once the model output has ended."""
+        output = self._process(self._partial) if self._partial else ''
+        self._partial = ''
+        if not self._started and self._fallback_lines:
+            lines = self._fallback_lines
+            self._fallback_lines = []
+            output = '\n'.join([f"# {lines[0]}"] + lines[1:])
+        return output
+
+    def _process(self, line):
+        # Skip meta text lines
+        if any(phrase in line.lower() for phrase in META_PHRASES):
+            return ''
+
+        # Skip empty lines at start
+        if not self._started and not line.strip():
+            return ''
+
+        # Start capturing when we see a heading
+        if line.startswith('#'):
+            self._started = True
+
+        if self._started:
+            return line + '\n'
+
+        # Keep real lines in case the output never contains a heading
+        if not line.startswith('['):
+            self._fallback_lines.append(line)
+        return ''
+
+
+def clean_summary_output(text):
+    """Apply ``SummaryFilter`` to a complete model response."""
+    summary_filter = SummaryFilter()
+    return (summary_filter.feed(text) + summary_filter.finish()).strip()
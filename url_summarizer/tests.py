@@ -1,3 +1,1521 @@
-from django.test import TestCase
+import asyncio
+import functools
+import json
+import multiprocessing
+import os
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import httpx
+import requests
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import IntegrityError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from langchain_core.outputs import LLMResult
+from langchain_openai import ChatOpenAI
+from openai import RateLimitError
+from PIL import Image
+
+from documentation.autocomplete import invalidate_prefix_index, suggest
+from documentation.models import Document
+
+from .analysis_store import analyze_and_store, diff_design
+from .assets import AssetProber
+from .content import chunk_content, estimate_tokens, extract_blocks, extract_content, pack_content, rank_blocks
+from .crawl import crawl_site
+from .crew import URLSummarizer
+from .batch import create_documents, interleave_by_host, summarize_batch
+from .css import DesignCollector, RemoteStylesheetCache, StylesheetCache, parse_stylesheet, remote_stylesheets
+from .dom import DOMStats
+from .fetch_cache import FetchCache, normalize_url
+from .fetching import read_html
+from .instrumentation import bind_current, call_cost, percentile, stage, track_llm_call, usage_callback
+from .llm_guard import BackendUnavailable, CircuitBreaker, LLMGuard, RetryBudget, TokenBucket
+from .jobs import enqueue_batch, run_site_crawl, run_summary_batch, run_summary_job
+from .models import CachedPage, CachedSummary, LLMCall, SiteCrawl, SummaryJob, WebsiteAnalysis
+from .parse_service import ParseService
+from .parsers import available_backends, get_backend, make_soup
+from .pool import InstancePool
+from .summary_cache import SummaryCache
+from .summary_filter import SummaryFilter, clean_summary_output
+from .website_analyzer import WebsiteAnalyzer
+
+
+def fake_response(status_code=200, text='', headers=None, chunk_size=None):
+    body = text if isinstance(text, bytes) else text.encode('utf-8')
+    chunk_size = chunk_size or max(len(body), 1)
+    response = mock.Mock()
+    response.status_code = status_code
+    response.headers = headers or {}
+    response.encoding = 'utf-8'
+    response.iter_content.side_effect = lambda **kwargs: (
+        body[i:i + chunk_size] for i in range(0, len(body), chunk_size)
+    )
+    return response
+
+
+def pool_of(instance):
+    return InstancePool(lambda: instance)
+
+
+class InstancePoolTests(TestCase):
+    def test_reuses_idle_instances(self):
+        factory = mock.Mock(side_effect=lambda: object())
+        pool = InstancePool(factory, max_idle=2)
+
+        with pool.acquire() as first:
+            pass
+        with pool.acquire() as second:
+            self.assertIs(second, first)
+        self.assertEqual(factory.call_count, 1)
+
+    def test_concurrent_callers_get_separate_instances(self):
+        pool = InstancePool(lambda: object(), max_idle=1)
+
+        with pool.acquire() as first, pool.acquire() as second:
+            self.assertIsNot(first, second)
+        # Only one instance is kept once both are released
+        self.assertEqual(len(pool._idle), 1)
+
+
+class NormalizeURLTests(TestCase):
+    def test_equivalent_urls_normalize_to_same_value(self):
+        self.assertEqual(
+            normalize_url('HTTPS://Example.com:443/docs?b=2&a=1#intro'),
+            normalize_url('https://example.com/docs?a=1&b=2'),
+        )
+
+    def test_empty_path_becomes_root(self):
+        self.assertEqual(normalize_url('http://example.com'), 'http://example.com/')
+
+    def test_non_default_port_is_kept(self):
+        self.assertEqual(normalize_url('http://example.com:8080/a'), 'http://example.com:8080/a')
+
+
+class FetchCacheTests(TestCase):
+    url = 'https://example.com/page'
+
+    def setUp(self):
+        self.extract = mock.Mock(side_effect=lambda body: body.upper())
+
+    @mock.patch('requests.Session.get')
+    def test_fresh_entry_skips_network(self, mock_get):
+        mock_get.return_value = fake_response(text='hello', headers={'ETag': '"v1"'})
+        fetch_cache = FetchCache(ttl=60)
+
+        self.assertEqual(fetch_cache.fetch(self.url, self.extract), 'HELLO')
+        self.assertEqual(fetch_cache.fetch(self.url + '#top', self.extract), 'HELLO')
+
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertEqual(self.extract.call_count, 1)
+
+    @mock.patch('requests.Session.get')
+    def test_stale_entry_revalidates_with_conditional_get(self, mock_get):
+        mock_get.return_value = fake_response(
+            text='hello', headers={'ETag': '"v1"', 'Last-Modified': 'Mon, 01 Jan 2024 00:00:00 GMT'}
+        )
+        fetch_cache = FetchCache(ttl=0)
+        fetch_cache.fetch(self.url, self.extract)
+
+        mock_get.return_value = fake_response(status_code=304)
+        self.assertEqual(fetch_cache.fetch(self.url, self.extract), 'HELLO')
+
+        headers = mock_get.call_args.kwargs['headers']
+        self.assertEqual(headers['If-None-Match'], '"v1"')
+        self.assertEqual(headers['If-Modified-Since'], 'Mon, 01 Jan 2024 00:00:00 GMT')
+        self.assertEqual(self.extract.call_count, 1)
+
+    @mock.patch('requests.Session.get')
+    def test_full_fetch_replaces_a_partial_copy(self, mock_get):
+        page = '<html><body><main>' + '<p>' + 'word ' * 100 + '</p>' * 1 + '</main></body></html>'
+        mock_get.return_value = fake_response(text=page * 3, headers={'ETag': '"v1"'}, chunk_size=200)
+        fetch_cache = FetchCache(ttl=60, text_target=50)
+        fetch_cache.fetch(self.url, self.extract)
+        self.assertTrue(CachedPage.objects.get().partial)
+
+        mock_get.return_value = fake_response(text=page * 3, headers={'ETag': '"v1"'}, chunk_size=200)
+        self.assertEqual(fetch_cache.fetch(self.url, self.extract, full=True), (page * 3).upper())
+
+        # The fresh partial entry was not served, and not revalidated into a 304 either
+        self.assertNotIn('If-None-Match', mock_get.call_args.kwargs['headers'])
+        self.assertFalse(CachedPage.objects.get().partial)
+
+    @mock.patch('requests.Session.get')
+    def test_changed_body_is_re_extracted(self, mock_get):
+        fetch_cache = FetchCache(ttl=0)
+        mock_get.return_value = fake_response(text='first')
+        fetch_cache.fetch(self.url, self.extract)
+
+        mock_get.return_value = fake_response(text='second')
+        self.assertEqual(fetch_cache.fetch(self.url, self.extract), 'SECOND')
+        self.assertEqual(CachedPage.objects.get().text, 'SECOND')
+
+    @mock.patch('requests.Session.get')
+    def test_least_recently_used_entries_are_evicted(self, mock_get):
+        mock_get.return_value = fake_response(text='body')
+        fetch_cache = FetchCache(ttl=60, max_entries=2)
+
+        fetch_cache.fetch('https://example.com/a', self.extract)
+        CachedPage.objects.update(last_accessed=timezone.now() - timedelta(minutes=5))
+        fetch_cache.fetch('https://example.com/b', self.extract)
+        fetch_cache.fetch('https://example.com/c', self.extract)
+
+        urls = set(CachedPage.objects.values_list('url', flat=True))
+        self.assertEqual(urls, {'https://example.com/b', 'https://example.com/c'})
+
+
+class ReadHTMLTests(TestCase):
+    def test_rejects_non_html_before_reading_body(self):
+        response = fake_response(text='%PDF-1.7', headers={'Content-Type': 'application/pdf'})
+
+        with self.assertRaisesMessage(Exception, 'Unsupported content type: application/pdf'):
+            read_html(response)
+        response.iter_content.assert_not_called()
+        response.close.assert_called_once()
+
+    def test_stops_at_byte_cap(self):
+        response = fake_response(text='<p>' + 'x' * 5000 + '</p>', chunk_size=1000)
+
+        body = read_html(response, max_bytes=2500)
+
+        self.assertEqual(len(body), 2500)
+
+    def test_stops_once_enough_main_text_is_seen(self):
+        page = '<nav>' + 'menu ' * 500 + '</nav><main><p>' + 'word ' * 2000 + '</p></main><footer>end</footer>'
+        response = fake_response(text=page, chunk_size=500)
+
+        body = read_html(response, text_target=1000)
+
+        self.assertLess(len(body), len(page) / 2)
+        self.assertIn('<main>', body)
+
+    def test_reads_whole_page_without_text_target(self):
+        page = '<main>' + 'word ' * 2000 + '</main>'
+        self.assertEqual(read_html(fake_response(text=page, chunk_size=500)), page)
+
+
+class ParserBackendTests(TestCase):
+    page = """<!DOCTYPE html><html><head><title>Title</title><style>p { color: red; }</style></head>
+    <body><header>Site <nav>Home<script>track()</script></nav></header>
+    <main><h1>Caching &amp; you</h1><p>Some   text  here
+      continues, then a tail after the note.</p><!-- note --><script>var a;</script><footer>Footer</footer></main></body></html>"""
+
+    def assertMatchesBuiltinParser(self, name):
+        expected = extract_content(get_backend('html.parser').parse(self.page))
+        self.assertEqual(expected, '# Caching & you\n\nSome text here continues, then a tail after the note.')
+        self.assertEqual(extract_content(get_backend(name).parse(self.page)), expected)
+        self.assertEqual(extract_content(get_backend(name).parse(ContentExtractionTests.page)), extract_content(
+            get_backend('html.parser').parse(ContentExtractionTests.page)
+        ))
+        self.assertEqual(extract_content(get_backend(name).parse('')), '')
+
+    @skipUnless('lxml' in available_backends(), 'lxml is not installed')
+    def test_lxml_matches_builtin_parser(self):
+        self.assertMatchesBuiltinParser('lxml')
+
+    @skipUnless('selectolax' in available_backends(), 'selectolax is not installed')
+    def test_selectolax_matches_builtin_parser(self):
+        self.assertMatchesBuiltinParser('selectolax')
+
+    def test_unknown_backend_is_rejected(self):
+        with self.assertRaises(ValueError):
+            get_backend('regex')
+
+
+class SummaryCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.summary_cache = SummaryCache(enabled=True)
+
+    def test_key_depends_on_content_prompt_and_model(self):
+        key = self.summary_cache.key_for('text', 'prompt', 'gpt-3.5-turbo', 0)
+        self.assertEqual(key, self.summary_cache.key_for('text', 'prompt', 'gpt-3.5-turbo', 0))
+        self.assertNotEqual(key, self.summary_cache.key_for('other', 'prompt', 'gpt-3.5-turbo', 0))
+        self.assertNotEqual(key, self.summary_cache.key_for('text', 'prompt v2', 'gpt-3.5-turbo', 0))
+        self.assertNotEqual(key, self.summary_cache.key_for('text', 'prompt', 'gpt-4', 0))
+        self.assertNotEqual(key, self.summary_cache.key_for('text', 'prompt', 'gpt-3.5-turbo', 0.7))
+
+    def test_hits_and_misses_are_counted(self):
+        key = self.summary_cache.key_for('text', 'prompt', 'gpt-3.5-turbo', 0)
+        self.assertIsNone(self.summary_cache.get(key))
+
+        self.summary_cache.set(key, '# Title\n\nBody', model='gpt-3.5-turbo')
+        self.assertEqual(self.summary_cache.get(key), '# Title\n\nBody')
+        self.assertEqual(self.summary_cache.get(key), '# Title\n\nBody')
+
+        stats = SummaryCache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['entries']), (2, 1, 1))
+        self.assertEqual(CachedSummary.objects.get().hit_count, 2)
+
+    def test_disabled_cache_never_returns_entries(self):
+        key = self.summary_cache.key_for('text', 'prompt', 'gpt-3.5-turbo', 0)
+        self.summary_cache.set(key, 'summary')
+        self.assertIsNone(SummaryCache(enabled=False).get(key))
+
+
+@mock.patch.dict('os.environ', {'OPENAI_API_KEY': 'test-key'})
+class SummaryJobTests(TestCase):
+    @mock.patch('url_summarizer.jobs.get_executor')
+    def test_create_job_returns_immediately(self, mock_get_executor):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse('url_summarizer:create_summary_job'),
+                data={'url': 'https://example.com'},
+                content_type='application/json'
+            )
+
+        self.assertEqual(response.status_code, 202)
+        job = SummaryJob.objects.get()
+        self.assertEqual(response.json()['job_id'], str(job.pk))
+        self.assertEqual(response.json()['status'], SummaryJob.STATUS_QUEUED)
+        self.assertEqual(response['Location'], reverse('url_summarizer:summary_job', kwargs={'job_id': job.pk}))
+        mock_get_executor.return_value.submit.assert_called_once_with(run_summary_job, job.pk)
+
+    def test_create_job_requires_url(self):
+        response = self.client.post(
+            reverse('url_summarizer:create_summary_job'),
+            data={},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(SummaryJob.objects.exists())
+
+    def test_worker_stores_result(self):
+        summarizer = mock.Mock()
+        summarizer.get_summary.return_value = '# Example'
+        job = SummaryJob.objects.create(url='https://example.com')
+
+        with mock.patch('url_summarizer.crew.summarizer_pool', pool_of(summarizer)):
+            run_summary_job(job.pk)
+
+        response = self.client.get(reverse('url_summarizer:summary_job', kwargs={'job_id': job.pk}))
+        self.assertEqual(response.json()['status'], SummaryJob.STATUS_DONE)
+        self.assertEqual(response.json()['summary'], '# Example')
+
+    def test_job_status_is_only_shown_to_its_owner(self):
+        owner = get_user_model().objects.create_user(username='owner', password='testpass123')
+        job = SummaryJob.objects.create(url='https://example.com', user=owner, error='secret')
+        url = reverse('url_summarizer:summary_job', kwargs={'job_id': job.pk})
+
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.client.force_login(get_user_model().objects.create_user(username='other', password='testpass123'))
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.client.force_login(get_user_model().objects.create_user(username='admin', is_staff=True))
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.client.force_login(owner)
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_worker_records_failure(self):
+        summarizer = mock.Mock()
+        summarizer.get_summary.side_effect = Exception('boom')
+        job = SummaryJob.objects.create(url='https://example.com')
+
+        with mock.patch('url_summarizer.crew.summarizer_pool', pool_of(summarizer)):
+            run_summary_job(job.pk)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, SummaryJob.STATUS_FAILED)
+        self.assertEqual(job.error, 'boom')
+        self.assertIsNotNone(job.finished_at)
+
+
+class SummaryFilterTests(TestCase):
+    response = (
+        "I will write the summary now.\n"
+        "\n"
+        "# Django Caching\n"
+        "\n"
+        "## Overview\n"
+        "Django ships several cache backends.\n"
+        "Following the example above, ...\n"
+        "- Memcached"
+    )
+
+    def test_strips_meta_text_before_first_heading(self):
+        self.assertEqual(
+            clean_summary_output(self.response),
+            "# Django Caching\n\n## Overview\nDjango ships several cache backends.\n- Memcached"
+        )
+
+    def test_streamed_chunks_match_whole_response(self):
+        summary_filter = SummaryFilter()
+        emitted = [summary_filter.feed(self.response[i:i + 7]) for i in range(0, len(self.response), 7)]
+        emitted.append(summary_filter.finish())
+
+        self.assertEqual(''.join(emitted).strip(), clean_summary_output(self.response))
+        # Nothing is released before the heading has been seen
+        first_output = next(i for i, text in enumerate(emitted) if text)
+        self.assertTrue(emitted[first_output].startswith('# Django Caching'))
+
+    def test_adds_title_when_response_has_no_heading(self):
+        self.assertEqual(
+            clean_summary_output("[Thinking]\nCaching in Django\nIt is fast."),
+            "# Caching in Django\nIt is fast."
+        )
+
+
+@mock.patch.dict('os.environ', {'OPENAI_API_KEY': 'test-key'})
+class StreamSummaryTests(TestCase):
+    async def test_streams_tokens_as_server_sent_events(self):
+        async def fake_stream(url):
+            yield '# Title\n'
+            yield 'Body\n'
+
+        summarizer = mock.Mock(astream_summary=fake_stream)
+        with mock.patch('url_summarizer.views.summarizer_pool', pool_of(summarizer)):
+            response = await self.async_client.get(
+                reverse('url_summarizer:stream_summary'), {'url': 'https://example.com'}
+            )
+            body = b''.join([chunk async for chunk in response.streaming_content]).decode()
+
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual(body, (
+            'event: token\ndata: {"text": "# Title\\n"}\n\n'
+            'event: token\ndata: {"text": "Body\\n"}\n\n'
+            'event: done\ndata: {}\n\n'
+        ))
+
+    async def test_errors_are_sent_as_events(self):
+        async def failing_stream(url):
+            raise Exception('timeout')
+            yield
+
+        summarizer = mock.Mock(astream_summary=failing_stream)
+        with mock.patch('url_summarizer.views.summarizer_pool', pool_of(summarizer)):
+            response = await self.async_client.get(
+                reverse('url_summarizer:stream_summary'), {'url': 'https://example.com'}
+            )
+            body = b''.join([chunk async for chunk in response.streaming_content]).decode()
+
+        self.assertIn('event: error', body)
+        self.assertIn('timeout', body)
+
+
+class FakeSummarizer:
+    """Records how many fetches and summaries run at the same time."""
+
+    def __init__(self, fail_urls=()):
+        self.fail_urls = set(fail_urls)
+        self.lock = threading.Lock()
+        self.active_hosts = {}
+        self.max_per_host = 0
+        self.active_llm = 0
+        self.max_llm = 0
+
+    def _fetch_url_content(self, url):
+        host = url.split('/')[2]
+        with self.lock:
+            self.active_hosts[host] = self.active_hosts.get(host, 0) + 1
+            self.max_per_host = max(self.max_per_host, self.active_hosts[host])
+        time.sleep(0.01)
+        with self.lock:
+            self.active_hosts[host] -= 1
+        if url in self.fail_urls:
+            raise Exception('Error fetching URL content: 404')
+        return f'content of {url}'
+
+    def summarize_content(self, content):
+        with self.lock:
+            self.active_llm += 1
+            self.max_llm = max(self.max_llm, self.active_llm)
+        time.sleep(0.01)
+        with self.lock:
+            self.active_llm -= 1
+        return f'# {content}'
+
+
+class BatchSummarizeTests(TestCase):
+    def test_interleave_by_host(self):
+        urls = ['http://a/1', 'http://a/2', 'http://a/3', 'http://b/1', 'http://c/1']
+        self.assertEqual(
+            interleave_by_host(urls),
+            ['http://a/1', 'http://b/1', 'http://c/1', 'http://a/2', 'http://a/3']
+        )
+
+    def test_respects_concurrency_limits_and_keeps_order(self):
+        urls = [f'http://host{i % 2}/{i}' for i in range(12)]
+        summarizer = FakeSummarizer(fail_urls=['http://host1/5'])
+
+        results = summarize_batch(
+            urls, summarizer_pool=pool_of(summarizer), fetch_concurrency=8, per_host_limit=2, llm_concurrency=3
+        )
+
+        self.assertEqual([result['url'] for result in results], urls)
+        self.assertEqual(results[0]['summary'], '# content of http://host0/0')
+        self.assertEqual(results[5]['summary'], '')
+        self.assertIn('404', results[5]['error'])
+        self.assertLessEqual(summarizer.max_per_host, 2)
+        self.assertLessEqual(summarizer.max_llm, 3)
+
+    def test_create_documents_assigns_unique_slugs(self):
+        author = get_user_model().objects.create_user(username='writer', password='testpass123')
+        Document.objects.create(title='Caching', content='Existing', author=author)
+        results = [
+            {'url': 'https://a.example/', 'summary': '# Caching\n\nFirst', 'error': ''},
+            {'url': 'https://b.example/', 'summary': '# Caching\n\nSecond', 'error': ''},
+            {'url': 'https://c.example/docs', 'summary': 'No heading', 'error': ''},
+            {'url': 'https://d.example/', 'summary': '', 'error': 'timeout'},
+        ]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            documents = create_documents(results, author)
+
+        self.assertEqual([document.slug for document in documents], [
+            'caching-1', 'caching-2', 'summary-of-cexampledocs'
+        ])
+        self.assertEqual(Document.objects.count(), 4)
+        # bulk_create bypasses post_save, so the documents are indexed explicitly
+        self.assertEqual({document.slug for document in Document.search(query='second')}, {'caching-2'})
+
+    def test_create_documents_refreshes_autocomplete(self):
+        author = get_user_model().objects.create_user(username='writer', password='testpass123')
+        self.assertEqual(suggest('caching'), [])
+        results = [{'url': 'https://a.example/', 'summary': '# Caching\n\nFirst', 'error': ''}]
+
+        with mock.patch('url_summarizer.batch.invalidate_prefix_index', wraps=invalidate_prefix_index) as invalidate:
+            with self.captureOnCommitCallbacks(execute=True):
+                create_documents(results, author)
+
+        invalidate.assert_called_once_with()
+        self.assertEqual([result['label'] for result in suggest('caching')], ['Caching'])
+
+
+@mock.patch.dict('os.environ', {'OPENAI_API_KEY': 'test-key'})
+class SummaryBatchJobTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='writer', password='testpass123')
+
+    @mock.patch('url_summarizer.jobs.get_executor')
+    def test_batch_endpoint_queues_one_job_per_url(self, mock_get_executor):
+        self.client.login(username='writer', password='testpass123')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse('url_summarizer:create_summary_batch'),
+                data={'urls': ['https://a.example/', 'https://b.example/']},
+                content_type='application/json'
+            )
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(len(response.json()['jobs']), 2)
+        self.assertEqual(SummaryJob.objects.filter(batch_id=response.json()['batch_id']).count(), 2)
+        mock_get_executor.return_value.submit.assert_called_once()
+
+    def test_batch_endpoint_rejects_invalid_url_list(self):
+        self.client.login(username='writer', password='testpass123')
+        response = self.client.post(
+            reverse('url_summarizer:create_summary_batch'),
+            data={'urls': 'https://a.example/'},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+
+    @mock.patch('url_summarizer.batch.summarize_batch')
+    def test_batch_worker_updates_jobs_and_creates_documents(self, mock_summarize_batch):
+        mock_summarize_batch.return_value = [
+            {'url': 'https://a.example/', 'summary': '# A summary', 'error': ''},
+            {'url': 'https://b.example/', 'summary': '', 'error': 'timeout'},
+        ]
+        batch_id = uuid.uuid4()
+        for url in ['https://a.example/', 'https://b.example/']:
+            SummaryJob.objects.create(url=url, user=self.user, batch_id=batch_id)
+
+        run_summary_batch(batch_id, self.user.pk)
+
+        done = SummaryJob.objects.get(url='https://a.example/')
+        failed = SummaryJob.objects.get(url='https://b.example/')
+        self.assertEqual(done.status, SummaryJob.STATUS_DONE)
+        self.assertEqual(done.document.title, 'A summary')
+        self.assertEqual(failed.status, SummaryJob.STATUS_FAILED)
+        self.assertEqual(failed.error, 'timeout')
+
+    @mock.patch('url_summarizer.batch.create_documents', side_effect=IntegrityError('UNIQUE constraint failed'))
+    @mock.patch('url_summarizer.batch.summarize_batch')
+    def test_batch_keeps_summaries_when_documents_cannot_be_saved(self, mock_summarize_batch, _):
+        mock_summarize_batch.return_value = [{'url': 'https://a.example/', 'summary': '# A summary', 'error': ''}]
+        batch_id = uuid.uuid4()
+        job = SummaryJob.objects.create(url='https://a.example/', user=self.user, batch_id=batch_id)
+
+        with self.assertLogs('url_summarizer.jobs', 'WARNING'):
+            run_summary_batch(batch_id, self.user.pk)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, SummaryJob.STATUS_FAILED)
+        self.assertEqual(job.result, '# A summary')
+        self.assertIn('UNIQUE constraint failed', job.error)
+        self.assertIsNotNone(job.finished_at)
+
+    @mock.patch('url_summarizer.batch.summarize_batch', return_value=[])
+    def test_batch_failure_never_leaves_jobs_running(self, _):
+        # A result missing for a job breaks the bookkeeping after the jobs were marked running
+        batch_id = uuid.uuid4()
+        SummaryJob.objects.create(url='https://a.example/', user=self.user, batch_id=batch_id)
+
+        with self.assertLogs('url_summarizer.jobs', 'ERROR'):
+            run_summary_batch(batch_id, self.user.pk)
+
+        self.assertEqual(SummaryJob.objects.get(batch_id=batch_id).status, SummaryJob.STATUS_FAILED)
+
+    @mock.patch('url_summarizer.jobs.get_executor')
+    def test_batch_summarizes_each_url_once(self, _):
+        batch_id, jobs = enqueue_batch(['https://a.example/', 'https://b.example/', 'https://a.example/'], self.user)
+        self.assertEqual([job.url for job in jobs], ['https://a.example/', 'https://b.example/'])
+
+
+class DesignExtractionTests(TestCase):
+    page = """<html><head>
+    <style>
+      body { color: #333; font-family: Inter, sans-serif; margin: 0 auto; text-align: center; }
+      .card { background: #fff; padding: 16px; justify-content: space-between; font-size: 14px; }
+    </style>
+    <style>h1 { color: #333; margin: 0 auto; }</style>
+    </head><body><div style="color: rgb(10, 20, 30); border: 1px solid #abc">x</div></body></html>"""
+
+    def test_single_pass_collects_all_design_elements(self):
+        collector = DesignCollector()
+        cache = StylesheetCache(max_entries=10)
+        soup = make_soup(self.page)
+        for style in soup.find_all('style'):
+            collector.add_declarations(cache.parse(style.string).declarations)
+        for tag in soup.find_all(style=True):
+            collector.add_inline_style(tag['style'])
+
+        design = collector.as_dict()
+        self.assertEqual(design['colors'], ['#333', '#fff', 'rgb(10, 20, 30)', '#abc'])
+        self.assertEqual(design['typography'], ['Inter, sans-serif', '14px'])
+        self.assertEqual(design['spacing'], {
+            'margins': ['0 auto'],
+            'padding': ['16px'],
+            'alignment': ['center', 'space-between'],
+        })
+
+    def test_stylesheets_are_parsed_once(self):
+        cache = StylesheetCache(max_entries=1)
+        with mock.patch('url_summarizer.parse_service.parse_stylesheet', wraps=parse_stylesheet) as parse:
+            cache.parse('a { color: red }')
+            cache.parse('a { color: red }')
+            self.assertEqual(parse.call_count, 1)
+
+            # Least recently used sheets are evicted beyond max_entries
+            cache.parse('b { color: blue }')
+            cache.parse('a { color: red }')
+            self.assertEqual(parse.call_count, 3)
+        self.assertEqual((cache.hits, cache.misses), (1, 3))
+
+
+class DOMStatsTests(TestCase):
+    page = """<!DOCTYPE html><html><head>
+    <meta charset="utf-8"><title>Site</title>
+    <link rel="stylesheet" href="/static/site.css"><link rel="icon" href="/favicon.ico">
+    <link rel="preload stylesheet" href="https://cdn.example/bootstrap.css">
+    <style>body { color: #333; }</style>
+    </head><body>
+    <header class="d-flex"><nav>menu</nav></header>
+    <main class="grid-container">
+      <section style="background-image: url('/img/hero.jpg')"><img src="/img/logo.png" alt="Logo"></section>
+      <article><img src="/img/photo.jpg"><form></form></article>
+    </main>
+    <footer></footer><script>init()</script>
+    </body></html>"""
+
+    def test_collects_everything_in_one_walk(self):
+        stats = DOMStats.collect(make_soup(self.page))
+
+        self.assertTrue(stats.has_doctype)
+        self.assertEqual(stats.head_elements, ['meta', 'title', 'link', 'link', 'link', 'style'])
+        self.assertEqual(stats.main_sections, ['header', 'nav', 'main', 'footer'])
+        self.assertTrue(stats.grid_usage)
+        self.assertTrue(stats.flexbox_usage)
+        self.assertEqual(stats.images, [('/img/logo.png', 'Logo'), ('/img/photo.jpg', '')])
+        self.assertEqual(stats.stylesheet_hrefs, ['/static/site.css', 'https://cdn.example/bootstrap.css'])
+        self.assertEqual(stats.style_blocks, ['body { color: #333; }'])
+        # Plain strings, so the stats do not keep the parsed tree alive
+        self.assertIs(type(stats.style_blocks[0]), str)
+        self.assertEqual(stats.inline_styles, [('section', "background-image: url('/img/hero.jpg')")])
+        self.assertEqual((stats.tag_counts['section'], stats.tag_counts['script']), (1, 1))
+
+    def test_doctype_is_optional(self):
+        self.assertFalse(DOMStats.collect(make_soup('<html><body></body></html>')).has_doctype)
+
+    def test_analyzer_sections_use_the_collected_stats(self):
+        analyzer = WebsiteAnalyzer.__new__(WebsiteAnalyzer)
+        stats = DOMStats.collect(make_soup(self.page))
+
+        assets = analyzer._collect_assets(stats, 'https://site.example/')
+        self.assertEqual(assets['images'], [
+            {'url': 'https://site.example/img/logo.png', 'alt': 'Logo', 'type': 'icon'},
+            {'url': 'https://site.example/img/photo.jpg', 'alt': '', 'type': 'image'},
+        ])
+        self.assertEqual(assets['backgrounds'], [
+            {'url': 'https://site.example/img/hero.jpg', 'element': 'section'},
+        ])
+
+        structure = analyzer._analyze_structure(stats)
+        self.assertTrue(structure['doctype'])
+        self.assertEqual(structure['semantic_elements'], {
+            'header': 1, 'nav': 1, 'main': 1, 'article': 1, 'section': 1, 'aside': 0, 'footer': 1,
+        })
+        self.assertEqual((structure['meta_tags'], structure['scripts'], structure['styles'], structure['forms']), (1, 1, 1, 1))
+
+
+class RemoteStylesheetTests(TestCase):
+    stylesheets = {
+        'https://cdn.example/bootstrap.css': '@import url("theme.css"); body { color: #212529; font-family: system-ui; }',
+        'https://cdn.example/theme.css': '.btn { background-color: #0d6efd; padding: .375rem .75rem; }',
+        'https://site.example/static/site.css': 'h1 { margin: 0 0 1rem; }',
+    }
+
+    def setUp(self):
+        self.session = mock.Mock()
+        self.session.get.side_effect = lambda url, **kwargs: fake_response(
+            text=self.stylesheets[url], headers={'Content-Type': 'text/css', 'ETag': '"v1"'}
+        )
+        self.remote = RemoteStylesheetCache(StylesheetCache(), session=self.session)
+
+    def test_fetches_imports_and_caches_per_url(self):
+        parsed = self.remote.fetch_all(['https://cdn.example/bootstrap.css', 'https://site.example/static/site.css'])
+
+        declarations = [declaration for sheet in parsed for declaration in sheet.declarations]
+        self.assertIn(('background-color', '#0d6efd'), declarations)
+        self.assertIn(('margin', '0 0 1rem'), declarations)
+        self.assertEqual(self.session.get.call_count, 3)
+
+        # A second analysis sharing the CDN stylesheet does not download it again
+        self.remote.fetch_all(['https://cdn.example/bootstrap.css'])
+        self.assertEqual(self.session.get.call_count, 3)
+
+    @override_settings(URL_SUMMARIZER_CSS_FETCH_TTL=0)
+    def test_revalidates_with_etag(self):
+        self.remote.fetch_all(['https://site.example/static/site.css'])
+        self.session.get.side_effect = lambda url, **kwargs: fake_response(status_code=304)
+
+        parsed = self.remote.fetch_all(['https://site.example/static/site.css'])
+
+        self.assertEqual(parsed[0].declarations, (('margin', '0 0 1rem'),))
+        self.assertEqual(self.session.get.call_args.kwargs['headers']['If-None-Match'], '"v1"')
+
+    def test_failed_downloads_are_skipped(self):
+        self.session.get.side_effect = Exception('connection refused')
+        self.assertEqual(self.remote.fetch_all(['https://cdn.example/missing.css']), [])
+
+
+def png_bytes(width, height):
+    buffer = BytesIO()
+    Image.new('RGB', (width, height), (200, 30, 30)).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+class AssetProbeTests(TestCase):
+    def setUp(self):
+        self.image = png_bytes(640, 480)
+        self.session = mock.Mock()
+        self.session.get.side_effect = self.serve
+        self.prober = AssetProber(session=self.session)
+
+    def serve(self, url, headers=None, **kwargs):
+        end = int(headers['Range'].split('-')[1])
+        return fake_response(status_code=206, text=self.image[:end + 1], headers={
+            'Content-Type': 'image/png',
+            'Content-Range': f'bytes 0-{end}/{len(self.image)}',
+        })
+
+    @override_settings(URL_SUMMARIZER_ASSET_PROBE_BYTES=64)
+    def test_reads_dimensions_from_a_prefix(self):
+        info = self.prober.probe_all(['https://cdn.example/hero.png'])['https://cdn.example/hero.png']
+
+        self.assertEqual(info, {'bytes': len(self.image), 'mime_type': 'image/png', 'width': 640, 'height': 480})
+        self.assertEqual(self.session.get.call_args.kwargs['headers'], {'Range': 'bytes=0-63'})
+
+    def test_results_are_cached_per_url(self):
+        self.prober.probe_all(['https://cdn.example/hero.png', 'https://cdn.example/hero.png'])
+        self.prober.probe_all(['https://cdn.example/hero.png'])
+        self.assertEqual(self.session.get.call_count, 1)
+
+        # A cached probe without a thumbnail is fetched again when one is wanted
+        info = self.prober.probe_all(['https://cdn.example/hero.png'], thumbnails=True)['https://cdn.example/hero.png']
+        self.assertTrue(info['thumbnail'].startswith('data:image/png;base64,'))
+        self.assertEqual(self.session.get.call_count, 2)
+
+        # ...and left out again for requests without thumbnails
+        info = self.prober.probe_all(['https://cdn.example/hero.png'])['https://cdn.example/hero.png']
+        self.assertNotIn('thumbnail', info)
+        self.assertEqual(self.session.get.call_count, 2)
+
+    def test_stops_at_the_deadline(self):
+        def slow(url, **kwargs):
+            time.sleep(0.5)
+            return self.serve(url, **kwargs)
+        self.session.get.side_effect = slow
+
+        started = time.monotonic()
+        results = self.prober.probe_all(['https://cdn.example/a.png', 'https://cdn.example/b.png'], deadline=0.1)
+
+        self.assertEqual(results, {})
+        self.assertLess(time.monotonic() - started, 0.4)
+
+    def test_unreachable_assets_are_left_out(self):
+        self.session.get.side_effect = Exception('connection refused')
+        self.assertEqual(self.prober.probe_all(['https://cdn.example/missing.png']), {})
+
+
+class AnalysisModeTests(TestCase):
+    page = """<html><head><style>body { color: #333; }</style></head>
+    <body><main><img src="/logo.png" alt="Logo"></main></body></html>"""
+
+    def setUp(self):
+        self.analyzer = WebsiteAnalyzer()
+        self.analyzer.session = mock.Mock()
+        self.analyzer.session.get.return_value = fake_response(
+            text=self.page, headers={'Content-Type': 'text/html; charset=utf-8'}
+        )
+
+    @mock.patch('url_summarizer.website_analyzer.Agent')
+    @mock.patch('url_summarizer.website_analyzer.ChatOpenAI')
+    def test_static_mode_builds_no_llm_objects(self, chat_openai, agent):
+        analysis = self.analyzer.analyze_website('https://site.example/', mode='static')
+
+        self.assertEqual(analysis['design_elements']['colors'], ['#333'])
+        self.assertNotIn('ai_insights', analysis)
+        chat_openai.assert_not_called()
+        agent.assert_not_called()
+
+    @mock.patch('url_summarizer.website_analyzer.Agent', side_effect=lambda **kwargs: mock.Mock(role=kwargs['role']))
+    @mock.patch('url_summarizer.website_analyzer.ChatOpenAI')
+    def test_ai_mode_runs_agents_concurrently_on_extracted_data(self, chat_openai, agent):
+        def crew(agents, tasks, verbose):
+            def kickoff():
+                time.sleep(0.2)
+                return f"{agents[0].role}: {tasks[0].description}"
+            return mock.Mock(kickoff=kickoff)
+
+        with mock.patch('url_summarizer.website_analyzer.Task', side_effect=lambda **kwargs: mock.Mock(**kwargs)), \
+                mock.patch('url_summarizer.website_analyzer.Crew', side_effect=crew):
+            started = time.monotonic()
+            analysis = self.analyzer.analyze_website('https://site.example/', mode='ai')
+            elapsed = time.monotonic() - started
+
+        insights = analysis['ai_insights']
+        self.assertEqual(set(insights), {'style', 'structure', 'assets'})
+        self.assertTrue(insights['style'].startswith('Web Design Analyst'))
+        self.assertIn('"colors": ["#333"]', insights['style'])
+        self.assertIn('https://site.example/logo.png', insights['assets'])
+        self.assertLess(elapsed, 0.5)
+        # The page is fetched once; agents never see the raw URL content
+        self.assertEqual(self.analyzer.session.get.call_count, 1)
+        self.assertEqual(chat_openai.call_count, 1)
+
+    def test_error_responses_are_closed(self):
+        response = fake_response(status_code=503)
+        response.raise_for_status.side_effect = requests.HTTPError('503 Server Error')
+        self.analyzer.session.get.return_value = response
+
+        with self.assertRaises(Exception):
+            self.analyzer.analyze_website('https://site.example/', mode='static')
+        response.close.assert_called_once()
+
+    def test_rejects_unknown_mode(self):
+        self.client.force_login(get_user_model().objects.create_user(username='designer', password='testpass123'))
+        response = self.client.post(
+            reverse('url_summarizer:analyze_website'),
+            data={'url': 'https://site.example/', 'mode': 'deep'},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(URL_SUMMARIZER_CSS_FETCH_TTL=0)
+class AnalysisStoreTests(TestCase):
+    page = """<html><head><link rel="stylesheet" href="/site.css"></head>
+    <body><main class="grid"><img src="/logo.png" alt="Logo"></main></body></html>"""
+
+    def setUp(self):
+        self.html = self.page
+        self.css = 'body { color: #333; }'
+        self.analyzer = WebsiteAnalyzer()
+        self.analyzer.session = mock.Mock()
+        self.analyzer.session.get.side_effect = self.serve_page
+
+        remote_stylesheets.clear()
+        css_session = mock.Mock()
+        css_session.get.side_effect = lambda url, **kwargs: fake_response(
+            text=self.css, headers={'Content-Type': 'text/css'}
+        )
+        patcher = mock.patch.object(remote_stylesheets, 'session', css_session)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(remote_stylesheets.clear)
+
+    def serve_page(self, url, headers=None, **kwargs):
+        if headers.get('If-None-Match') == '"v1"' and self.html == self.page:
+            return fake_response(status_code=304)
+        return fake_response(text=self.html, headers={'Content-Type': 'text/html', 'ETag': '"v1"'})
+
+    def analyze(self, **kwargs):
+        return analyze_and_store(self.analyzer, 'https://site.example/', **kwargs)
+
+    def test_unchanged_page_returns_stored_result(self):
+        analysis, record, unchanged = self.analyze()
+        self.assertFalse(unchanged)
+        self.assertEqual(analysis['design_elements']['colors'], ['#333'])
+
+        with mock.patch('url_summarizer.parse_service.collect_dom') as collect_dom:
+            repeat, same_record, unchanged = self.analyze()
+
+        self.assertTrue(unchanged)
+        self.assertEqual(same_record.pk, record.pk)
+        self.assertEqual(repeat, analysis)
+        collect_dom.assert_not_called()
+        # The page was revalidated with its ETag and not downloaded again
+        self.assertEqual(self.analyzer.session.get.call_args.kwargs['headers']['If-None-Match'], '"v1"')
+        self.assertEqual(WebsiteAnalysis.objects.count(), 1)
+
+    def test_only_changed_sections_are_recomputed(self):
+        with mock.patch('url_summarizer.website_analyzer.asset_prober') as prober:
+            prober.probe_all.return_value = {'https://site.example/logo.png': {'width': 120, 'height': 40}}
+            self.analyze(probe_assets=True)
+            self.css = 'body { color: #000; }'
+            analysis, record, unchanged = self.analyze(probe_assets=True)
+
+        self.assertFalse(unchanged)
+        self.assertEqual(analysis['design_elements']['colors'], ['#000'])
+        # The asset list did not change, so the stored probe results are reused
+        self.assertEqual(prober.probe_all.call_count, 1)
+        self.assertEqual(analysis['assets']['images'][0]['width'], 120)
+        self.assertEqual(WebsiteAnalysis.objects.count(), 2)
+
+    def test_history_diffs_design_between_runs(self):
+        self.analyze()
+        self.css = 'body { color: #000; font-family: Inter; }'
+        self.html = self.page.replace('class="grid"', '')
+        self.analyze()
+
+        user = get_user_model().objects.create_user(username='designer', password='testpass123')
+        self.client.force_login(user)
+        response = self.client.get(reverse('url_summarizer:analysis_history'), {'url': 'https://site.example/'})
+
+        history = response.json()['history']
+        self.assertEqual(len(history), 2)
+        self.assertEqual(history[0]['design_changes'], {
+            'colors': {'added': ['#000'], 'removed': ['#333']},
+            'typography': {'added': ['Inter'], 'removed': []},
+            'layout': {'grid_usage': {'from': True, 'to': False}},
+        })
+        self.assertIsNone(history[1]['design_changes'])
+
+    def test_diff_of_identical_design_is_empty(self):
+        design = {'colors': ['#333'], 'typography': [], 'spacing': {'margins': ['0']}, 'layout': {'grid_usage': False}}
+        self.assertEqual(diff_design(design, design), {})
+
+
+class SiteCrawlTests(TestCase):
+    site = {
+        '/robots.txt': 'User-agent: *\nDisallow: /private/',
+        '/': '<html><body><header>Site</header><main class="grid"><img src="/logo.png">'
+             '<a href="/about">About</a><a href="/blog#top">Blog</a><a href="/private/admin">Admin</a>'
+             '<a href="https://other.example/">Elsewhere</a><a href="/brochure.pdf">PDF</a>'
+             '<div style="color: #111">x</div></main></body></html>',
+        '/about': '<html><body><header>Site</header><main><img src="/logo.png"><a href="/team">Team</a>'
+                  '<div style="color: #111">x</div><form></form></main></body></html>',
+        '/blog': '<html><body><header>Site</header><main><a href="/">Home</a>'
+                 '<div style="color: #222">x</div></main></body></html>',
+        '/team': '<html><body><main>Team</main></body></html>',
+    }
+
+    def setUp(self):
+        self.requested = []
+        self.analyzer = WebsiteAnalyzer()
+        self.analyzer.session = mock.Mock()
+        self.analyzer.session.get.side_effect = self.serve
+
+    def serve(self, url, **kwargs):
+        path = url.replace('https://site.example', '')
+        self.requested.append(path)
+        if path not in self.site:
+            response = fake_response(status_code=404)
+            response.raise_for_status.side_effect = Exception('404 Not Found')
+            return response
+        response = fake_response(text=self.site[path], headers={'Content-Type': 'text/html'})
+        response.text = self.site[path]
+        return response
+
+    def test_crawls_same_origin_pages_within_depth(self):
+        progress = []
+        profile = crawl_site(
+            'https://site.example/', self.analyzer, max_pages=10, max_depth=1,
+            progress=lambda *args: progress.append(args)
+        )
+
+        self.assertEqual(sorted(page['url'] for page in profile['pages']), [
+            'https://site.example/', 'https://site.example/about', 'https://site.example/blog',
+            'https://site.example/private/admin',
+        ])
+        # /team is two links away, and robots.txt keeps the crawler out of /private/
+        self.assertNotIn('/team', self.requested)
+        self.assertNotIn('/private/admin', self.requested)
+        self.assertEqual(self.requested.count('/robots.txt'), 1)
+        self.assertEqual((profile['pages_analyzed'], profile['pages_failed']), (3, 1))
+
+        self.assertEqual(profile['colors'], [{'value': '#111', 'pages': 2}, {'value': '#222', 'pages': 1}])
+        self.assertEqual(profile['components']['header'], {'pages': 3, 'count': 3})
+        self.assertEqual(profile['components']['form'], {'pages': 1, 'count': 1})
+        self.assertEqual(profile['layout'], {'grid_pages': 1, 'flexbox_pages': 0})
+        self.assertEqual(profile['assets']['shared_images'], [{'url': 'https://site.example/logo.png', 'pages': 2}])
+        self.assertEqual(len(progress), 4)
+        self.assertEqual(progress[-1][0], 4)
+
+    def test_stops_at_the_page_budget(self):
+        profile = crawl_site('https://site.example/', self.analyzer, max_pages=2, max_depth=3)
+        self.assertEqual(len(profile['pages']), 2)
+
+    def test_job_records_profile(self):
+        user = get_user_model().objects.create_user(username='designer', password='testpass123')
+        crawl = SiteCrawl.objects.create(url='https://site.example/', user=user, max_pages=10, max_depth=1)
+
+        with mock.patch('url_summarizer.website_analyzer.analyzer_pool', pool_of(self.analyzer)):
+            run_site_crawl(crawl.pk)
+
+        crawl.refresh_from_db()
+        self.assertEqual(crawl.status, SiteCrawl.STATUS_DONE)
+        self.assertEqual((crawl.pages_done, crawl.pages_found), (4, 4))
+        self.assertEqual(crawl.profile['pages_analyzed'], 3)
+
+    @mock.patch('url_summarizer.jobs.get_executor')
+    @mock.patch('url_summarizer.jobs.get_crawl_executor')
+    def test_crawls_queue_apart_from_summary_jobs(self, mock_get_crawl_executor, mock_get_executor):
+        self.client.force_login(get_user_model().objects.create_user(username='designer', password='testpass123'))
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse('url_summarizer:create_site_crawl'),
+                data={'url': 'https://site.example/'},
+                content_type='application/json'
+            )
+
+        self.assertEqual(response.status_code, 202)
+        crawl = SiteCrawl.objects.get()
+        self.assertEqual(crawl.status, SiteCrawl.STATUS_QUEUED)
+        mock_get_crawl_executor.return_value.submit.assert_called_once_with(run_site_crawl, crawl.pk)
+        mock_get_executor.assert_not_called()
+
+    async def test_crawl_status_requires_login(self):
+        crawl = await SiteCrawl.objects.acreate(url='https://site.example/', max_pages=10, max_depth=1)
+        for name in ('site_crawl', 'stream_site_crawl'):
+            response = await self.async_client.get(reverse(f'url_summarizer:{name}', kwargs={'crawl_id': crawl.pk}))
+            self.assertEqual(response.status_code, 302)
+            self.assertIn('login', response['Location'])
+
+    async def test_streams_progress_until_finished(self):
+        user = await get_user_model().objects.acreate(username='designer')
+        await self.async_client.aforce_login(user)
+        crawl = await SiteCrawl.objects.acreate(
+            url='https://site.example/', user=user, max_pages=10, max_depth=1, status=SiteCrawl.STATUS_DONE,
+            pages_done=3, pages_found=3, profile={'pages_analyzed': 3}
+        )
+        response = await self.async_client.get(
+            reverse('url_summarizer:stream_site_crawl', kwargs={'crawl_id': crawl.pk})
+        )
+        body = b''.join([chunk async for chunk in response.streaming_content]).decode()
+
+        self.assertIn('event: progress', body)
+        self.assertIn('"pages_done": 3', body)
+        self.assertTrue(body.endswith('event: done\ndata: {"profile": {"pages_analyzed": 3}}\n\n'))
+
+    async def test_crawls_are_only_shown_to_their_owner(self):
+        owner = await get_user_model().objects.acreate(username='designer')
+        crawl = await SiteCrawl.objects.acreate(url='https://site.example/', user=owner, max_pages=10, max_depth=1)
+        await self.async_client.aforce_login(await get_user_model().objects.acreate(username='other'))
+        for name in ('site_crawl', 'stream_site_crawl'):
+            response = await self.async_client.get(reverse(f'url_summarizer:{name}', kwargs={'crawl_id': crawl.pk}))
+            self.assertEqual(response.status_code, 404)
+
+        await self.async_client.aforce_login(await get_user_model().objects.acreate(username='admin', is_staff=True))
+        response = await self.async_client.get(reverse('url_summarizer:site_crawl', kwargs={'crawl_id': crawl.pk}))
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(URL_SUMMARIZER_CRAWL_STALE_SECONDS=0)
+    @mock.patch('url_summarizer.views.CRAWL_POLL_INTERVAL', 0.01)
+    async def test_stream_ends_when_a_crawl_stops_progressing(self):
+        user = await get_user_model().objects.acreate(username='designer')
+        await self.async_client.aforce_login(user)
+        # Left running by a worker that is gone
+        crawl = await SiteCrawl.objects.acreate(
+            url='https://site.example/', user=user, max_pages=10, max_depth=1, status=SiteCrawl.STATUS_RUNNING
+        )
+        response = await self.async_client.get(
+            reverse('url_summarizer:stream_site_crawl', kwargs={'crawl_id': crawl.pk})
+        )
+        body = b''.join([chunk async for chunk in response.streaming_content]).decode()
+
+        self.assertEqual(body.count('event: progress'), 1)
+        self.assertTrue(body.endswith('event: error\ndata: {"error": "Crawl stopped reporting progress"}\n\n'))
+
+
+class ParseServiceTests(TestCase):
+    page = """<html><head><style>body { color: #333; }</style></head>
+    <body><nav>Menu</nav><main><p>Readable text, long enough to count as content.</p><img src="/a.png"></main></body></html>"""
+
+    def test_process_pool_returns_compact_results(self):
+        service = ParseService(workers=1)
+        self.addCleanup(service.shutdown)
+
+        self.assertEqual(service.extract_content(self.page), 'Readable text, long enough to count as content.')
+        stats = service.collect_dom(self.page)
+        self.assertEqual(stats.images, [('/a.png', '')])
+        self.assertEqual(stats.style_blocks, ['body { color: #333; }'])
+        parsed = service.parse_css('@import "base.css"; a { color: red }', 'hash')
+        self.assertEqual((parsed.declarations, parsed.imports), ((('color', 'red'),), ('base.css',)))
+
+    def test_spawned_workers_set_up_django(self):
+        spawn = functools.partial(ProcessPoolExecutor, mp_context=multiprocessing.get_context('spawn'))
+        service = ParseService(workers=1)
+        self.addCleanup(service.shutdown)
+
+        with mock.patch('url_summarizer.parse_service.ProcessPoolExecutor', spawn):
+            self.assertEqual(service.extract_content(self.page), 'Readable text, long enough to count as content.')
+
+    def test_without_workers_parses_in_process(self):
+        service = ParseService(workers=0)
+        with mock.patch('url_summarizer.parse_service.ProcessPoolExecutor') as executor:
+            self.assertEqual(service.extract_content(self.page), 'Readable text, long enough to count as content.')
+        executor.assert_not_called()
+
+
+class ContentExtractionTests(TestCase):
+    page = """<html><body>
+    <div class="cookie-banner">We use cookies to improve your experience. Accept all cookies?</div>
+    <nav><a href="/">Home</a><a href="/docs">Docs</a></nav>
+    <div class="menu"><ul><li><a href="/a">A very long menu link to another page</a></li></ul></div>
+    <main><article>
+      <h2>Connection pooling</h2>
+      <p>Opening a TCP and TLS connection costs several round trips, so clients keep connections open, reuse them, and cap how many run at once.</p>
+      <p>Read <a href="/more">the full guide to keep-alive settings and tuning</a>.</p>
+    </article></main>
+    <div class="related-posts"><p>Related: ten other posts you might like, hand-picked for you.</p></div>
+    </body></html>"""
+
+    def test_drops_boilerplate_blocks(self):
+        content = extract_content(make_soup(self.page))
+        self.assertEqual(content, (
+            "## Connection pooling\n\n"
+            "Opening a TCP and TLS connection costs several round trips, so clients keep connections open, "
+            "reuse them, and cap how many run at once."
+        ))
+
+    def test_ranks_blocks_best_first(self):
+        ranked = rank_blocks(extract_blocks(make_soup(self.page)))
+        self.assertTrue(ranked[0].text.startswith('Opening a TCP'))
+        self.assertNotIn('cookie', ' '.join(block.text for block in ranked).lower())
+
+    def test_packs_best_paragraphs_in_document_order(self):
+        content = "\n\n".join([
+            "# Title",
+            "Short intro.",
+            "## Details",
+            "This paragraph, full of specifics, lists the limits, defaults, timeouts, and retries in detail.",
+            "## Footnotes",
+            "See also.",
+        ])
+        packed = pack_content(content, budget_tokens=30)
+
+        self.assertEqual(packed, "## Details\n\nThis paragraph, full of specifics, lists the limits, defaults, "
+                                 "timeouts, and retries in detail.")
+        self.assertLessEqual(estimate_tokens(packed), 30)
+
+    def test_content_within_budget_is_unchanged(self):
+        self.assertEqual(pack_content("One.\n\nTwo.", budget_tokens=100), "One.\n\nTwo.")
+
+    def test_oversized_paragraph_is_truncated(self):
+        self.assertEqual(len(pack_content("x" * 1000, budget_tokens=10)), 40)
+
+
+class ChunkedSummaryTests(TestCase):
+    def setUp(self):
+        self.sections = [f"## Part {i}\n\n" + f"Section {i} explains one mechanism in detail. " * 30 for i in range(8)]
+        self.calls = []
+        self.summarizer = URLSummarizer.__new__(URLSummarizer)
+        self.summarizer.summary_cache = SummaryCache(enabled=True)
+        self.summarizer.llm = mock.Mock(model_name='gpt-3.5-turbo', temperature=0)
+        self.summarizer.llm.invoke.side_effect = self.invoke
+        self.reduce_prompts = []
+        self.summarizer._run_summary_prompt = lambda prompt, key: self.reduce_prompts.append(prompt) or '# Summary'
+
+    def invoke(self, messages):
+        self.calls.append(messages[0].content)
+        time.sleep(0.2)
+        part = re.search(r'Part (\d+)', messages[0].content).group(1)
+        return mock.Mock(content=f"- point from part {part}")
+
+    def test_splits_on_section_boundaries(self):
+        chunks = chunk_content('\n\n'.join(self.sections), max_tokens=400)
+        self.assertEqual(len(chunks), 8)
+        self.assertTrue(all(chunk.startswith('## Part') for chunk in chunks))
+        self.assertTrue(all(estimate_tokens(chunk) <= 400 for chunk in chunks))
+
+    @override_settings(URL_SUMMARIZER_CHUNK_TOKENS=400)
+    def test_chunks_run_in_parallel_waves_and_reduce_in_order(self):
+        started = time.monotonic()
+        self.assertEqual(self.summarizer.summarize_chunked('\n\n'.join(self.sections)), '# Summary')
+        elapsed = time.monotonic() - started
+
+        self.assertEqual(len(self.calls), 8)
+        # Eight 0.2s calls, four at a time: two waves rather than 1.6s in series
+        self.assertLess(elapsed, 1.0)
+        reduce_prompt = self.reduce_prompts[0]
+        self.assertLess(reduce_prompt.index('part 0'), reduce_prompt.index('part 7'))
+
+    @override_settings(URL_SUMMARIZER_CHUNK_TOKENS=400)
+    def test_only_edited_sections_are_summarized_again(self):
+        self.summarizer.summarize_chunked('\n\n'.join(self.sections))
+        self.sections[3] = self.sections[3].replace('one mechanism', 'a revised mechanism')
+        self.calls.clear()
+
+        self.summarizer.summarize_chunked('\n\n'.join(self.sections))
+
+        self.assertEqual(len(self.calls), 1)
+        self.assertIn('Part 3', self.calls[0])
+
+    def test_rate_limited_chunks_wait_and_retry(self):
+        sleep = mock.Mock()
+        response = httpx.Response(429, headers={'retry-after': '1.5'}, request=httpx.Request('POST', 'https://api.openai.com'))
+        self.summarizer.llm.invoke.side_effect = [
+            RateLimitError('rate limited', response=response, body=None),
+            mock.Mock(content='- point'),
+        ]
+        with mock.patch('url_summarizer.crew.get_llm_guard', return_value=LLMGuard(sleep=sleep)):
+            self.assertEqual(self.summarizer._summarize_chunk('## Part 1\n\nText'), '- point')
+        sleep.assert_called_once_with(1.5)
+
+
+def llm_result(prompt_tokens, completion_tokens):
+    return LLMResult(
+        generations=[],
+        llm_output={'token_usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens}}
+    )
+
+
+class InstrumentationTests(TestCase):
+    def make_summarizer(self, kickoff):
+        summarizer = URLSummarizer.__new__(URLSummarizer)
+        summarizer.summary_cache = SummaryCache(enabled=True)
+        summarizer.llm = mock.Mock(model_name='gpt-3.5-turbo', temperature=0)
+        summarizer.summarizer = mock.Mock()
+        for name, crew_class in (('Task', mock.Mock()), ('Crew', mock.Mock(return_value=mock.Mock(kickoff=kickoff)))):
+            patcher = mock.patch(f'url_summarizer.crew.{name}', crew_class)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        return summarizer
+
+    def test_records_reported_usage_from_worker_threads(self):
+        with track_llm_call('summary', 'gpt-4o-mini', 'https://site.example/'):
+            report = bind_current(lambda _: usage_callback.on_llm_end(llm_result(1000, 200)))
+            workers = [threading.Thread(target=report, args=(None,)) for _ in range(3)]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+
+        call = LLMCall.objects.get()
+        self.assertEqual((call.prompt_tokens, call.completion_tokens, call.llm_requests), (3000, 600, 3))
+        self.assertEqual(call.cost, call_cost('gpt-4o-mini', 3000, 600))
+        self.assertEqual(call.cost, Decimal('0.00081'))
+        self.assertEqual(call.outcome, LLMCall.OUTCOME_OK)
+        self.assertFalse(call.tokens_estimated)
+
+    def test_nested_stages_are_timed_separately(self):
+        with track_llm_call('summary', 'gpt-3.5-turbo'):
+            with stage('fetch'):
+                time.sleep(0.05)
+                with stage('parse'):
+                    time.sleep(0.1)
+
+        call = LLMCall.objects.get()
+        self.assertGreaterEqual(call.parse_ms, 100)
+        self.assertGreaterEqual(call.fetch_ms, 50)
+        self.assertLess(call.fetch_ms, 100)
+        self.assertGreaterEqual(call.total_ms, call.fetch_ms + call.parse_ms)
+
+    def test_summary_records_tokens_then_cache_hit_then_error(self):
+        outputs = ['# Caching\n\n' + 'Responses are stored by key and served again. ' * 5, '']
+
+        def kickoff():
+            usage_callback.on_llm_end(llm_result(900, 300))
+            return outputs.pop(0)
+        summarizer = self.make_summarizer(kickoff)
+
+        summarizer.summarize_content('Caches keep responses. ' * 20)
+        summarizer.summarize_content('Caches keep responses. ' * 20)
+        with self.assertRaises(Exception):
+            summarizer.summarize_content('Something else entirely. ' * 20)
+
+        failed, cached, generated = LLMCall.objects.order_by('-id')
+        self.assertEqual((generated.outcome, generated.prompt_tokens, generated.completion_tokens), ('ok', 900, 300))
+        self.assertEqual(cached.outcome, LLMCall.OUTCOME_CACHED)
+        self.assertEqual((cached.cache_hits, cached.llm_requests, cached.cost), (1, 0, Decimal('0')))
+        self.assertEqual(failed.outcome, LLMCall.OUTCOME_ERROR)
+        self.assertIn('Empty response', failed.error)
+
+    async def test_streamed_summary_is_recorded_with_estimated_tokens(self):
+        async def astream(messages):
+            for part in ['# Streaming\n\n', 'Tokens arrive one piece at a time. ' * 5]:
+                yield mock.Mock(content=part)
+        summarizer = self.make_summarizer(kickoff=None)
+        summarizer.summarizer = mock.Mock(role='Writer', backstory='', goal='')
+        summarizer.llm.astream = astream
+        summarizer._fetch_url_content = lambda url: 'Streams deliver text early. ' * 20
+
+        parts = [text async for text in summarizer.astream_summary('https://site.example/')]
+
+        self.assertTrue(parts)
+        call = await LLMCall.objects.aget()
+        self.assertEqual((call.operation, call.outcome, call.llm_requests), ('stream_summary', 'ok', 1))
+        self.assertTrue(call.tokens_estimated)
+        self.assertGreater(call.completion_tokens, 0)
+
+    @override_settings(URL_SUMMARIZER_LLM_METRICS_ENABLED=False)
+    def test_metrics_can_be_turned_off(self):
+        with self.assertLogs('url_summarizer.instrumentation', 'INFO') as logs:
+            with track_llm_call('summary', 'gpt-3.5-turbo'):
+                usage_callback.on_llm_end(llm_result(10, 5))
+        self.assertFalse(LLMCall.objects.exists())
+        self.assertIn('"prompt_tokens": 10', logs.output[0])
+
+    def test_unpriced_models_have_no_cost(self):
+        self.assertIsNone(call_cost('local-llama', 1000, 1000))
+        self.assertEqual(call_cost('gpt-4o-2024-08-06', 1_000_000, 0), Decimal('2.5'))
+
+    def test_admin_dashboard_shows_latency_percentiles_and_daily_spend(self):
+        for total_ms in range(1, 101):
+            LLMCall.objects.create(
+                operation='summary', model='gpt-3.5-turbo', outcome=LLMCall.OUTCOME_OK,
+                total_ms=total_ms, cost=Decimal('0.01')
+            )
+        self.assertEqual(percentile(list(range(1, 101)), 0.95), 95)
+
+        admin_user = get_user_model().objects.create_superuser(username='admin', password='testpass123')
+        self.client.force_login(admin_user)
+        response = self.client.get(reverse('docadmin:url_summarizer_llmcall_changelist'))
+
+        self.assertEqual(response.status_code, 200)
+        row = response.context['llm_stats']['operations'][0]
+        self.assertEqual((row['calls'], row['p50_ms'], row['p95_ms']), (100, 50, 95))
+        self.assertEqual(response.context['llm_stats']['daily'][0]['cost'], Decimal('1'))
+        self.assertContains(response, 'Daily spend')
+
+
+class FakeLLMServer:
+    """Local stand-in for the OpenAI chat completions endpoint, replying with scripted statuses."""
+
+    def __init__(self, statuses):
+        self.statuses = list(statuses)
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                self.rfile.read(int(self.headers['Content-Length']))
+                server.requests += 1
+                status = server.statuses.pop(0) if len(server.statuses) > 1 else server.statuses[0]
+                body = {'error': {'message': 'slow down', 'type': 'requests'}}
+                if status == 200:
+                    body = {
+                        'id': 'chatcmpl-1', 'object': 'chat.completion', 'created': 0, 'model': 'gpt-3.5-turbo',
+                        'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': 'pong'},
+                                     'finish_reason': 'stop'}],
+                        'usage': {'prompt_tokens': 5, 'completion_tokens': 1, 'total_tokens': 6},
+                    }
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                if status == 429:
+                    self.send_header('Retry-After', '0')
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}/v1"
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class LLMGuardTests(TestCase):
+    def fake_llm(self, statuses):
+        server = FakeLLMServer(statuses)
+        self.addCleanup(server.close)
+        llm = ChatOpenAI(
+            model='gpt-3.5-turbo', api_key='test-key', openai_api_base=server.base_url, max_retries=0,
+            callbacks=[usage_callback]
+        )
+        return server, llm
+
+    def test_token_bucket_queues_requests_beyond_the_burst(self):
+        now = [0.0]
+        bucket = TokenBucket(60, clock=lambda: now[0])
+        self.assertEqual(bucket.reserve(60), 0.0)
+        self.assertEqual(bucket.reserve(1), 1.0)
+        self.assertEqual(bucket.reserve(1), 2.0)
+        now[0] = 10.0
+        self.assertEqual(bucket.reserve(1), 0.0)
+
+    def test_fails_fast_when_the_queue_is_too_long(self):
+        guard = LLMGuard(requests_per_minute=1, max_wait=5, sleep=mock.Mock())
+        self.assertEqual(guard.call(lambda: 'first'), 'first')
+        with self.assertRaises(BackendUnavailable) as raised:
+            guard.call(lambda: 'second')
+        self.assertGreater(raised.exception.retry_after, 50)
+
+    def test_retry_budget_refills_with_successes(self):
+        budget = RetryBudget(0.5, reserve=1)
+        self.assertTrue(budget.withdraw())
+        self.assertFalse(budget.withdraw())
+        budget.deposit()
+        budget.deposit()
+        self.assertTrue(budget.withdraw())
+
+    def test_breaker_opens_then_lets_one_trial_call_through(self):
+        now = [0.0]
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30, clock=lambda: now[0])
+        breaker.record_failure()
+        breaker.before_call()
+        breaker.record_failure()
+        with self.assertRaises(BackendUnavailable) as raised:
+            breaker.before_call()
+        self.assertEqual(raised.exception.retry_after, 30)
+
+        now[0] = 31.0
+        breaker.before_call()
+        with self.assertRaises(BackendUnavailable):
+            breaker.before_call()
+        breaker.record_success()
+        breaker.before_call()
+        self.assertIsNone(breaker.open_for())
+
+    def test_rejected_reserve_does_not_take_the_trial_call(self):
+        now = [0.0]
+        guard = LLMGuard(max_wait=5, breaker_failures=1, breaker_reset=30, sleep=mock.Mock())
+        guard.breaker.clock = lambda: now[0]
+        guard.requests = TokenBucket(1, clock=lambda: now[0])
+        guard.breaker.record_failure()
+        now[0] = 31.0
+        guard.requests.reserve(1)
+
+        with self.assertRaises(BackendUnavailable):
+            guard.reserve(0)
+        self.assertEqual(guard.breaker.state, CircuitBreaker.OPEN)
+
+        now[0] = 100.0
+        self.assertIsNone(guard.breaker.open_for())
+        self.assertEqual(guard.call(lambda: 'ok'), 'ok')
+        self.assertEqual(guard.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_stale_trial_call_is_replaced(self):
+        now = [0.0]
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30, clock=lambda: now[0], trial_timeout=60)
+        breaker.record_failure()
+        now[0] = 31.0
+        stale = breaker.before_call()
+        now[0] = 60.0
+        self.assertEqual(breaker.open_for(), 31.0)
+
+        now[0] = 92.0
+        trial = breaker.before_call()
+        self.assertIsNot(trial, stale)
+        # The stale trial giving up late leaves the new one alone
+        breaker.release_trial(stale)
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        breaker.record_success()
+        self.assertIsNone(breaker.open_for())
+
+    async def test_cancelled_stream_gives_back_the_trial_call(self):
+        now = [0.0]
+        guard = LLMGuard(breaker_failures=1, breaker_reset=30)
+        guard.breaker.clock = lambda: now[0]
+        guard.breaker.record_failure()
+        now[0] = 31.0
+
+        async def astream(messages):
+            yield mock.Mock(content='# Streaming\n\n')
+            await asyncio.sleep(10)
+            yield mock.Mock(content='never sent')
+        summarizer = URLSummarizer.__new__(URLSummarizer)
+        summarizer.summary_cache = SummaryCache(enabled=False)
+        summarizer.summarizer = mock.Mock(role='Writer', backstory='', goal='')
+        summarizer.llm = mock.Mock(model_name='gpt-3.5-turbo', temperature=0, astream=astream)
+        summarizer._fetch_url_content = lambda url: 'Streams deliver text early. ' * 20
+
+        async def consume():
+            async for _ in summarizer.astream_summary('https://site.example/'):
+                pass
+
+        with mock.patch('url_summarizer.crew.get_llm_guard', return_value=guard):
+            task = asyncio.ensure_future(consume())
+            while guard.breaker.state != CircuitBreaker.HALF_OPEN:
+                await asyncio.sleep(0.01)
+            await asyncio.sleep(0.05)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        self.assertEqual(guard.breaker.state, CircuitBreaker.OPEN)
+        self.assertEqual(guard.breaker.open_for(), 30)
+
+    def test_retries_a_throttled_request_against_a_fake_server(self):
+        server, llm = self.fake_llm([429, 429, 200])
+        sleep = mock.Mock()
+        guard = LLMGuard(sleep=sleep)
+
+        with track_llm_call('summary', 'gpt-3.5-turbo'):
+            response = guard.call(lambda: llm.invoke('ping'), prompt_tokens=5)
+
+        self.assertEqual(response.content, 'pong')
+        self.assertEqual(server.requests, 3)
+        self.assertEqual(sleep.call_args_list, [mock.call(0.0), mock.call(0.0)])
+        call = LLMCall.objects.get()
+        self.assertEqual((call.retries, call.prompt_tokens, call.completion_tokens), (2, 5, 1))
+
+    def test_circuit_opens_after_server_errors_and_fails_fast(self):
+        server, llm = self.fake_llm([500])
+        guard = LLMGuard(max_retries=1, breaker_failures=2, breaker_reset=30, sleep=mock.Mock())
+
+        with self.assertRaises(BackendUnavailable):
+            guard.call(lambda: llm.invoke('ping'))
+        self.assertEqual(server.requests, 2)
+
+        with self.assertRaises(BackendUnavailable) as raised:
+            guard.call(lambda: llm.invoke('ping'))
+        self.assertEqual(server.requests, 2)
+        self.assertGreater(raised.exception.retry_after, 25)
+
+    @mock.patch.dict(os.environ, {'OPENAI_API_KEY': 'test-key'})
+    def test_summarize_view_returns_503_with_retry_after(self):
+        summarizer = mock.Mock()
+        summarizer.get_summary.side_effect = BackendUnavailable("The LLM backend is unavailable", 12.5)
+
+        with mock.patch('url_summarizer.views.summarizer_pool', pool_of(summarizer)):
+            response = self.client.post(
+                reverse('url_summarizer:summarize_url'),
+                data={'url': 'https://example.com'},
+                content_type='application/json'
+            )
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '13')
+        self.assertEqual(response.json()['retry_after'], 13)
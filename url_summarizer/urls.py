@@ -6,7 +6,15 @@ app_name = 'url_summarizer'
 urlpatterns = [
     path('', views.summarizer_view, name='summarizer'),
     path('summarize/', views.summarize_url, name='summarize_url'),
+    path('summarize/stream/', views.stream_summary, name='stream_summary'),
+    path('jobs/', views.create_summary_job, name='create_summary_job'),
+    path('jobs/batch/', views.create_summary_batch, name='create_summary_batch'),
+    path('jobs/<uuid:job_id>/', views.summary_job_status, name='summary_job'),
     path('create-document/', views.create_document, name='create_document'),
     path('analyze-website/', views.analyze_website, name='analyze_website'),
+    path('analyze-website/history/', views.analysis_history, name='analysis_history'),
+    path('crawls/', views.create_site_crawl, name='create_site_crawl'),
+    path('crawls/<uuid:crawl_id>/', views.site_crawl_status, name='site_crawl'),
+    path('crawls/<uuid:crawl_id>/stream/', views.stream_site_crawl, name='stream_site_crawl'),
     path('website-analyzer/', views.website_analyzer_view, name='website_analyzer'),
 ]
@@ -1,22 +1,38 @@
-from django.shortcuts import render
-from django.http import JsonResponse
+from django.shortcuts import render, get_object_or_404
+from django.http import Http404, JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.contrib.auth.decorators import login_required
+from django.contrib.auth.views import redirect_to_login
 from django.utils.text import slugify
+from django.urls import reverse
+from django.conf import settings
 import json
-from .crew import URLSummarizer
-from .website_analyzer import WebsiteAnalyzer
+import math
+from .crew import SUMMARY_MODES, summarizer_pool
+from .llm_guard import BackendUnavailable, get_llm_guard
+from .website_analyzer import ANALYSIS_MODES, analyzer_pool
+from .analysis_store import analyze_and_store, design_history
+from .jobs import enqueue_crawl, enqueue_summary, enqueue_batch
+from .models import SiteCrawl, SummaryJob
 from documentation.models import Document
 from dotenv import load_dotenv
 import os
 from datetime import datetime
+import asyncio
 import uuid
 import re
 
 # Load environment variables
 load_dotenv()
 
+# Seconds between progress checks while streaming a site crawl
+CRAWL_POLL_INTERVAL = 0.5
+
+def can_read(user, owner_id):
+    """Whether ``user`` may see a job or crawl owned by ``owner_id``: only its owner and staff may."""
+    return user.is_staff or (user.is_authenticated and user.pk == owner_id)
+
 def extract_markdown_content(html_content):
     """Convert HTML content back to markdown-like format."""
     # Remove any HTML tags but preserve line breaks
@@ -49,6 +65,12 @@ def extract_markdown_content(html_content):
     
     return '\n\n'.join(formatted_lines)
 
+def backend_unavailable(error):
+    """503 response telling the client when the LLM backend may take requests again."""
+    response = JsonResponse({'error': str(error), 'retry_after': math.ceil(error.retry_after)}, status=503)
+    response['Retry-After'] = str(math.ceil(error.retry_after))
+    return response
+
 @login_required
 def summarizer_view(request):
     return render(request, 'url_summarizer/summarizer.html')
@@ -68,14 +90,20 @@ def summarize_url(request):
         if not url:
             return JsonResponse({'error': 'URL is required'}, status=400)
             
+        mode = data.get('mode')
+        if mode and mode not in SUMMARY_MODES:
+            return JsonResponse({'error': f"mode must be one of: {', '.join(SUMMARY_MODES)}"}, status=400)
+            
         # Check if OpenAI API key is available
         if not os.getenv('OPENAI_API_KEY'):
             return JsonResponse({'error': 'OpenAI API key not configured'}, status=500)
         
         try:    
-            summarizer = URLSummarizer()
-            summary = summarizer.get_summary(url)
+            with summarizer_pool.acquire() as summarizer:
+                summary = summarizer.get_summary(url, mode=mode)
             return JsonResponse({'summary': summary})
+        except BackendUnavailable as e:
+            return backend_unavailable(e)
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=500)
             
@@ -84,6 +112,111 @@ def summarize_url(request):
     except Exception as e:
         return JsonResponse({'error': f'Unexpected error: {str(e)}'}, status=500)
 
+def sse_event(event, data):
+    """Format a server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@require_http_methods(["GET"])
+async def stream_summary(request):
+    """Stream a summary as server-sent events while the model writes it.
+
+    Needs an ASGI server (see config/asgi.py) to flush events as they are produced.
+    """
+    url = request.GET.get('url')
+    if not url:
+        return JsonResponse({'error': 'URL is required'}, status=400)
+
+    if not os.getenv('OPENAI_API_KEY'):
+        return JsonResponse({'error': 'OpenAI API key not configured'}, status=500)
+
+    # Fail before the stream starts, while a status code can still be sent
+    open_for = get_llm_guard().breaker.open_for()
+    if open_for is not None:
+        return backend_unavailable(BackendUnavailable("The LLM backend is unavailable", open_for))
+
+    async def events():
+        try:
+            with summarizer_pool.acquire() as summarizer:
+                async for text in summarizer.astream_summary(url):
+                    yield sse_event('token', {'text': text})
+            yield sse_event('done', {})
+        except BackendUnavailable as e:
+            yield sse_event('error', {'error': str(e), 'retry_after': math.ceil(e.retry_after)})
+        except Exception as e:
+            yield sse_event('error', {'error': f"Failed to generate summary: {str(e)}"})
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def create_summary_job(request):
+    """Queue a URL for summarization and return the job id immediately."""
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid JSON data'}, status=400)
+
+    url = data.get('url')
+    if not url:
+        return JsonResponse({'error': 'URL is required'}, status=400)
+
+    if not os.getenv('OPENAI_API_KEY'):
+        return JsonResponse({'error': 'OpenAI API key not configured'}, status=500)
+
+    job = enqueue_summary(url, user=request.user)
+    response = JsonResponse(job.as_dict(), status=202)
+    response['Location'] = reverse('url_summarizer:summary_job', kwargs={'job_id': job.pk})
+    return response
+
+@csrf_exempt
+@require_http_methods(["POST"])
+@login_required
+def create_summary_batch(request):
+    """Queue a list of URLs for summarization and save the results as documents."""
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid JSON data'}, status=400)
+
+    urls = data.get('urls')
+    if not urls or not isinstance(urls, list) or not all(isinstance(url, str) and url for url in urls):
+        return JsonResponse({'error': 'A list of URLs is required'}, status=400)
+
+    max_urls = getattr(settings, 'URL_SUMMARIZER_BATCH_MAX_URLS', 500)
+    if len(urls) > max_urls:
+        return JsonResponse({'error': f'At most {max_urls} URLs can be summarized at once'}, status=400)
+
+    if not os.getenv('OPENAI_API_KEY'):
+        return JsonResponse({'error': 'OpenAI API key not configured'}, status=500)
+
+    batch_id, jobs = enqueue_batch(urls, request.user, create_documents=data.get('create_documents', True))
+    return JsonResponse({
+        'batch_id': str(batch_id),
+        'jobs': [
+            {
+                'job_id': str(job.pk),
+                'url': job.url,
+                'status_url': reverse('url_summarizer:summary_job', kwargs={'job_id': job.pk}),
+            }
+            for job in jobs
+        ]
+    }, status=202)
+
+@require_http_methods(["GET"])
+def summary_job_status(request, job_id):
+    """Return the status of a summary job, including the result once finished.
+
+    Jobs queued anonymously are open to anyone with the id; others only to
+    their owner and staff.
+    """
+    job = get_object_or_404(SummaryJob, pk=job_id)
+    if job.user_id is not None and not can_read(request.user, job.user_id):
+        raise Http404
+    return JsonResponse(job.as_dict())
+
 @csrf_exempt
 @require_http_methods(["POST"])
 @login_required
@@ -95,20 +228,136 @@ def analyze_website(request):
         
         if not url:
             return JsonResponse({'error': 'URL is required'}, status=400)
+
+        mode = data.get('mode')
+        if mode and mode not in ANALYSIS_MODES:
+            return JsonResponse({'error': f"mode must be one of: {', '.join(ANALYSIS_MODES)}"}, status=400)
             
-        analyzer = WebsiteAnalyzer()
-        analysis = analyzer.analyze_website(url)
+        with analyzer_pool.acquire() as analyzer:
+            analysis, record, unchanged = analyze_and_store(
+                analyzer,
+                url,
+                mode=mode,
+                probe_assets=data.get('probe_assets'),
+                thumbnails=bool(data.get('thumbnails'))
+            )
         
         return JsonResponse({
             'success': True,
-            'analysis': analysis
+            'analysis': analysis,
+            'analysis_id': record.id if record else None,
+            'unchanged': unchanged
         })
         
+    except BackendUnavailable as e:
+        return backend_unavailable(e)
     except Exception as e:
         return JsonResponse({
             'error': str(e)
         }, status=500)
 
+@require_http_methods(["GET"])
+@login_required
+def analysis_history(request):
+    """List the stored analyses of a page with the design changes between runs."""
+    url = request.GET.get('url')
+    if not url:
+        return JsonResponse({'error': 'URL is required'}, status=400)
+    try:
+        limit = min(int(request.GET.get('limit', 20)), 100)
+    except ValueError:
+        return JsonResponse({'error': 'limit must be a number'}, status=400)
+    return JsonResponse({'url': url, 'history': design_history(url, limit)})
+
+@csrf_exempt
+@require_http_methods(["POST"])
+@login_required
+def create_site_crawl(request):
+    """Queue a multi-page crawl of a site and return the crawl id immediately."""
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid JSON data'}, status=400)
+
+    url = data.get('url')
+    if not url:
+        return JsonResponse({'error': 'URL is required'}, status=400)
+
+    page_limit = getattr(settings, 'URL_SUMMARIZER_CRAWL_MAX_PAGES', 200)
+    depth_limit = getattr(settings, 'URL_SUMMARIZER_CRAWL_MAX_DEPTH', 3)
+    try:
+        max_pages = int(data.get('max_pages', page_limit))
+        max_depth = int(data.get('max_depth', depth_limit))
+    except (TypeError, ValueError):
+        return JsonResponse({'error': 'max_pages and max_depth must be numbers'}, status=400)
+    if not 1 <= max_pages <= page_limit or not 0 <= max_depth <= depth_limit:
+        return JsonResponse({
+            'error': f'max_pages must be 1-{page_limit} and max_depth 0-{depth_limit}'
+        }, status=400)
+
+    crawl = enqueue_crawl(url, request.user, max_pages, max_depth, probe_assets=bool(data.get('probe_assets')))
+    response = JsonResponse(crawl.as_dict(), status=202)
+    response['Location'] = reverse('url_summarizer:site_crawl', kwargs={'crawl_id': crawl.pk})
+    return response
+
+@require_http_methods(["GET"])
+@login_required
+def site_crawl_status(request, crawl_id):
+    """Return the progress of a site crawl, including the design profile once finished."""
+    crawl = get_object_or_404(SiteCrawl, pk=crawl_id)
+    if not can_read(request.user, crawl.user_id):
+        raise Http404
+    return JsonResponse(crawl.as_dict())
+
+@require_http_methods(["GET"])
+async def stream_site_crawl(request, crawl_id):
+    """Stream crawl progress as server-sent events until the crawl finishes.
+
+    The crawl itself runs on the crawl pool; this only polls its row. A
+    crawl whose progress has not moved for URL_SUMMARIZER_CRAWL_STALE_SECONDS,
+    such as one left running by a restart, ends the stream with an error.
+    """
+    # login_required does not wrap async views before Django 5.1
+    user = await request.auser()
+    if not user.is_authenticated:
+        return redirect_to_login(request.get_full_path())
+    try:
+        crawl = await SiteCrawl.objects.aget(pk=crawl_id)
+    except SiteCrawl.DoesNotExist:
+        return JsonResponse({'error': 'Crawl not found'}, status=404)
+    if not can_read(user, crawl.user_id):
+        return JsonResponse({'error': 'Crawl not found'}, status=404)
+    stale_after = getattr(settings, 'URL_SUMMARIZER_CRAWL_STALE_SECONDS', 300)
+
+    async def events():
+        loop = asyncio.get_running_loop()
+        current = crawl
+        last_progress = None
+        last_change = loop.time()
+        while True:
+            progress = current.progress_dict()
+            if progress != last_progress:
+                yield sse_event('progress', progress)
+                last_progress = progress
+                last_change = loop.time()
+            if current.is_finished:
+                break
+            if loop.time() - last_change > stale_after:
+                yield sse_event('error', {'error': 'Crawl stopped reporting progress'})
+                return
+            await asyncio.sleep(CRAWL_POLL_INTERVAL)
+            current = await SiteCrawl.objects.aget(pk=crawl_id)
+
+        if current.status == SiteCrawl.STATUS_DONE:
+            yield sse_event('done', {'profile': current.profile})
+        else:
+            yield sse_event('error', {'error': current.error})
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def create_document(request):
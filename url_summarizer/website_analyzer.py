@@ -1,29 +1,77 @@
 from crewai import Agent, Task, Crew
-from bs4 import BeautifulSoup
-import requests
 import json
 import os
 from langchain_openai import ChatOpenAI
-import cssutils
 import re
 from urllib.parse import urljoin
 import base64
 from PIL import Image
 from io import BytesIO
-import logging
+import hashlib
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from django.conf import settings
+from .assets import asset_prober
+from .content import estimate_tokens
+from .css import DesignCollector, remote_stylesheets, stylesheet_cache
+from .dom import SEMANTIC_TAGS
+from .fetching import raise_for_status, read_html
+from .http_session import USER_AGENT, get_session
+from .instrumentation import bind_current, count_cache_hits, stage, track_llm_call, usage_callback
+from .llm_guard import BackendUnavailable, get_llm_guard
+from .parse_service import get_parse_service
+from .pool import InstancePool
+
+ANALYSIS_MODES = ('static', 'ai')
+
+# Model behind the agents of the "ai" mode
+AGENT_MODEL = "gpt-3.5-turbo"
+
+# The part of an analysis each agent reviews in "ai" mode
+AGENT_SECTIONS = {
+    'style': lambda analysis: analysis.get('design_elements'),
+    'structure': lambda analysis: {
+        'structure': analysis.get('structure'),
+        'layout': analysis.get('design_elements', {}).get('layout'),
+    },
+    'assets': lambda analysis: {
+        kind: [{k: v for k, v in entry.items() if k != 'thumbnail'} for entry in entries]
+        for kind, entries in analysis.get('assets', {}).items()
+    },
+}
+
+# Longest JSON excerpt of the extracted data handed to each agent
+AGENT_INPUT_CHARS = 6000
+
+AnalysisRun = namedtuple('AnalysisRun', ['analysis', 'fingerprint', 'unchanged'])
+
+
+def hash_text(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
 
-cssutils.log.setLevel(logging.CRITICAL)
 
 class WebsiteAnalyzer:
     def __init__(self):
         self.headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+            'User-Agent': USER_AGENT
         }
-        
+        self.session = get_session()
+        # Built on first use by the "ai" mode, so static analysis never creates an LLM client
+        self._agents = None
+
+    def _get_agents(self):
+        """Return the style, structure and asset agents, creating them the first time."""
+        if self._agents is not None:
+            return self._agents
+
         self.llm = ChatOpenAI(
-            model="gpt-3.5-turbo",
+            model=AGENT_MODEL,
             temperature=0,
-            api_key=os.getenv('OPENAI_API_KEY')
+            api_key=os.getenv('OPENAI_API_KEY'),
+            callbacks=[usage_callback],
+            # Retries are left to the process-wide LLM guard
+            max_retries=0
         )
         
         # Configure specialized agents
@@ -60,133 +108,244 @@ class WebsiteAnalyzer:
             llm=self.llm
         )
 
-    def analyze_website(self, url):
-        """Analyze a website and return comprehensive design analysis."""
+        self._agents = {
+            'style': self.style_analyzer,
+            'structure': self.structure_analyzer,
+            'assets': self.asset_collector,
+        }
+        return self._agents
+
+    def analyze_website(self, url, mode=None, probe_assets=None, thumbnails=False):
+        """Analyze a website and return comprehensive design analysis.
+
+        ``mode`` is "static" for deterministic extraction only, or "ai" to
+        also have the style, structure and asset agents review the extracted
+        data; their reviews are returned under ``ai_insights``. Defaults to
+        ``URL_SUMMARIZER_ANALYSIS_MODE``.
+
+        With ``probe_assets`` (``URL_SUMMARIZER_ASSET_PROBE`` by default), image
+        sizes, types and dimensions are added to the assets, and with
+        ``thumbnails`` a small base64 preview as well.
+        """
+        return self.run_analysis(url, mode, probe_assets, thumbnails).analysis
+
+    def run_analysis(self, url, mode=None, probe_assets=None, thumbnails=False, previous=None):
+        """Analyze a website, reusing what has not changed since ``previous``.
+
+        ``previous`` is the last ``WebsiteAnalysis`` stored for the page. When
+        the HTML and every stylesheet are unchanged its result is returned as
+        is; otherwise only the sections whose inputs changed are recomputed.
+        Returns an ``AnalysisRun`` with the fingerprint to store.
+        """
+        mode = mode or getattr(settings, 'URL_SUMMARIZER_ANALYSIS_MODE', 'static')
+        if mode not in ANALYSIS_MODES:
+            raise ValueError(f"Unknown analysis mode: {mode}")
+        if probe_assets is None:
+            probe_assets = getattr(settings, 'URL_SUMMARIZER_ASSET_PROBE', False)
+        options = {'probe_assets': bool(probe_assets), 'thumbnails': bool(thumbnails)}
+
+        # Only the "ai" mode calls the LLM, so only it is recorded
+        tracking = track_llm_call('website_analysis', AGENT_MODEL, url) if mode == 'ai' else nullcontext()
+        with tracking:
+            return self._run_analysis(url, mode, options, previous)
+
+    def _run_analysis(self, url, mode, options, previous):
         try:
-            # Fetch website content
-            response = requests.get(url, headers=self.headers, timeout=10)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Create tasks for analysis
-            style_analysis_task = Task(
-                description=f"Analyze the design elements of {url} including colors, typography, and spacing",
-                agent=self.style_analyzer
-            )
-            
-            structure_analysis_task = Task(
-                description=f"Analyze the HTML structure and components of {url}",
-                agent=self.structure_analyzer
-            )
-            
-            asset_collection_task = Task(
-                description=f"Identify and collect all assets from {url}",
-                agent=self.asset_collector
-            )
-            
-            # Create and run the crew
-            crew = Crew(
-                agents=[self.style_analyzer, self.structure_analyzer, self.asset_collector],
-                tasks=[style_analysis_task, structure_analysis_task, asset_collection_task],
-                verbose=True
-            )
-            
-            # Get design elements
-            colors = self._extract_colors(soup)
-            fonts = self._extract_fonts(soup)
-            spacing = self._extract_spacing(soup)
-            layout = self._analyze_layout(soup)
-            
-            # Collect assets
-            assets = self._collect_assets(soup, url)
-            
-            # Compile results
-            analysis = {
-                'url': url,
-                'design_elements': {
-                    'colors': colors,
-                    'typography': fonts,
-                    'spacing': spacing,
-                    'layout': layout
-                },
-                'assets': assets,
-                'structure': self._analyze_structure(soup)
-            }
-            
-            return analysis
+            # Fetch website content, revalidating against the previous run
+            headers = dict(self.headers)
+            if previous and previous.etag:
+                headers['If-None-Match'] = previous.etag
+            if previous and previous.last_modified:
+                headers['If-Modified-Since'] = previous.last_modified
+            with stage('fetch'):
+                response = self.session.get(url, headers=headers, timeout=10, stream=True)
+
+                html = None
+                if response.status_code != 304 or previous is None:
+                    raise_for_status(response)
+                    html = read_html(response)
+                else:
+                    response.close()
+
+            html_hash = hash_text(html) if html is not None else previous.html_hash
+            if previous and html_hash == previous.html_hash:
+                run = self._reuse_previous(previous, mode, options)
+                if run is not None:
+                    return run
+
+            if html is None:
+                # Not modified, but a stylesheet changed, so the page is needed again
+                with stage('fetch'):
+                    response = self.session.get(url, headers=self.headers, timeout=10, stream=True)
+                    raise_for_status(response)
+                    html = read_html(response)
+
+            return self._analyze_html(url, html, html_hash, response, mode, options, previous)
+        except BackendUnavailable:
+            raise
         except Exception as e:
             raise Exception(f"Error analyzing website: {str(e)}")
+
+    def _reuse_previous(self, previous, mode, options):
+        """Return the previous result if the page's stylesheets are unchanged too."""
+        sheets = remote_stylesheets.fetch_all(previous.stylesheet_urls)
+        if [sheet.content_hash for sheet in sheets] != previous.stylesheet_hashes:
+            return None
+        if previous.options != options:
+            return None
+        if mode == 'ai' and 'ai_insights' not in previous.result:
+            return None
+
+        analysis = dict(previous.result)
+        if mode == 'static':
+            analysis.pop('ai_insights', None)
+        else:
+            count_cache_hits(len(analysis['ai_insights']))
+        return AnalysisRun(analysis, previous.fingerprint_fields(), unchanged=True)
+
+    def _analyze_html(self, url, html, html_hash, response, mode, options, previous=None):
+        # Walk the DOM once, in the parse pool, and derive every section from the collected stats
+        stats = get_parse_service().collect_dom(html)
+        previous_result = previous.result if previous else {}
+
+        # Get design elements, unless no stylesheet or inline style changed
+        with stage('fetch'):
+            inline_sheets, stylesheet_urls, remote_sheets = self._load_stylesheets(stats, url)
+        css_hash = hash_text('\n'.join(
+            [sheet.content_hash for sheet in inline_sheets + remote_sheets]
+            + [style for _, style in stats.inline_styles]
+        ))
+        if previous and css_hash == previous.css_hash:
+            design = previous_result['design_elements']
+        else:
+            design = self._extract_design_elements(stats, inline_sheets + remote_sheets)
+        layout = self._analyze_layout(stats)
             
-    def _extract_colors(self, soup):
-        """Extract color codes from CSS and inline styles."""
-        colors = set()
-        
-        # Extract from style tags
-        for style in soup.find_all('style'):
-            if style.string:
-                sheet = cssutils.parseString(style.string)
-                for rule in sheet:
-                    if hasattr(rule, 'style'):
-                        for property in rule.style:
-                            if 'color' in property.name or 'background' in property.name:
-                                colors.add(property.value)
-        
-        # Extract from inline styles
-        for tag in soup.find_all(style=True):
-            style = tag['style']
-            color_matches = re.findall(r'#[0-9a-fA-F]{3,6}|rgb\([^)]+\)|rgba\([^)]+\)', style)
-            colors.update(color_matches)
-        
-        return list(colors)
-    
-    def _extract_fonts(self, soup):
-        """Extract font information from CSS."""
-        fonts = set()
-        
-        for style in soup.find_all('style'):
-            if style.string:
-                sheet = cssutils.parseString(style.string)
-                for rule in sheet:
-                    if hasattr(rule, 'style'):
-                        for property in rule.style:
-                            if 'font' in property.name:
-                                fonts.add(property.value)
-        
-        return list(fonts)
-    
-    def _extract_spacing(self, soup):
-        """Extract spacing and alignment properties."""
-        spacing = {
-            'margins': set(),
-            'padding': set(),
-            'alignment': set()
+        # Collect assets; probing is only repeated when the asset list changed
+        assets = self._collect_assets(stats, url)
+        assets_hash = hash_text(json.dumps([assets, options], sort_keys=True))
+        if previous and assets_hash == previous.assets_hash:
+            assets = previous_result['assets']
+        elif options['probe_assets'] or options['thumbnails']:
+            self._probe_assets(assets, options['thumbnails'])
+            
+        # Compile results
+        analysis = {
+            'url': url,
+            'design_elements': {
+                'colors': design['colors'],
+                'typography': design['typography'],
+                'spacing': design['spacing'],
+                'layout': layout
+            },
+            'assets': assets,
+            'structure': self._analyze_structure(stats)
         }
-        
-        for style in soup.find_all('style'):
-            if style.string:
-                sheet = cssutils.parseString(style.string)
-                for rule in sheet:
-                    if hasattr(rule, 'style'):
-                        for property in rule.style:
-                            if 'margin' in property.name:
-                                spacing['margins'].add(property.value)
-                            elif 'padding' in property.name:
-                                spacing['padding'].add(property.value)
-                            elif 'align' in property.name or 'justify' in property.name:
-                                spacing['alignment'].add(property.value)
-        
-        return {k: list(v) for k, v in spacing.items()}
+
+        if mode == 'ai':
+            # Agents whose input section is unchanged keep their previous review
+            insights = dict(previous_result.get('ai_insights', {}))
+            stale = [
+                name for name, section in AGENT_SECTIONS.items()
+                if name not in insights or section(analysis) != section(previous_result)
+            ]
+            count_cache_hits(len(AGENT_SECTIONS) - len(stale))
+            with stage('llm'):
+                insights.update(self._run_agents(analysis, stale))
+            analysis['ai_insights'] = insights
+
+        fingerprint = {
+            'html_hash': html_hash,
+            'css_hash': css_hash,
+            'assets_hash': assets_hash,
+            'stylesheet_urls': stylesheet_urls,
+            'stylesheet_hashes': [sheet.content_hash for sheet in remote_sheets],
+            'etag': response.headers.get('ETag', ''),
+            'last_modified': response.headers.get('Last-Modified', ''),
+            'options': options,
+        }
+        return AnalysisRun(analysis, fingerprint, unchanged=False)
+
+    def _run_agents(self, analysis, names=None):
+        """Have each agent review its part of the extracted data, all at once."""
+        names = list(AGENT_SECTIONS) if names is None else names
+        if not names:
+            return {}
+        agents = self._get_agents()
+        url = analysis['url']
+        descriptions = {
+            'style': (
+                f"Review the design system of {url} from the colors, typography, spacing and layout "
+                "extracted from its CSS below. Describe the palette, type scale and layout approach, "
+                "and point out inconsistencies."
+            ),
+            'structure': (
+                f"Review the HTML structure of {url} from the element counts extracted below. "
+                "Assess semantic markup, document outline and component organization, "
+                "and suggest improvements."
+            ),
+            'assets': (
+                f"Organize the media assets found on {url}, listed below. Group them by purpose "
+                "(logos, icons, content images, backgrounds), suggest descriptive file names "
+                "and flag images with missing alt text."
+            ),
+        }
+
+        def run(name):
+            data = AGENT_SECTIONS[name](analysis)
+            task = Task(
+                description=f"{descriptions[name]}\n\nExtracted data (JSON):\n"
+                            f"{json.dumps(data, default=str)[:AGENT_INPUT_CHARS]}",
+                agent=agents[name]
+            )
+            crew = Crew(agents=[agents[name]], tasks=[task], verbose=False)
+            return get_llm_guard().call(crew.kickoff, estimate_tokens(task.description))
+
+        # Each agent has its own task and reads only the pre-extracted data
+        with ThreadPoolExecutor(max_workers=len(names), thread_name_prefix='analyzer-agent') as pool:
+            results = dict(zip(names, pool.map(bind_current(run), names)))
+        return results
+
+    def _load_stylesheets(self, stats, base_url):
+        """Parse the page's <style> blocks and fetch its linked and imported stylesheets.
+
+        Returns the inline sheets, the top-level external stylesheet URLs and
+        the fetched external sheets.
+        """
+        external_urls = [urljoin(base_url, href) for href in stats.stylesheet_hrefs]
+
+        # Each stylesheet is parsed once, and not at all if it was seen before
+        inline_sheets = []
+        for css_text in stats.style_blocks:
+            parsed = stylesheet_cache.parse(css_text)
+            inline_sheets.append(parsed)
+            external_urls.extend(urljoin(base_url, href) for href in parsed.imports)
+
+        # Linked and imported stylesheets are downloaded concurrently and cached per URL
+        return inline_sheets, external_urls, remote_stylesheets.fetch_all(external_urls)
+            
+    def _extract_design_elements(self, stats, sheets):
+        """Extract colors, fonts and spacing from CSS and inline styles in one pass."""
+        collector = DesignCollector()
+        for parsed in sheets:
+            collector.add_declarations(parsed.declarations)
+
+        # Extract colors from inline styles
+        for _, style in stats.inline_styles:
+            collector.add_inline_style(style)
+
+        return collector.as_dict()
     
-    def _analyze_layout(self, soup):
+    def _analyze_layout(self, stats):
         """Analyze page layout structure."""
         layout = {
-            'grid_usage': bool(soup.select('[class*="grid"]')),
-            'flexbox_usage': bool(soup.select('[class*="flex"]')),
-            'main_sections': [tag.name for tag in soup.find_all(['header', 'main', 'footer', 'nav', 'aside'])]
+            'grid_usage': stats.grid_usage,
+            'flexbox_usage': stats.flexbox_usage,
+            'main_sections': stats.main_sections
         }
         return layout
     
-    def _collect_assets(self, soup, base_url):
+    def _collect_assets(self, stats, base_url):
         """Collect all media assets from the website."""
         assets = {
             'images': [],
@@ -195,41 +354,49 @@ class WebsiteAnalyzer:
         }
         
         # Collect images
-        for img in soup.find_all('img'):
-            src = img.get('src')
-            if src:
-                full_url = urljoin(base_url, src)
-                assets['images'].append({
-                    'url': full_url,
-                    'alt': img.get('alt', ''),
-                    'type': 'icon' if 'icon' in src.lower() or 'logo' in src.lower() else 'image'
-                })
+        for src, alt in stats.images:
+            full_url = urljoin(base_url, src)
+            assets['images'].append({
+                'url': full_url,
+                'alt': alt,
+                'type': 'icon' if 'icon' in src.lower() or 'logo' in src.lower() else 'image'
+            })
         
         # Collect background images from styles
-        for tag in soup.find_all(style=True):
-            style = tag['style']
+        for tag_name, style in stats.inline_styles:
             bg_matches = re.findall(r'background-image:\s*url\([\'"]?([^\'"]+)[\'"]?\)', style)
             for match in bg_matches:
                 full_url = urljoin(base_url, match)
                 assets['backgrounds'].append({
                     'url': full_url,
-                    'element': tag.name
+                    'element': tag_name
                 })
         
         return assets
     
-    def _analyze_structure(self, soup):
+    def _probe_assets(self, assets, thumbnails=False):
+        """Add probe results to the collected assets, within the probe deadline."""
+        entries = assets['images'] + assets['backgrounds']
+        probed = asset_prober.probe_all([entry['url'] for entry in entries], thumbnails=thumbnails)
+        for entry in entries:
+            if entry['url'] in probed:
+                entry.update(probed[entry['url']])
+    
+    def _analyze_structure(self, stats):
         """Analyze HTML structure and component organization."""
         structure = {
-            'doctype': bool(soup.find('doctype')),
-            'head_elements': [tag.name for tag in soup.head.children if tag.name],
+            'doctype': stats.has_doctype,
+            'head_elements': stats.head_elements,
             'semantic_elements': {
-                tag: len(soup.find_all(tag)) 
-                for tag in ['header', 'nav', 'main', 'article', 'section', 'aside', 'footer']
+                tag: stats.tag_counts[tag]
+                for tag in SEMANTIC_TAGS
             },
-            'meta_tags': len(soup.find_all('meta')),
-            'scripts': len(soup.find_all('script')),
-            'styles': len(soup.find_all('style')),
-            'forms': len(soup.find_all('form'))
+            'meta_tags': stats.tag_counts['meta'],
+            'scripts': stats.tag_counts['script'],
+            'styles': stats.tag_counts['style'],
+            'forms': stats.tag_counts['form']
         }
         return structure
+
+# Shared across requests; use ``with analyzer_pool.acquire() as analyzer:``
+analyzer_pool = InstancePool(WebsiteAnalyzer)